@@ -73,7 +73,8 @@ WSGI_APPLICATION = 'paper_management.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # PAPER_DB_PATH points the project (e.g. the benchmarks) at a scratch database
+        'NAME': os.environ.get('PAPER_DB_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
@@ -0,0 +1,126 @@
+import json
+import statistics
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.test import APIRequestFactory
+
+from paper.models import Paper
+from paper.views import PaperViewSet
+from pulp.models import Pulp
+from report.models import ChartData
+from report.views import chart_data_api, technical_report_data_api
+
+
+class QueryCounter:
+    """Counts the queries run on a connection, installed with connection.execute_wrapper().
+
+    Unlike CaptureQueriesContext this doesn't depend on connection.queries_log,
+    which only keeps the last 9000 queries.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Measure latency and query counts of the report/paper API hot paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per target (default: 10)')
+        parser.add_argument('--warmup', type=int, default=1, help='Untimed runs per target (default: 1)')
+        parser.add_argument('--only', nargs='*', default=None, help='Run only the named targets')
+        parser.add_argument('--json', dest='json_path', default=None, help='Write results as JSON to this file')
+
+    def get_targets(self):
+        """
+        Return (name, callable) pairs; each callable performs one request or command run.
+        """
+        factory = RequestFactory()
+        api_factory = APIRequestFactory()
+        paper_list = PaperViewSet.as_view({'get': 'list'})
+        paper_suggestions = PaperViewSet.as_view({'get': 'suggestions'})
+
+        def check(response):
+            if response.status_code != 200:
+                raise RuntimeError(f'Unexpected status {response.status_code}')
+            # DRF responses are rendered lazily; include rendering in the measurement
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+
+        return [
+            ('process_chart_data', lambda: call_command('process_chart_data', stdout=StringIO())),
+            ('chart_data_api', lambda: check(chart_data_api(factory.get('/api/report/chart-data/')))),
+            ('technical_report_daily', lambda: check(technical_report_data_api(
+                factory.get('/api/report/technical-report-data/', {'time_filter': 'daily'})))),
+            ('technical_report_monthly', lambda: check(technical_report_data_api(
+                factory.get('/api/report/technical-report-data/', {'time_filter': 'monthly'})))),
+            ('paper_list', lambda: check(paper_list(api_factory.get('/api/paper/records/')))),
+            ('paper_list_search', lambda: check(paper_list(
+                api_factory.get('/api/paper/records/', {'search': '1', 'sort_by': 'roll_number'})))),
+            ('paper_suggestions', lambda: check(paper_suggestions(api_factory.get('/api/paper/records/suggestions/')))),
+        ]
+
+    def measure(self, func, repeat, warmup):
+        for _ in range(warmup):
+            func()
+
+        timings = []
+        queries = []
+        for _ in range(repeat):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                start = time.perf_counter()
+                func()
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(counter.count)
+
+        timings.sort()
+        p95_index = min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))
+        return {
+            'runs': repeat,
+            'min_ms': round(timings[0], 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[p95_index], 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries': max(queries),
+        }
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        self.stdout.write(f"Database: {connection.settings_dict['NAME']}")
+        dataset = {
+            'papers': Paper.objects.count(),
+            'pulps': Pulp.objects.count(),
+            'chart_data': ChartData.objects.count(),
+        }
+        self.stdout.write(
+            f"Dataset: {dataset['papers']} papers, {dataset['pulps']} pulps, {dataset['chart_data']} chart points"
+        )
+        if not dataset['papers']:
+            self.stdout.write(self.style.WARNING('No paper records found; run generate_synthetic_data first'))
+
+        results = {}
+        for name, func in self.get_targets():
+            if options['only'] and name not in options['only']:
+                continue
+            result = self.measure(func, repeat, options['warmup'])
+            results[name] = result
+            self.stdout.write(
+                f"{name:<26} median {result['median_ms']:>9.2f} ms  p95 {result['p95_ms']:>9.2f} ms  "
+                f"min {result['min_ms']:>9.2f} ms  queries {result['queries']}"
+            )
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({'dataset': dataset, 'results': results}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['json_path']}"))
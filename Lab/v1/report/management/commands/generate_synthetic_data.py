@@ -0,0 +1,186 @@
+import json
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from material.models import Material
+from paper.models import Paper
+from pulp.models import Pulp
+
+User = get_user_model()
+
+# Jalali month lengths (Esfand is treated as 29 days; leap years are ignored)
+JALALI_MONTH_DAYS = [31, 31, 31, 31, 31, 31, 30, 30, 30, 30, 30, 29]
+
+RESPONSIBLE_PERSONS = ['علی رضایی', 'محمد احمدی', 'حسین کریمی', 'رضا موسوی', 'مهدی حسینی']
+MATERIAL_NAMES = ['نشاسته', 'AKD', 'آلوم', 'رنگ', 'PAC', 'بنتونیت', 'پلیمر']
+BRANDS = ['Kemira', 'BASF', 'Solenis', 'Buckman', 'داخلی']
+
+
+def iter_jalali_dates(start, count):
+    """
+    Yield ``count`` consecutive Jalali dates as 'YYYY-MM-DD' strings.
+    """
+    year, month, day = (int(part) for part in start.split('-'))
+    for _ in range(count):
+        yield f'{year:04d}-{month:02d}-{day:02d}'
+        day += 1
+        if day > JALALI_MONTH_DAYS[month - 1]:
+            day = 1
+            month += 1
+            if month > 12:
+                month = 1
+                year += 1
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic Paper/Pulp/Material histories for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rolls', type=int, default=1000, help='Number of paper rolls to generate (default: 1000)')
+        parser.add_argument('--rolls-per-day', type=int, default=12, help='Rolls produced per day (default: 12)')
+        parser.add_argument('--pulp-ratio', type=float, default=0.5, help='Pulp samples per roll (default: 0.5)')
+        parser.add_argument('--materials', type=int, default=len(MATERIAL_NAMES), help='Number of materials to create')
+        parser.add_argument('--missing-rate', type=float, default=0.15, help='Probability that an optional value is left empty (default: 0.15)')
+        parser.add_argument('--start-date', default='1403-01-01', help='First Jalali date (default: 1403-01-01)')
+        parser.add_argument('--start-roll', type=int, default=1, help='First roll number (default: 1)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible data')
+        parser.add_argument('--clear', action='store_true', help='Delete existing Paper, Pulp and Material records first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        missing_rate = options['missing_rate']
+        rolls = options['rolls']
+        rolls_per_day = max(1, options['rolls_per_day'])
+
+        if options['clear']:
+            Paper.objects.all().delete()
+            Pulp.objects.all().delete()
+            Material.objects.all().delete()
+            self.stdout.write(self.style.WARNING('Cleared existing paper, pulp and material records'))
+
+        user, _ = User.objects.get_or_create(
+            username='synthetic_data',
+            defaults={'first_name': 'synthetic', 'last_name': 'data'},
+        )
+
+        materials = []
+        for name in MATERIAL_NAMES[:options['materials']]:
+            material, _ = Material.objects.get_or_create(user=user, material_name=name)
+            materials.append(material)
+
+        def maybe(value):
+            return None if rng.random() < missing_rate else value
+
+        day_count = rolls // rolls_per_day + 1
+        dates = list(iter_jalali_dates(options['start_date'], day_count))
+        now = timezone.now()
+        first_day = now - timedelta(days=day_count)
+
+        papers = []
+        created_at = {}
+        for i in range(rolls):
+            roll_number = str(options['start_roll'] + i)
+            day_index = i // rolls_per_day
+            minutes = (i % rolls_per_day) * (24 * 60 // rolls_per_day)
+            start_time = f'{minutes // 60:02d}:{minutes % 60:02d}'
+            end_minutes = min(minutes + 40, 24 * 60 - 1)
+            end_time = f'{end_minutes // 60:02d}:{end_minutes % 60:02d}'
+
+            material_usage = {}
+            for material in materials:
+                if rng.random() >= missing_rate:
+                    material_usage[str(material.id)] = {
+                        'val': round(rng.uniform(1, 50), 1),
+                        'brand': rng.choice(BRANDS),
+                        'text': '',
+                    }
+
+            burst = maybe(round(rng.gauss(3.2, 0.4), 2))
+            papers.append(Paper(
+                user=user,
+                date=dates[day_index],
+                sampling_start_time=start_time,
+                sampling_end_time=end_time,
+                roll_number=roll_number,
+                responsible_person_name=rng.choice(RESPONSIBLE_PERSONS),
+                shift='day' if minutes < 12 * 60 else 'night',
+                paper_type=maybe(rng.choice([choice[0] for choice in Paper.PAPER_TYPE_CHOICES])),
+                paper_size=maybe(rng.choice([200, 210, 220, 240])),
+                NumberOfTears=maybe(rng.randint(0, 5)),
+                real_grammage=maybe(round(rng.gauss(127, 4), 1)),
+                humidity=maybe(round(rng.gauss(7.5, 0.8), 2)),
+                ash_percentage=maybe(round(rng.uniform(8, 16), 2)),
+                cub=maybe(round(rng.uniform(20, 45), 1)),
+                profile=maybe(rng.choice([choice[0] for choice in Paper.PROFILE_CHOICES])),
+                density_valve=maybe(round(rng.uniform(30, 70), 1)),
+                diluting_valve=maybe(round(rng.uniform(30, 70), 1)),
+                cylinder_temperature_before_press=maybe(rng.choice(range(80, 110, 2))),
+                cylinder_temperature_after_press=maybe(rng.choice(range(70, 100, 2))),
+                burst_test=f'{burst} kPa' if burst is not None else '',
+                tensile_strength_md=maybe(round(rng.gauss(8.5, 0.7), 2)),
+                tensile_strength_cd=maybe(round(rng.gauss(3.5, 0.4), 2)),
+                cct1=maybe(round(rng.gauss(180, 12), 1)),
+                cct2=maybe(round(rng.gauss(180, 12), 1)),
+                cct3=maybe(round(rng.gauss(180, 12), 1)),
+                cct4=maybe(round(rng.gauss(180, 12), 1)),
+                cct5=maybe(round(rng.gauss(180, 12), 1)),
+                rct1=maybe(round(rng.gauss(150, 10), 1)),
+                rct2=maybe(round(rng.gauss(150, 10), 1)),
+                rct3=maybe(round(rng.gauss(150, 10), 1)),
+                rct4=maybe(round(rng.gauss(150, 10), 1)),
+                rct5=maybe(round(rng.gauss(150, 10), 1)),
+                calender_applied=rng.random() < 0.5,
+                machine_speed=maybe(rng.choice(range(400, 650, 10))),
+                material_usage=json.dumps(material_usage, ensure_ascii=False) if material_usage else '',
+            ))
+            created_at[roll_number] = first_day + timedelta(days=day_index, minutes=minutes)
+
+        Paper.objects.bulk_create(papers, batch_size=500)
+
+        pulps = []
+        pulp_created_at = []
+        for i in range(int(rolls * options['pulp_ratio'])):
+            roll_index = rng.randrange(rolls)
+            roll_number = options['start_roll'] + roll_index
+            minutes = (roll_index % rolls_per_day) * (24 * 60 // rolls_per_day)
+            pulps.append(Pulp(
+                roll_number=roll_number if rng.random() >= missing_rate else None,
+                lower_sampling_time=f'{minutes // 60:02d}:{minutes % 60:02d}',
+                downpulpcount=maybe(round(rng.uniform(0.6, 1.2), 3)),
+                downpulpfreenes=maybe(round(rng.uniform(250, 450), 0)),
+                lower_headbox_freeness=maybe(round(rng.uniform(250, 450), 0)),
+                lower_ph=maybe(round(rng.gauss(7.2, 0.3), 2)),
+                lower_pulp_temperature=maybe(round(rng.gauss(45, 3), 1)),
+                lower_water_filter=maybe(round(rng.uniform(0.05, 0.3), 3)),
+                upper_headbox_consistency=maybe(round(rng.uniform(0.6, 1.2), 3)),
+                upper_headbox_freeness=maybe(round(rng.uniform(250, 450), 0)),
+                upper_ph=maybe(round(rng.gauss(7.2, 0.3), 2)),
+                upper_pulp_temperature=maybe(round(rng.gauss(45, 3), 1)),
+                upper_water_filter=maybe(round(rng.uniform(0.05, 0.3), 3)),
+                pond8_consistency=maybe(round(rng.uniform(2, 4), 2)),
+                curtain_consistency=maybe(round(rng.uniform(2, 4), 2)),
+                thickener_consistency=maybe(round(rng.uniform(3, 6), 2)),
+            ))
+            pulp_created_at.append(first_day + timedelta(days=roll_index // rolls_per_day, minutes=minutes))
+
+        Pulp.objects.bulk_create(pulps, batch_size=500)
+
+        # created_at uses auto_now_add, so spread the history afterwards with bulk_update
+        new_papers = list(Paper.objects.filter(user=user, roll_number__in=list(created_at)))
+        for paper in new_papers:
+            paper.created_at = created_at[paper.roll_number]
+        Paper.objects.bulk_update(new_papers, ['created_at'], batch_size=500)
+
+        new_pulps = list(Pulp.objects.order_by('-id')[:len(pulps)])[::-1]
+        for pulp, timestamp in zip(new_pulps, pulp_created_at):
+            pulp.created_at = timestamp
+        Pulp.objects.bulk_update(new_pulps, ['created_at'], batch_size=500)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(papers)} paper records, {len(pulps)} pulp records and '
+            f'{len(materials)} materials ({dates[0]} to {dates[-1]})'
+        ))
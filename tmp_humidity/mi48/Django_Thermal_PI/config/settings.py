@@ -149,3 +149,87 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Thermal frame bus: shared memory between thermal_worker.py and the Django process
+THERMAL_FRAME_SHAPE = (62, 80)
+THERMAL_FRAME_BUS_NAME = 'thermal_frames'
+THERMAL_FRAME_BUS_SLOTS = 16
+
+# Thermal image rendering (thermal/renderer.py): output (width, height) and JPEG quality
+THERMAL_IMAGE_SIZE = (800, 620)
+THERMAL_IMAGE_QUALITY = 85
+# The worker writes static/thermal_image.jpg only this often (seconds); live views use /view/thermal-image.jpg
+THERMAL_SNAPSHOT_INTERVAL = 5
+
+# Probe temperature = weighted average of a KERNEL_SIZE x KERNEL_SIZE neighbourhood (thermal/probes.py)
+THERMAL_PROBE_KERNEL_SIZE = 3
+THERMAL_PROBE_KERNEL_WEIGHTS = None  # None = equal weights
+
+# Cross-direction profile and streak detection (thermal/cd_profile.py)
+THERMAL_CD_HISTORY = 600  # profiles kept in the time x CD ring buffer
+THERMAL_CD_TRIM = 0.1  # fraction of rows dropped at each end before averaging a column
+THERMAL_STREAK_THRESHOLD = 0.5  # degrees C from the profile median
+THERMAL_STREAK_PERSISTENCE = 0.8  # share of profiles a column must deviate in
+THERMAL_CD_PROFILE_RECORDS = True  # the worker saves a CDProfile record with every probe data save
+
+# ProbeData retention in days (thermal/rollups.py, manage.py prune_probe_data); None keeps forever
+THERMAL_RAW_RETENTION_DAYS = 30
+THERMAL_MINUTE_ROLLUP_RETENTION_DAYS = 90
+THERMAL_HOUR_ROLLUP_RETENTION_DAYS = 730
+THERMAL_DAY_ROLLUP_RETENTION_DAYS = None
+
+# Store per-probe values of new ProbeData records packed in a binary column instead of JSON (thermal/probe_storage.py)
+THERMAL_PACK_PROBE_DATA = False
+
+# Cached probe configuration (thermal/config_cache.py): saves bump the version file, which every process polls;
+# the configuration is re-read at least this often (seconds) anyway
+THERMAL_CONFIG_MAX_AGE = 60
+
+# Log images (thermal/snapshots.py): thumbnail bounding box (width, height) and images per logs page
+THERMAL_THUMBNAIL_SIZE = (160, 120)
+THERMAL_LOG_PAGE_SIZE = 50
+
+# Raw frame archive written by the thermal worker (frame_archive.py): hourly float16 chunks, compressed once
+# finished. At most one frame per interval (seconds); the oldest chunks are deleted beyond the size (bytes) or age
+# (days) limits. A 62x80 frame is ~10 KB raw, so one frame a second is ~0.85 GB a day before compression.
+# Set THERMAL_ARCHIVE_DIR = None to disable.
+THERMAL_ARCHIVE_DIR = BASE_DIR / 'frame_archive'
+THERMAL_ARCHIVE_INTERVAL = 1.0
+THERMAL_ARCHIVE_MAX_BYTES = 2 * 1024 ** 3
+THERMAL_ARCHIVE_MAX_DAYS = 30
+
+# Single-process thermal service (manage.py run_thermal_service, thermal/service.py): frames waiting to be processed
+# and database jobs waiting to be written are bounded by the queue sizes (the oldest frame is dropped, new jobs are
+# dropped), and database jobs are written in batches of up to THERMAL_SERVICE_DB_BATCH, waiting at most
+# THERMAL_SERVICE_DB_BATCH_DELAY seconds to fill one
+THERMAL_SERVICE_FRAME_QUEUE = 4
+THERMAL_SERVICE_DB_QUEUE = 100
+THERMAL_SERVICE_DB_BATCH = 20
+THERMAL_SERVICE_DB_BATCH_DELAY = 2.0
+
+# Write-behind buffer for ProbeData (thermal/probe_buffer.py): records are written in one transaction once this many
+# are waiting or the oldest has waited this long (seconds); a size of 1 writes every record right away. Until then
+# they are kept in a spill file, recovered after a crash; fsync every line to survive power loss too.
+THERMAL_PROBE_BUFFER_SIZE = 30
+THERMAL_PROBE_BUFFER_SECONDS = 60
+THERMAL_PROBE_SPILL_DIR = BASE_DIR / 'probe_spill'
+THERMAL_PROBE_BUFFER_FSYNC = False
+
+# Probe sampling: one ProbeData record per slot of this many seconds (ProbeData.sample_time), taken by the worker or
+# thermal service from the first frame of the slot. Pages only save probe data while neither is running, and then
+# every page posting in the same slot shares one record.
+THERMAL_SAVE_INTERVAL = 60
+
+# Alarm rules (thermal/alarms.py), evaluated on every frame by the worker or thermal service. metric: temperature or
+# humidity; target: average (of the checked probes) or probes (each one); kind: range (low/high) or rate (max_rate per
+# second over `window` seconds). An alarm clears only once the value is back by `hysteresis`, and a condition must
+# hold for `debounce` seconds before the alarm is raised or cleared. While a manual_mode alarm is raised, probe data
+# is not saved.
+THERMAL_ALARM_RULES = [
+    {'name': 'temperature_range', 'metric': 'temperature', 'target': 'average', 'kind': 'range',
+     'low': 35, 'high': 70, 'hysteresis': 1.0, 'debounce': 3.0, 'manual_mode': True},
+    {'name': 'probe_temperature_range', 'metric': 'temperature', 'target': 'probes', 'kind': 'range',
+     'low': 30, 'high': 80, 'hysteresis': 1.0, 'debounce': 3.0},
+    {'name': 'temperature_rate', 'metric': 'temperature', 'target': 'average', 'kind': 'rate',
+     'max_rate': 1.0, 'window': 10.0, 'hysteresis': 0.2, 'debounce': 5.0},
+]
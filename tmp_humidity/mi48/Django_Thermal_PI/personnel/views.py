@@ -1,4 +1,5 @@
 from django.shortcuts import render
+from django.core.paginator import Paginator
 from django.http import JsonResponse
 import time, os, shutil, json
 from django.views.decorators.csrf import csrf_exempt
@@ -8,8 +9,15 @@ from django.conf import settings
 from PIL import Image, ImageDraw
 import jdatetime
 from zoneinfo import ZoneInfo
-from thermal.models import ProbeData
 from thermal.models import ProbeConfiguration
+from thermal.models import ThermalSnapshot
+from thermal.formula import compile_formula, evaluate_formula, FormulaError
+from thermal.aggregation import humidity_series, recent_humidity_series
+from thermal.probe_buffer import queue_probe_record, sample_slot
+from thermal.config_cache import get_probe_config
+from thermal.snapshots import PAGE_SIZE
+from thermal import views as thermal_views
+import numpy as np
 
 DATA_IS_CORRECT = True
 PI_IP = "192.168.221.102"
@@ -26,6 +34,9 @@ DATA_FILE = os.path.join(settings.BASE_DIR, "device_inputs.json")
 # Get Iran/Tehran timezone
 IRAN_TZ = ZoneInfo("Asia/Tehran")
 
+# Log images listed on the main page
+LOG_PREVIEW = 20
+
 
 
 def test_view(request):
@@ -33,127 +44,40 @@ def test_view(request):
     return JsonResponse({'status': 'success', 'message': 'Test view working'})
 
 def thermal_view(request):
-    log_dir = os.path.join(settings.BASE_DIR, 'static', 'logs')
-    logs = []
-
-    if os.path.exists(log_dir):
-        for filename in sorted(os.listdir(log_dir), reverse=True):
-            if filename.endswith('.jpg'):
-                details = filename.split("_")
-                logs.append({'path':f'/static/logs/{filename}','date':details[0],'time':details[1].replace("-",":"),'temp':details[2].replace(".jpg","")})
+    # Latest log images, newest first (the full list is on the logs page)
+    logs = ThermalSnapshot.objects.all()[:LOG_PREVIEW]
     
     filter_by_week = True if "week" in request.GET else False
     filter_by_month = True if "month" in request.GET else False
     filter_by_daily = True if "daily" in request.GET else False
-    filter_time = timezone.now() - timedelta(weeks=1) if filter_by_week else timezone.now() - timedelta(days=30) if filter_by_month else timezone.now() - timedelta(hours=24) if filter_by_daily else timezone.now() - timedelta(hours=1)
-    data = ProbeData.objects.filter(timestamp__gte=filter_time).order_by('timestamp')
-    chart_data = []
-    label_data = []
-    avg = 0
-    index = 0
-    time = None
-    for item in data:
-        timestamp = item.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        
-        if item.timestamp.tzinfo is None:
-                dt = IRAN_TZ.localize(item.timestamp)
-        else:
-            dt = item.timestamp.astimezone(IRAN_TZ)
-
-        if time is None:
-            time = item.timestamp.timestamp()
-
-        filter_ = 60*60 if filter_by_daily or filter_by_week or filter_by_month else 60
-        avg += item.humidity
-        index += 1
-        if (time + filter_) < item.timestamp.timestamp():
-            chart_data.append(float(f"{avg/index:.2f}"))
-
-            
-            jalali_dt = jdatetime.datetime.fromgregorian(datetime=dt)
-            label_data.append(jalali_dt.strftime('%Y/%m/%d %H:%M:%S'))
-            print(jdatetime.datetime.fromgregorian(datetime=datetime.fromtimestamp(item.timestamp.timestamp())).strftime("%a, %d %b %Y %H:%M:%S"))
-            avg=0
-            index=0
-            time = item.timestamp.timestamp()
+    period = timedelta(weeks=1) if filter_by_week else timedelta(days=30) if filter_by_month else timedelta(hours=24) if filter_by_daily else timedelta(hours=1)
+    # Hourly points for the day/week/month views, one per minute for the last hour
+    bucket = 'hour' if filter_by_daily or filter_by_week or filter_by_month else 'minute'
+    label_data, chart_data, _ = recent_humidity_series(bucket, period)
     
     return render(request,"thermal/index.html",context={"log":logs,"formuls":FORMULA,"chart_data":chart_data,"label_data":label_data,"max": len(chart_data)})
 
 def show_log(request):
-    log_dir = os.path.join(settings.BASE_DIR, 'static', 'logs')
-    logs = []
-
-    if os.path.exists(log_dir):
-        for filename in sorted(os.listdir(log_dir), reverse=True):
-            if filename.endswith('.jpg'):
-                details = filename.split("_")
-                logs.append({'path':f'/static/logs/{filename}','date':details[0],'time':details[1].replace("-",":"),'temp':details[2].replace(".jpg","")})
-    return render(request,"thermal/logs.html",context={"log":logs})
+    page = Paginator(ThermalSnapshot.objects.all(), PAGE_SIZE).get_page(request.GET.get('page'))
+    return render(request,"thermal/logs.html",context={"log":page,"page":page})
 
 @csrf_exempt
 def save_log_image(request):
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            row = data.get("row")
-            col = data.get("col")
-            avg_temp = data.get("avg_temp")
-
-            # Use Iran/Tehran timezone for timestamp
-            iran_dt = datetime.now(IRAN_TZ)
-            jalali_dt = jdatetime.datetime.fromgregorian(datetime=iran_dt)
-            timestamp = jalali_dt.strftime("%Y-%m-%d_%H-%M-%S")
-            temp_part = f"{avg_temp:.1f}"
-            filename = f"{timestamp}_{temp_part}.jpg"
-
-            src_path = os.path.join("static", "thermal_image.jpg")
-            dst_path = os.path.join("static/logs", filename)
-
-            os.makedirs("static/logs", exist_ok=True)
-
-            # draw
-            with Image.open(src_path) as img:
-                draw = ImageDraw.Draw(img)
-
-                img_width, img_height = img.size
-                cell_width = img_width / 80
-                cell_height = img_height / 62
-
-                left = col * cell_width
-                top = row * cell_height
-                right = left + cell_width
-                bottom = top + cell_height
-
-                # orange rectangle
-                draw.rectangle([left, top, right, bottom], outline="white", width=2)
-
-                img.save(dst_path)
-
-            return JsonResponse({'status': 'ok'})
-
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
-    else:
-        return JsonResponse({'error': 'Invalid method'}, status=405)
+    """Same as the thermal view: renders the clicked frame from the frame bus"""
+    return thermal_views.save_log_image(request)
 
 
 def calculate_formula(formula):
     min_v = 480
     max_v = 600
-    output = []
     targets = [i / 10.0 for i in range(min_v, max_v, 1)]
-    i = 1
-    for f in formula:
-        for x in targets:
-            newformula = f.replace("temp", str(x))
-            Humidity = eval(newformula)
-            if i > 1:
-                for y in output:
-                    if y["temp"] == x:
-                        y[f"f{i}"] = f"{Humidity:.2f}"
-            else:
-                output.append({"temp": x, f"f{i}": f"{Humidity:.2f}"})
-        i += 1
+    output = [{"temp": x} for x in targets]
+    temps = np.array(targets)
+    for i, f in enumerate(formula, start=1):
+        # One vectorized evaluation per formula instead of one eval per cell
+        humidity = evaluate_formula(f, temps)
+        for row, value in zip(output, humidity.tolist()):
+            row[f"f{i}"] = f"{value:.2f}"
     return output
 
 
@@ -213,19 +137,37 @@ def save_probe_data(request):
             if humidity is None or temperature is None or not active_formula:
                 return JsonResponse({'error': 'Missing required fields'}, status=400)
             
-            # Create and save probe data record
-            probe_record = ProbeData.objects.create(
-                humidity=humidity,
-                temperature=temperature,
-                active_formula=active_formula,
-                probe_count=probe_count,
-                probes_data=probes_data
-            )
+            # Same alarm handling as the thermal page: manual mode or temperature out of range - don't save
+            sampled_by_server, alarm = thermal_views.check_page_probe_data(probes_data, temperature, humidity)
+            if alarm is not None:
+                return alarm
+            
+            # While the worker samples the frames itself, pages don't add records of their own
+            if sampled_by_server:
+                return JsonResponse({
+                    'status': 'success',
+                    'saved': False,
+                    'reason': 'sampled by the server',
+                    'probe_count': probe_count
+                })
+            
+            # Queue the probe data record; it is written in a batch (thermal/probe_buffer.py).
+            # One record per sampling slot, however many pages post in it
+            timestamp = timezone.now()
+            saved = queue_probe_record({
+                'timestamp': timestamp,
+                'sample_time': sample_slot(timestamp.timestamp()),
+                'humidity': humidity,
+                'temperature': temperature,
+                'active_formula': active_formula,
+                'probe_count': probe_count,
+                'probes_data': probes_data,
+            })
             
             return JsonResponse({
                 'status': 'success',
-                'id': probe_record.id,
-                'timestamp': probe_record.timestamp.isoformat(),
+                'saved': saved,
+                'timestamp': timestamp.isoformat(),
                 'probe_count': probe_count
             })
             
@@ -252,33 +194,24 @@ def update_probe_configuration(request):
             # Validate required fields
             if not active_formula:
                 return JsonResponse({'error': 'Missing active_formula'}, status=400)
+            try:
+                compile_formula(active_formula)
+            except FormulaError as e:
+                return JsonResponse({'error': str(e)}, status=400)
             
             # Calculate probe count excluding average data
             probe_count = len([k for k in probes_data.keys() if not k.startswith('avg')])
             
-            # Create or update probe configuration
-            config, created = ProbeConfiguration.objects.get_or_create(
-                id=1,  # Always use ID 1 for the current configuration
-                defaults={
-                    'active_formula': active_formula,
-                    'probes_data': probes_data,
-                    'probe_count': probe_count,
-                    'checked_probes': checked_probes
-                }
-            )
-            
-            if not created:
-                # Update existing configuration
-                config.active_formula = active_formula
-                config.probes_data = probes_data
-                config.probe_count = probe_count
-                config.checked_probes = checked_probes
-                config.save()
+            # Create or update probe configuration (always ID 1 for the current configuration)
+            config = ProbeConfiguration.objects.filter(id=1).first() or ProbeConfiguration(id=1)
+            config.active_formula = active_formula
+            config.probes_data = probes_data
+            config.probe_count = probe_count
+            config.checked_probes = checked_probes
             
-            # Calculate and save average for checked probes
+            # Add the average for checked probes to probes_data, then write everything once
             avg_data = config.calculate_checked_probes_average()
-            if avg_data:
-                config.save()  # Save the updated probes_data with average
+            config.save()
             
             return JsonResponse({
                 'status': 'success',
@@ -300,7 +233,7 @@ def update_probe_configuration(request):
 def get_probe_configuration(request):
     """Get current probe configuration"""
     try:
-        config = ProbeConfiguration.objects.first()
+        config = get_probe_config()
         if config:
             return JsonResponse({
                 'status': 'success',
@@ -321,156 +254,20 @@ def get_probe_configuration(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def auto_save_probe_data():
-    """Automatically save probe data from thermal map file"""
-    try:
-        # Get current probe configuration
-        config = ProbeConfiguration.objects.first()
-        if not config or config.probe_count == 0:
-            return  # No probes configured
-        
-        # Read thermal map data
-        thermal_map_path = os.path.join(settings.BASE_DIR, 'static', 'thermal_map.txt')
-        if not os.path.exists(thermal_map_path):
-            return  # No thermal data available
-        
-        # Read and parse thermal map
-        with open(thermal_map_path, 'r') as f:
-            lines = f.readlines()
-        
-        if not lines:
-            return
-        
-        # Parse temperature data into 2D array
-        grid_data = []
-        for line in lines:
-            row = [float(temp) for temp in line.strip().split(',')]
-            grid_data.append(row)
-        
-        if not grid_data:
-            return
-        
-        # Calculate averages for each probe
-        total_temp = 0
-        total_humidity = 0
-        valid_probes = 0
-        probes_data = {}
-        
-        # Get checked probes - if none checked, use all probes
-        checked_probes = config.get_checked_probes()
-        if not checked_probes:
-            # Default to all probes if none checked
-            checked_probes = list(range(1, config.probe_count + 1))
-        
-        for probe_id in checked_probes:
-            probe_key = f"probe{probe_id}"
-            probe_info = config.probes_data.get(probe_key, {})
-            
-            try:
-                row = probe_info.get('y')
-                col = probe_info.get('x')
-                
-                if row is not None and col is not None and 0 <= row < len(grid_data) and 0 <= col < len(grid_data[0]):
-                    # Calculate average around probe point (3x3 area for accuracy)
-                    temp_sum = 0
-                    temp_count = 0
-                    
-                    for r in range(max(0, row-1), min(len(grid_data), row+2)):
-                        for c in range(max(0, col-1), min(len(grid_data[0]), col+2)):
-                            if 0 <= r < len(grid_data) and 0 <= c < len(grid_data[0]):
-                                temp_sum += grid_data[r][c]
-                                temp_count += 1
-                    
-                    if temp_count > 0:
-                        avg_temp = temp_sum / temp_count
-                        
-                        # Calculate humidity using active formula
-                        humidity = calculate_humidity_from_formula(avg_temp, config.active_formula)
-                        
-                        probes_data[probe_key] = {
-                            'x': col,
-                            'y': row,
-                            'temperature': round(avg_temp, 2),
-                            'humidity': round(humidity, 2)
-                        }
-                        
-                        total_temp += avg_temp
-                        total_humidity += humidity
-                        valid_probes += 1
-                        
-            except Exception as e:
-                print(f"Error processing probe {probe_id}: {e}")
-                continue
-        
-        if valid_probes > 0:
-            # Calculate overall averages for checked probes
-            avg_temp = total_temp / valid_probes
-            avg_humidity = total_humidity / valid_probes
-            
-            # Add average data to probes_data JSON
-            probes_data[f'avg{min(checked_probes)}-{max(checked_probes)}'] = {
-                'temperature': round(avg_temp, 2),
-                'humidity': round(avg_humidity, 2),
-                'checked_probes': checked_probes,
-                'formula': config.active_formula
-            }
-            
-            # Save to database
-            ProbeData.objects.create(
-                humidity=round(avg_humidity, 2),
-                temperature=round(avg_temp, 2),
-                active_formula=config.active_formula,
-                probe_count=valid_probes,
-                probes_data=probes_data
-            )
-            
-            print(f"Auto-saved probe data: {valid_probes} checked probes, avg temp: {avg_temp:.2f}°C, avg humidity: {avg_humidity:.2f}%")
-            
-    except Exception as e:
-        print(f"Error in auto_save_probe_data: {e}")
-
-
 def calculate_humidity_from_formula(temperature, formula):
-    """Calculate humidity from temperature using the given formula"""
+    """Calculate humidity from a temperature (or an array of temperatures) using the given formula"""
     try:
-        # Replace 'temp' with actual temperature value
-        formula_with_value = formula.replace('temp', str(temperature))
-        humidity = eval(formula_with_value)
-        return max(0, min(100, humidity))  # Clamp between 0-100%
+        # Non-finite results (e.g. division by zero) count as a failed calculation
+        humidity = np.nan_to_num(compile_formula(formula)(temperature), nan=0.0, posinf=0.0, neginf=0.0)
+        humidity = np.clip(humidity, 0, 100)  # Clamp between 0-100%
+        return float(humidity) if humidity.ndim == 0 else humidity
     except Exception as e:
         print(f"Error calculating humidity: {e}")
-        return 0.0
+        return 0.0 if np.ndim(temperature) == 0 else np.zeros(np.shape(temperature))
 
 
 def chart_view(request):
-    data = ProbeData.objects.all().order_by('timestamp')
-    chart_data = []
-    label_data = []
-    avg = 0
-    index = 0
-    time = None
-    filter_by_week = True if "week" in request.GET else False
-    filter_by_month = True if "month" in request.GET else False
-    for item in data:
-        timestamp = item.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        
-        if time is None:
-            time = item.timestamp.timestamp()
-        filter_ = (7*24*60*60) if filter_by_week else (30*24*60*60) if filter_by_month else 60*60
-        avg += item.humidity
-        index += 1
-        if (time + filter_) < item.timestamp.timestamp():
-            print((time + filter_) , item.timestamp.timestamp())
-            chart_data.append(float(f"{avg/index:.2f}"))
-
-            if item.timestamp.tzinfo is None:
-                dt = IRAN_TZ.localize(item.timestamp)
-            else:
-                dt = item.timestamp.astimezone(IRAN_TZ)
-            jalali_dt = jdatetime.datetime.fromgregorian(datetime=dt)
-            label_data.append(jalali_dt.strftime('%Y/%m/%d %H:%M:%S'))
-            
-            avg=0
-            index=0
-            time = item.timestamp.timestamp()
+    # One point per hour, week (?week) or month (?month), averaged in the database
+    bucket = 'week' if "week" in request.GET else 'month' if "month" in request.GET else 'hour'
+    label_data, chart_data, _ = humidity_series(bucket)
     return render(request, "thermal/chart.html",context={"chart_data":chart_data,"label_data":label_data,"max": len(chart_data)})
\ No newline at end of file
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import ProbeData, ProbeConfiguration
+from .models import ProbeData, ProbeConfiguration, CDProfile, ProbeDataRollup, ThermalSnapshot, AlarmEvent
 
 
 @admin.register(ProbeConfiguration)
@@ -65,6 +65,10 @@ class ProbeDataAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        # The list never shows the per-probe payload; the detail page loads it on access
+        return super().get_queryset(request).without_probes()
+    
     def timestamp_jalali(self, obj):
         """Display Jalali timestamp in admin list"""
         return obj.get_jalali_date()
@@ -85,4 +89,67 @@ class ProbeDataAdmin(admin.ModelAdmin):
         """Display shortened active formula"""
         formula = obj.active_formula
         return formula[:50] + "..." if len(formula) > 50 else formula
-    active_formula_short.short_description = 'Active Formula'
\ No newline at end of file
+    active_formula_short.short_description = 'Active Formula'
+
+
+@admin.register(CDProfile)
+class CDProfileAdmin(admin.ModelAdmin):
+    list_display = ['timestamp_jalali', 'mean_temperature', 'min_temperature', 'max_temperature', 'streak_count']
+    list_filter = ['timestamp', 'streak_count']
+    readonly_fields = ['timestamp', 'timestamp_jalali', 'formatted_streaks']
+    ordering = ['-timestamp']  # Most recent first
+    
+    def timestamp_jalali(self, obj):
+        """Display Jalali timestamp in admin list"""
+        return obj.get_jalali_date()
+    timestamp_jalali.short_description = 'Timestamp (Jalali)'
+    timestamp_jalali.admin_order_field = 'timestamp'
+    
+    def formatted_streaks(self, obj):
+        """Display formatted streaks in admin"""
+        import json
+        return format_html('<pre>{}</pre>', json.dumps(obj.streaks, indent=2))
+    formatted_streaks.short_description = 'Formatted Streaks'
+
+
+
+@admin.register(ProbeDataRollup)
+class ProbeDataRollupAdmin(admin.ModelAdmin):
+    list_display = ['bucket', 'resolution', 'count', 'temperature_mean', 'temperature_min', 'temperature_max',
+                    'humidity_mean', 'humidity_min', 'humidity_max']
+    list_filter = ['resolution', 'bucket']
+    ordering = ['resolution', '-bucket']
+
+
+@admin.register(ThermalSnapshot)
+class ThermalSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['timestamp_jalali', 'temperature', 'row', 'col', 'preview']
+    list_filter = ['timestamp']
+    readonly_fields = ['timestamp_jalali', 'preview']
+    ordering = ['-timestamp']  # Most recent first
+    
+    def timestamp_jalali(self, obj):
+        """Display Jalali timestamp in admin list"""
+        return obj.get_jalali_date()
+    timestamp_jalali.short_description = 'Timestamp (Jalali)'
+    timestamp_jalali.admin_order_field = 'timestamp'
+    
+    def preview(self, obj):
+        """Thumbnail linking to the full image"""
+        return format_html('<a href="{}"><img src="{}" style="max-height: 60px"></a>', obj.url, obj.thumbnail_url)
+    preview.short_description = 'Image'
+
+
+@admin.register(AlarmEvent)
+class AlarmEventAdmin(admin.ModelAdmin):
+    list_display = ['timestamp_jalali', 'rule', 'target', 'state', 'value', 'manual_mode', 'message']
+    list_filter = ['state', 'rule', 'manual_mode', 'timestamp']
+    search_fields = ['rule', 'target', 'message']
+    readonly_fields = ['timestamp', 'timestamp_jalali']
+    ordering = ['-timestamp']  # Most recent first
+    
+    def timestamp_jalali(self, obj):
+        """Display Jalali timestamp in admin list"""
+        return obj.get_jalali_date()
+    timestamp_jalali.short_description = 'Timestamp (Jalali)'
+    timestamp_jalali.admin_order_field = 'timestamp'
@@ -0,0 +1,161 @@
+"""Cross-direction (CD) temperature profile of the paper web and streak detection.
+
+Each frame is reduced to one value per column (a trimmed mean over rows, so
+probe markers, edges and hot spots don't skew it). Profiles are kept in a
+fixed-size time x CD ring buffer. A streak is a band of columns that stays
+colder (wetter, water is still evaporating) or hotter (drier) than the rest of
+the web for most of the window.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+HISTORY = getattr(settings, 'THERMAL_CD_HISTORY', 600)
+TRIM = getattr(settings, 'THERMAL_CD_TRIM', 0.1)
+STREAK_THRESHOLD = getattr(settings, 'THERMAL_STREAK_THRESHOLD', 0.5)
+STREAK_PERSISTENCE = getattr(settings, 'THERMAL_STREAK_PERSISTENCE', 0.8)
+
+
+def robust_profile(grid, trim=TRIM):
+    """Column-wise mean over rows after dropping the ``trim`` fraction at both ends"""
+    grid = np.asarray(grid, dtype=np.float32)
+    cut = int(grid.shape[0] * trim)
+    if cut == 0:
+        return grid.mean(axis=0)
+    ordered = np.sort(grid, axis=0)
+    return ordered[cut:grid.shape[0] - cut].mean(axis=0)
+
+
+class CDProfileBuffer:
+    """Ring buffer of the last ``length`` CD profiles with their frame ids and timestamps"""
+
+    def __init__(self, cols, length=HISTORY):
+        self.cols = cols
+        self.length = length
+        self.profiles = np.full((length, cols), np.nan, dtype=np.float32)
+        self.timestamps = np.zeros(length)
+        self.frame_ids = np.zeros(length, dtype=np.int64)
+        self.count = 0
+        self.next = 0
+        self.last_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def add(self, frame_id, timestamp, profile):
+        with self._lock:
+            self.profiles[self.next] = profile
+            self.timestamps[self.next] = timestamp
+            self.frame_ids[self.next] = frame_id
+            self.next = (self.next + 1) % self.length
+            self.count = min(self.count + 1, self.length)
+            self.last_id = frame_id
+
+    def add_frame(self, frame_id, timestamp, grid):
+        self.add(frame_id, timestamp, robust_profile(grid))
+
+    def window(self, rows=None):
+        """(timestamps, frame_ids, profiles) of the newest ``rows`` entries, oldest first"""
+        with self._lock:
+            rows = self.count if rows is None else min(rows, self.count)
+            order = (np.arange(self.next - rows, self.next)) % self.length
+            return self.timestamps[order], self.frame_ids[order], self.profiles[order]
+
+    def clear(self):
+        with self._lock:
+            self.profiles.fill(np.nan)
+            self.count = self.next = self.last_id = 0
+
+
+def detect_streaks(profiles, threshold=STREAK_THRESHOLD, persistence=STREAK_PERSISTENCE):
+    """Find persistent wet (cold) and dry (hot) column bands in a time x CD matrix.
+
+    Every profile is compared with its own median, so machine-direction
+    changes of the whole web don't count. A column belongs to a streak when
+    it deviates by more than ``threshold`` in at least ``persistence`` of the
+    profiles; neighbouring columns are merged into one streak.
+    """
+    if not len(profiles):
+        return []
+    deviation = profiles - np.median(profiles, axis=1, keepdims=True)
+    mean_deviation = deviation.mean(axis=0)
+    streaks = []
+    for kind, flags in (('wet', deviation < -threshold), ('dry', deviation > threshold)):
+        share = flags.mean(axis=0)
+        persistent = np.concatenate(([False], share >= persistence, [False]))
+        edges = np.flatnonzero(np.diff(persistent.astype(np.int8)))
+        for start, end in zip(edges[::2], edges[1::2]):
+            streaks.append({
+                'type': kind,
+                'start_col': int(start),
+                'end_col': int(end - 1),
+                'width': int(end - start),
+                'persistence': round(float(share[start:end].mean()), 2),
+                'deviation': round(float(mean_deviation[start:end].mean()), 2),
+            })
+    return sorted(streaks, key=lambda streak: streak['start_col'])
+
+
+def analyze(buffer, rows=None):
+    """Latest profile, window mean profile and streaks of ``buffer`` as plain data"""
+    timestamps, frame_ids, profiles = buffer.window(rows)
+    if not len(profiles):
+        return None
+    mean_profile = profiles.mean(axis=0)
+    return {
+        'frame_id': int(frame_ids[-1]),
+        'timestamp': float(timestamps[-1]),
+        'rows': len(profiles),
+        'cols': buffer.cols,
+        'span': round(float(timestamps[-1] - timestamps[0]), 2),
+        'profile': np.round(profiles[-1].astype(np.float64), 2).tolist(),
+        'mean_profile': np.round(mean_profile.astype(np.float64), 2).tolist(),
+        'mean': round(float(mean_profile.mean()), 2),
+        'min': round(float(mean_profile.min()), 2),
+        'max': round(float(mean_profile.max()), 2),
+        'streaks': detect_streaks(profiles),
+    }
+
+
+_buffer = None
+
+
+def get_cd_buffer(cols):
+    """Process-wide CD profile buffer for frames with ``cols`` columns"""
+    global _buffer
+    if _buffer is None or _buffer.cols != cols:
+        _buffer = CDProfileBuffer(cols)
+    return _buffer
+
+
+def update_from_bus(bus):
+    """Add every frame published since the last update that is still in the bus"""
+    buffer = get_cd_buffer(bus.shape[1])
+    if bus.latest_id < buffer.last_id:
+        buffer.clear()  # The worker restarted and frame ids started over
+    for frame_id, timestamp, grid in bus.history(bus.latest_id - buffer.last_id):
+        buffer.add_frame(frame_id, timestamp, grid)
+    return buffer
+
+
+def save_cd_profile(buffer, rows=None):
+    """Store the current window analysis as a CDProfile record; returns it or None"""
+    from .models import CDProfile
+
+    result = analyze(buffer, rows)
+    if result is None:
+        return None
+    return CDProfile.objects.create(
+        frame_id=result['frame_id'],
+        window_rows=result['rows'],
+        window_seconds=result['span'],
+        mean_temperature=result['mean'],
+        min_temperature=result['min'],
+        max_temperature=result['max'],
+        profile=result['mean_profile'],
+        streak_count=len(result['streaks']),
+        streaks=result['streaks'],
+    )
@@ -0,0 +1,79 @@
+"""In-process cache of the current ProbeConfiguration.
+
+Per-frame code (auto_save_probe_data, the humidity endpoints) asks for the
+configuration many times a second, but it changes only when someone edits the
+probes. Every save or delete of a ProbeConfiguration bumps a small version
+file; each process (Django, the thermal worker) compares that file's stamp
+with the one it loaded and only goes to the database when it changed. The
+configuration is also re-read every THERMAL_CONFIG_MAX_AGE seconds in case a
+change bypassed the signals (e.g. a queryset update).
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .file_writer import atomic_write
+from .models import ProbeConfiguration
+
+VERSION_FILE = getattr(settings, 'THERMAL_CONFIG_VERSION_FILE',
+                       os.path.join(settings.BASE_DIR, 'probe_config.version'))
+MAX_AGE = getattr(settings, 'THERMAL_CONFIG_MAX_AGE', 60)
+
+_UNLOADED = object()
+_lock = threading.Lock()
+_config = None
+_version = _UNLOADED
+_loaded_at = 0.0
+
+
+def config_version():
+    """Stamp of the version file; changes whenever any process saves a configuration"""
+    try:
+        stat = os.stat(VERSION_FILE)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def bump_version():
+    """Tell every process that the configuration changed"""
+    try:
+        atomic_write(VERSION_FILE, str(time.time_ns()).encode())
+    except OSError as e:
+        print(f"Error writing probe configuration version file: {e}")
+
+
+def invalidate():
+    """Drop this process's cached configuration"""
+    global _version
+    with _lock:
+        _version = _UNLOADED
+
+
+def get_probe_config():
+    """Current ProbeConfiguration (or None), from the database only when it changed.
+
+    The returned instance is shared; don't modify it.
+    """
+    global _config, _version, _loaded_at
+    version = config_version()
+    now = time.monotonic()
+    with _lock:
+        if version != _version or now - _loaded_at > MAX_AGE:
+            _config = ProbeConfiguration.objects.first()
+            _version = version
+            _loaded_at = now
+        return _config
+
+
+@receiver(post_save, sender=ProbeConfiguration)
+@receiver(post_delete, sender=ProbeConfiguration)
+def _configuration_changed(sender, **kwargs):
+    invalidate()
+    # Other processes must not reload before the change is visible to them
+    transaction.on_commit(bump_version)
@@ -0,0 +1,153 @@
+"""HTTP client used by the thermal worker to pull frames from the sensor Pi.
+
+One keep-alive session is reused for every request. When the API supports it,
+the client asks only for frames newer than the last one it saw (``?since=``)
+and lets the server hold the request until a frame is ready (``?wait=``).
+Polling follows the sensor's frame rate, and failures back off exponentially
+with jitter so a flaky link doesn't stall or hammer the Pi. Frame ids start
+again at 1 when the API restarts; the client notices from the API's
+``X-Boot-Id`` header and follows the new numbering.
+"""
+import hashlib
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 3
+READ_TIMEOUT = 5
+BACKOFF_START = 0.5
+BACKOFF_MAX = 30
+
+
+class FrameClient:
+    """Fetch thermal frames from ``url`` with ``decode(response) -> dict``.
+
+    ``decode`` returns a dict with at least a ``frame`` key and, if the API
+    provides them, ``frame_id`` and ``fps``. Without a frame id, unchanged
+    frames are detected by comparing response bodies.
+    """
+
+    def __init__(self, url, decode, fps=None, max_fps=None, conditional=False, long_poll=0):
+        self.url = url
+        self.decode = decode
+        self.fps = fps
+        self.max_fps = max_fps
+        self.conditional = conditional
+        self.long_poll = long_poll
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.last_id = 0
+        self.boot_id = None
+        self._last_digest = None
+        self._last_request = 0
+        self._delay = 0
+        self.failures = 0
+        self.fetched = 0
+        self.skipped = 0
+        self.unchanged = 0
+        self.failed = 0
+
+    @property
+    def interval(self):
+        """Seconds between polls, from the sensor rate capped by ``max_fps``"""
+        fps = self.fps or 1
+        if self.max_fps:
+            fps = min(fps, self.max_fps)
+        return 1.0 / fps
+
+    def fetch(self):
+        """Return the next new frame dict, or None if there was none or the request failed"""
+        params = {}
+        if self.conditional:
+            params["since"] = self.last_id
+            if self.long_poll:
+                params["wait"] = self.long_poll
+        self._last_request = time.monotonic()
+        try:
+            response = self.session.get(self.url, params=params,
+                                        timeout=(CONNECT_TIMEOUT, READ_TIMEOUT + self.long_poll))
+            if self._restarted(response.headers.get("X-Boot-Id")) and response.status_code == 204:
+                # Asked for frames after an id of the previous run; ask again right away
+                self._succeeded(0)
+                return None
+            if response.status_code == 204:
+                self.unchanged += 1
+                self._succeeded(self.interval / 2)
+                return None
+            response.raise_for_status()
+            frame = self.decode(response)
+        except (requests.RequestException, ValueError) as e:
+            self._failed(e)
+            return None
+
+        if frame.get("fps"):
+            self.fps = frame["fps"]
+
+        frame_id = frame.get("frame_id")
+        if frame_id is None:
+            digest = hashlib.blake2b(response.content, digest_size=16).digest()
+            if digest == self._last_digest:
+                self.unchanged += 1
+                self._succeeded(self.interval / 2)
+                return None
+            self._last_digest = digest
+        else:
+            if frame_id <= self.last_id and not self.conditional:
+                self.unchanged += 1
+                self._succeeded(self.interval / 2)
+                return None
+            if self.last_id and frame_id > self.last_id + 1:
+                self.skipped += frame_id - self.last_id - 1
+            self.last_id = frame_id
+
+        self.fetched += 1
+        self._succeeded(self.interval)
+        return frame
+
+    def _restarted(self, boot_id):
+        """True (and the frame id reset) if ``boot_id`` shows the API restarted since the last response"""
+        restarted = boot_id is not None and self.boot_id is not None and boot_id != self.boot_id
+        if boot_id is not None:
+            self.boot_id = boot_id
+        if restarted:
+            print("Thermal API restarted, following its new frame ids")
+            self.last_id = 0
+            self._last_digest = None
+        return restarted
+
+    def _succeeded(self, delay):
+        self.failures = 0
+        self._delay = delay
+
+    def _failed(self, error):
+        self.failed += 1
+        self.failures += 1
+        backoff = min(BACKOFF_MAX, BACKOFF_START * 2 ** (self.failures - 1))
+        # Jitter keeps several workers from retrying in lockstep
+        self._delay = random.uniform(backoff / 2, backoff)
+        print(f"Error fetching thermal frame (retry in {self._delay:.1f}s): {error}")
+
+    def wait(self):
+        """Sleep until the next poll is due"""
+        remaining = self._delay - (time.monotonic() - self._last_request)
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def stats(self):
+        return {
+            "fetched": self.fetched,
+            "skipped": self.skipped,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "fps": self.fps,
+            "interval": round(self.interval, 3),
+        }
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from thermal.probes import ProbeSampler
+import numpy as np
+import time
+
+
+def loop_probe_averages(grid_data, positions, half=1):
+    """The original nested-loop neighbourhood average, kept as the benchmark baseline"""
+    result = []
+    for _, row, col in positions:
+        temp_sum = 0
+        temp_count = 0
+        for r in range(max(0, row - half), min(len(grid_data), row + half + 1)):
+            for c in range(max(0, col - half), min(len(grid_data[0]), col + half + 1)):
+                temp_sum += grid_data[r][c]
+                temp_count += 1
+        result.append(temp_sum / temp_count)
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Compare vectorized probe extraction with the nested-loop version'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--probes',
+            type=int,
+            nargs='+',
+            default=[10, 25, 50, 100],
+            help='Probe counts to measure (default: 10 25 50 100)'
+        )
+        parser.add_argument(
+            '--kernel',
+            type=int,
+            default=3,
+            help='Kernel size (default: 3)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1000,
+            help='Timed runs per measurement (default: 1000)'
+        )
+
+    def timed(self, func, repeat):
+        func()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat * 1e6
+
+    def handle(self, *args, **options):
+        shape = tuple(getattr(settings, 'THERMAL_FRAME_SHAPE', (62, 80)))
+        rng = np.random.default_rng(0)
+        grid = rng.uniform(40, 70, shape).astype(np.float32)
+        kernel = options['kernel']
+        repeat = max(1, options['repeat'])
+
+        self.stdout.write(f'Grid {shape[0]}x{shape[1]}, kernel {kernel}x{kernel}, {repeat} runs')
+        for count in options['probes']:
+            positions = [(f'probe{i + 1}', int(rng.integers(shape[0])), int(rng.integers(shape[1])))
+                         for i in range(count)]
+
+            # The old code converted the grid to nested lists on every save
+            loop_us = self.timed(lambda: loop_probe_averages(grid.tolist(), positions, kernel // 2), repeat)
+            build_us = self.timed(lambda: ProbeSampler(positions, shape, kernel), repeat)
+            sampler = ProbeSampler(positions, shape, kernel)
+            sample_us = self.timed(lambda: sampler.sample(grid), repeat)
+
+            if not np.allclose(sampler.sample(grid), loop_probe_averages(grid.tolist(), positions, kernel // 2)):
+                self.stdout.write(self.style.ERROR(f'{count} probes: results differ'))
+
+            self.stdout.write(
+                f'{count:>4} probes  loop {loop_us:>9.1f} us  vectorized {sample_us:>7.1f} us  '
+                f'(index build {build_us:.1f} us, cached)  speedup {loop_us / sample_us:.1f}x'
+            )
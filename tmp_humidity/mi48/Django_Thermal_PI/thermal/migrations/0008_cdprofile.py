@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thermal', '0007_alter_probeconfiguration_checked_probes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CDProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('frame_id', models.BigIntegerField(default=0)),
+                ('window_rows', models.IntegerField()),
+                ('window_seconds', models.FloatField()),
+                ('mean_temperature', models.FloatField()),
+                ('min_temperature', models.FloatField()),
+                ('max_temperature', models.FloatField()),
+                ('profile', models.JSONField(default=list)),
+                ('streak_count', models.IntegerField(default=0)),
+                ('streaks', models.JSONField(default=list)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:05
+
+import os
+from zoneinfo import ZoneInfo
+
+import jdatetime
+from django.conf import settings
+from django.db import migrations, models
+import django.utils.timezone
+
+# Frozen copy of the file name parsing of thermal/snapshots.py at the time of this migration,
+# so later changes there don't change what it does
+IRAN_TZ = ZoneInfo("Asia/Tehran")
+
+
+def parse_log_filename(filename):
+    """(timestamp, temperature) from a "<jalali date>_<time>_<temp>.jpg" name, or None"""
+    try:
+        date, time, temp = filename[:-len('.jpg')].split('_')
+        year, month, day = (int(part) for part in date.split('-'))
+        hour, minute, second = (int(part) for part in time.split('-'))
+        timestamp = jdatetime.datetime(year, month, day, hour, minute, second).togregorian()
+        return timestamp.replace(tzinfo=IRAN_TZ), float(temp)
+    except ValueError:
+        return None
+
+
+def index_existing_logs(apps, schema_editor):
+    """Index the images already in static/logs; thumbnails are left to import_log_images"""
+    ThermalSnapshot = apps.get_model('thermal', 'ThermalSnapshot')
+    log_dir = os.path.join(settings.BASE_DIR, 'static', 'logs')
+    if not os.path.isdir(log_dir):
+        return
+    new = []
+    skipped = 0
+    for entry in os.scandir(log_dir):
+        if not entry.is_file() or not entry.name.endswith('.jpg'):
+            continue
+        parsed = parse_log_filename(entry.name)
+        if parsed is None:
+            skipped += 1
+            continue
+        timestamp, temperature = parsed
+        new.append(ThermalSnapshot(path=f'logs/{entry.name}', timestamp=timestamp, temperature=temperature))
+    ThermalSnapshot.objects.bulk_create(new, batch_size=500)
+    if new or skipped:
+        print(f"\n  Indexed {len(new)} log images, skipped {skipped} with unknown names")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thermal', '0010_probedata_timestamp_index_probe_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThermalSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('thumbnail', models.CharField(blank=True, max_length=255)),
+                ('row', models.IntegerField(blank=True, null=True)),
+                ('col', models.IntegerField(blank=True, null=True)),
+                ('temperature', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.RunPython(index_existing_logs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 13:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thermal', '0012_thermalsnapshot_frame'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='probedata',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False),
+        ),
+    ]
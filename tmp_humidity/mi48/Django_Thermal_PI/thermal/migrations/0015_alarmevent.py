@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thermal', '0014_probedata_sample_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlarmEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('rule', models.CharField(max_length=64)),
+                ('target', models.CharField(max_length=32)),
+                ('state', models.CharField(choices=[('raised', 'Raised'), ('cleared', 'Cleared')], max_length=7)),
+                ('value', models.FloatField(blank=True, null=True)),
+                ('manual_mode', models.BooleanField(default=False)),
+                ('message', models.CharField(blank=True, max_length=255)),
+                ('frame_id', models.BigIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'indexes': [models.Index(fields=['rule', 'target', 'timestamp'], name='alarm_event_rule_target')],
+            },
+        ),
+    ]
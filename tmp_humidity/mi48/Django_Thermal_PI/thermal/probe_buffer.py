@@ -0,0 +1,300 @@
+"""Write-behind buffer for ProbeData records.
+
+Every probe save (the browser every 10 s, the worker every SAVE_INTERVAL) used
+to be one INSERT plus the rollup updates, each a few fsyncs of the SQLite file
+on the SD card, in the request or acquisition path. Records are now collected
+here and written by a background thread with one bulk_create, in the same
+transaction as their rollups, once THERMAL_PROBE_BUFFER_SIZE records are
+waiting or the oldest has waited THERMAL_PROBE_BUFFER_SECONDS. When the
+database is unavailable (e.g. locked) the write is retried later with the
+records kept; a record the database rejects is dropped on its own.
+
+Until they are written, records are also appended to a spill file (one JSON
+line each) in THERMAL_PROBE_SPILL_DIR, locked by the process that owns it. A
+buffer starting up writes the spill files of processes that died (unlocked
+files) to the database, so records are not lost when a process crashes or is
+killed. Lines are fsynced only with THERMAL_PROBE_BUFFER_FSYNC, so a power cut
+can still lose the last ones.
+
+Probes are sampled once per THERMAL_SAVE_INTERVAL slot. Entries carry the
+start of their slot as ``sample_time`` (unique in the table), and an entry
+for a slot that already has a record, written or pending, is skipped, so
+several sources (the worker, any number of open pages) still give one record
+per slot.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from .models import ProbeData
+from .probe_storage import probe_record_fields
+from .rollups import update_rollups
+
+BUFFER_SIZE = getattr(settings, 'THERMAL_PROBE_BUFFER_SIZE', 30)
+BUFFER_SECONDS = getattr(settings, 'THERMAL_PROBE_BUFFER_SECONDS', 60)
+SPILL_DIR = getattr(settings, 'THERMAL_PROBE_SPILL_DIR', os.path.join(settings.BASE_DIR, 'probe_spill'))
+FSYNC = getattr(settings, 'THERMAL_PROBE_BUFFER_FSYNC', False)
+SAVE_INTERVAL = getattr(settings, 'THERMAL_SAVE_INTERVAL', 60)
+RETRY_SECONDS = 10
+
+
+def sample_slot(timestamp, interval=SAVE_INTERVAL):
+    """Start (UTC) of the ``interval``-second sampling slot containing ``timestamp`` (epoch seconds)"""
+    return datetime.fromtimestamp(timestamp // interval * interval, dt_timezone.utc)
+
+
+def _new_slots(entries):
+    """``entries`` without those for a slot already in the table or earlier in the list"""
+    slots = {entry['sample_time'] for entry in entries if entry.get('sample_time')}
+    taken = set(ProbeData.objects.filter(sample_time__in=slots).values_list('sample_time', flat=True))
+    new = []
+    for entry in entries:
+        slot = entry.get('sample_time')
+        if slot:
+            if slot in taken:
+                continue
+            taken.add(slot)
+        new.append(entry)
+    return new
+
+
+def insert_probe_records(entries):
+    """Write probe entries with one bulk_create and add them to the rollups, in one transaction.
+
+    An entry holds the ProbeData fields: timestamp, sample_time (optional),
+    humidity, temperature, active_formula, probe_count and the unpacked
+    probes_data dict. Entries for slots that already have a record are left
+    out; returns the records written.
+    """
+    with transaction.atomic():
+        records = [
+            ProbeData(
+                timestamp=entry['timestamp'],
+                sample_time=entry.get('sample_time'),
+                humidity=entry['humidity'],
+                temperature=entry['temperature'],
+                active_formula=entry['active_formula'],
+                probe_count=entry['probe_count'],
+                **probe_record_fields(entry['probes_data'])
+            )
+            for entry in _new_slots(entries)
+        ]
+        ProbeData.objects.bulk_create(records, batch_size=500)
+        update_rollups(records)
+    return records
+
+
+def _dump(entry):
+    sample_time = entry.get('sample_time')
+    return json.dumps({**entry, 'timestamp': entry['timestamp'].isoformat(),
+                       'sample_time': sample_time.isoformat() if sample_time else None})
+
+
+def _load(line):
+    entry = json.loads(line)
+    entry['timestamp'] = datetime.fromisoformat(entry['timestamp'])
+    if entry.get('sample_time'):
+        entry['sample_time'] = datetime.fromisoformat(entry['sample_time'])
+    return entry
+
+
+def _read_spill(f):
+    """Entries of a spill file; a line cut short by a crash is skipped"""
+    f.seek(0)
+    entries = []
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            entries.append(_load(line))
+        except (ValueError, KeyError) as e:
+            print(f"Skipping unreadable line of {f.name}: {e}")
+    return entries
+
+
+class ProbeBuffer:
+    """Collects probe entries and writes them in batches from a background thread"""
+
+    def __init__(self, spill_dir=SPILL_DIR, size=BUFFER_SIZE, max_age=BUFFER_SECONDS, fsync=FSYNC):
+        self.size = size
+        self.max_age = max_age
+        self.fsync = fsync
+        self.pending = []
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self._first_added = None
+        self._retry_at = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._due = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+
+        os.makedirs(spill_dir, exist_ok=True)
+        self.spill_path = os.path.join(spill_dir, f'probe_buffer_{os.getpid()}.jsonl')
+        self._spill = open(self.spill_path, 'a+')
+        fcntl.flock(self._spill, fcntl.LOCK_EX)
+        self._recover(spill_dir)
+
+        self._thread = threading.Thread(target=self._run, name='probe-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _recover(self, spill_dir):
+        """Take over the entries of spill files left by processes that are gone"""
+        # A file under our own name is from an earlier process that had the same pid
+        self.pending = _read_spill(self._spill)
+        for path in sorted(glob.glob(os.path.join(spill_dir, 'probe_buffer_*.jsonl'))):
+            if path == self.spill_path:
+                continue
+            with open(path) as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Its process is still running
+                if os.fstat(f.fileno()).st_nlink == 0:
+                    continue  # Taken over by another process meanwhile
+                entries = _read_spill(f)
+                # Copied into our own spill file before the old one is removed
+                self._write_lines(entries)
+                self.pending.extend(entries)
+                os.remove(path)
+        if self.pending:
+            print(f"Recovered {len(self.pending)} unsaved probe records")
+            self._first_added = time.monotonic()
+            self._due.set()
+
+    def _write_lines(self, entries):
+        for entry in entries:
+            self._spill.write(_dump(entry) + '\n')
+        self._spill.flush()
+        if self.fsync:
+            os.fsync(self._spill.fileno())
+
+    def add(self, entry):
+        """Queue a probe entry (see insert_probe_records) for writing; False if its slot is already queued"""
+        with self._lock:
+            slot = entry.get('sample_time')
+            if slot and any(pending.get('sample_time') == slot for pending in self.pending):
+                return False
+            self._write_lines([entry])
+            self.pending.append(entry)
+            if self._first_added is None:
+                self._first_added = time.monotonic()
+            if len(self.pending) >= self.size:
+                self._due.set()
+            return True
+
+    def _flush_due(self):
+        with self._lock:
+            if not self.pending or time.monotonic() < self._retry_at:
+                return False
+            return len(self.pending) >= self.size or time.monotonic() - self._first_added >= self.max_age
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._due.wait(1.0)
+            self._due.clear()
+            if self._flush_due():
+                self.flush()
+                # This thread's connection is not closed by a request cycle
+                connection.close()
+
+    def flush(self):
+        """Write all pending entries now; returns how many were written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self.pending = self.pending, []
+            if not batch:
+                return 0
+            try:
+                written = len(insert_probe_records(batch))
+            except OperationalError as e:
+                self.errors += 1
+                print(f"Error writing {len(batch)} buffered probe records, retrying in {RETRY_SECONDS}s: {e}")
+                with self._lock:
+                    self.pending = batch + self.pending
+                    self._retry_at = time.monotonic() + RETRY_SECONDS
+                return 0
+            except Exception as e:
+                print(f"Error writing {len(batch)} buffered probe records, writing them one by one: {e}")
+                written = self._insert_each(batch)
+            with self._lock:
+                # The spill file now only needs the entries added during the write
+                self._spill.seek(0)
+                self._spill.truncate()
+                self._write_lines(self.pending)
+                self._first_added = time.monotonic() if self.pending else None
+            self.written += written
+            self.batches += 1
+            return written
+
+    def _insert_each(self, batch):
+        written = 0
+        for entry in batch:
+            try:
+                written += len(insert_probe_records([entry]))
+            except Exception as e:
+                self.errors += 1
+                print(f"Dropped probe record of {entry['timestamp']}: {e}")
+        return written
+
+    def close(self):
+        """Stop the background thread and write what is pending"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._due.set()
+        self._thread.join(timeout=30)
+        self._retry_at = 0
+        self.flush()
+        with self._lock:
+            if not self.pending:
+                os.remove(self.spill_path)
+            self._spill.close()
+
+    def stats(self):
+        return {
+            'pending': len(self.pending),
+            'written': self.written,
+            'batches': self.batches,
+            'errors': self.errors,
+        }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_probe_buffer():
+    """This process's probe buffer, or None when buffering is off (THERMAL_PROBE_BUFFER_SIZE <= 1)"""
+    global _buffer
+    if BUFFER_SIZE <= 1:
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ProbeBuffer()
+        return _buffer
+
+
+def queue_probe_record(entry):
+    """Save a probe entry through the buffer, or right away when buffering is off.
+
+    Returns False (and saves nothing) when the entry's slot already has a record.
+    """
+    if entry.get('sample_time') and ProbeData.objects.filter(sample_time=entry['sample_time']).exists():
+        return False
+    probe_buffer = get_probe_buffer()
+    if probe_buffer is None:
+        return bool(insert_probe_records([entry]))
+    return probe_buffer.add(entry)
@@ -0,0 +1,64 @@
+"""Compact storage of the per-probe values of a ProbeData record.
+
+By default every probe's position, temperature and humidity is kept in the
+``probes_data`` JSON (about 60-70 bytes per probe). With THERMAL_PACK_PROBE_DATA
+the plain ``probeN`` entries are packed into ``probe_values`` instead, as
+little-endian float32 rows of (number, x, y, temperature, humidity), 20 bytes
+per probe (values come back rounded to 2 decimals); entries of any other
+shape (the avg entry, extra keys) stay in the JSON.
+ProbeData.get_probes_data() merges both back into the original dict.
+"""
+import re
+
+import numpy as np
+from django.conf import settings
+
+PACK_PROBE_DATA = getattr(settings, 'THERMAL_PACK_PROBE_DATA', False)
+PACKED_DTYPE = np.dtype('<f4')
+PACKED_FIELDS = ('x', 'y', 'temperature', 'humidity')
+PROBE_KEY = re.compile(r'probe(\d+)$')
+
+
+def _packable(key, value):
+    match = PROBE_KEY.match(key)
+    if match is None or not isinstance(value, dict) or set(value) != set(PACKED_FIELDS):
+        return None
+    x, y, temperature, humidity = (value[field] for field in PACKED_FIELDS)
+    if not all(type(v) is int for v in (x, y)) or not all(type(v) in (int, float) for v in (temperature, humidity)):
+        return None
+    return int(match.group(1))
+
+
+def pack_probes(probes_data):
+    """Split ``probes_data`` into (packed bytes or None, remaining JSON dict)"""
+    rows = []
+    rest = {}
+    for key, value in probes_data.items():
+        number = _packable(key, value)
+        if number is None:
+            rest[key] = value
+        else:
+            rows.append((number, *(value[field] for field in PACKED_FIELDS)))
+    if not rows:
+        return None, rest
+    return np.asarray(rows, dtype=PACKED_DTYPE).tobytes(), rest
+
+
+def unpack_probes(packed):
+    """{'probeN': {'x', 'y', 'temperature', 'humidity'}} from packed bytes"""
+    if not packed:
+        return {}
+    rows = np.frombuffer(bytes(packed), dtype=PACKED_DTYPE).reshape(-1, 1 + len(PACKED_FIELDS))
+    return {
+        f'probe{int(number)}': {'x': int(x), 'y': int(y), 'temperature': round(float(temperature), 2),
+                                'humidity': round(float(humidity), 2)}
+        for number, x, y, temperature, humidity in rows
+    }
+
+
+def probe_record_fields(probes_data, pack=PACK_PROBE_DATA):
+    """``probes_data``/``probe_values`` keyword arguments for creating a ProbeData record"""
+    if not pack:
+        return {'probes_data': probes_data}
+    packed, rest = pack_probes(probes_data)
+    return {'probes_data': rest, 'probe_values': packed}
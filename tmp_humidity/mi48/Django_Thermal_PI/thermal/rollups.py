@@ -0,0 +1,154 @@
+"""Tiered retention for ProbeData.
+
+Raw ProbeData rows are kept for THERMAL_RAW_RETENTION_DAYS. Every saved record
+is also folded into minute, hour and day ProbeDataRollup rows (count, sum,
+min and max of temperature and humidity) with one UPDATE per bucket, so long
+ranges can be charted from a few hundred aggregate rows and raw rows can be
+pruned (see the prune_probe_data command). Buckets follow Iran local time.
+"""
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Min, Value
+from django.db.models.functions import Greatest, Least
+from django.utils import timezone
+
+from .models import ProbeData, ProbeDataRollup
+
+IRAN_TZ = ZoneInfo("Asia/Tehran")
+RESOLUTIONS = (ProbeDataRollup.MINUTE, ProbeDataRollup.HOUR, ProbeDataRollup.DAY)
+
+# Days to keep; None keeps forever
+RAW_RETENTION_DAYS = getattr(settings, 'THERMAL_RAW_RETENTION_DAYS', 30)
+ROLLUP_RETENTION_DAYS = {
+    ProbeDataRollup.MINUTE: getattr(settings, 'THERMAL_MINUTE_ROLLUP_RETENTION_DAYS', 90),
+    ProbeDataRollup.HOUR: getattr(settings, 'THERMAL_HOUR_ROLLUP_RETENTION_DAYS', 730),
+    ProbeDataRollup.DAY: getattr(settings, 'THERMAL_DAY_ROLLUP_RETENTION_DAYS', None),
+}
+
+
+def bucket_start(timestamp, resolution):
+    """Start of the minute/hour/day (Iran time) containing ``timestamp``"""
+    local = timestamp.astimezone(IRAN_TZ)
+    if resolution == ProbeDataRollup.MINUTE:
+        return local.replace(second=0, microsecond=0)
+    if resolution == ProbeDataRollup.HOUR:
+        return local.replace(minute=0, second=0, microsecond=0)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def summarize(samples):
+    """Aggregate (timestamp, temperature, humidity) samples per (resolution, bucket)"""
+    buckets = {}
+    for timestamp, temperature, humidity in samples:
+        for resolution in RESOLUTIONS:
+            key = (resolution, bucket_start(timestamp, resolution))
+            agg = buckets.get(key)
+            if agg is None:
+                buckets[key] = {
+                    'count': 1,
+                    'temperature_sum': temperature, 'temperature_min': temperature, 'temperature_max': temperature,
+                    'humidity_sum': humidity, 'humidity_min': humidity, 'humidity_max': humidity,
+                }
+            else:
+                agg['count'] += 1
+                agg['temperature_sum'] += temperature
+                agg['temperature_min'] = min(agg['temperature_min'], temperature)
+                agg['temperature_max'] = max(agg['temperature_max'], temperature)
+                agg['humidity_sum'] += humidity
+                agg['humidity_min'] = min(agg['humidity_min'], humidity)
+                agg['humidity_max'] = max(agg['humidity_max'], humidity)
+    return buckets
+
+
+def _merge(resolution, bucket, agg):
+    rollups = ProbeDataRollup.objects.filter(resolution=resolution, bucket=bucket)
+    return rollups.update(
+        count=F('count') + agg['count'],
+        temperature_sum=F('temperature_sum') + agg['temperature_sum'],
+        temperature_min=Least('temperature_min', Value(agg['temperature_min'])),
+        temperature_max=Greatest('temperature_max', Value(agg['temperature_max'])),
+        humidity_sum=F('humidity_sum') + agg['humidity_sum'],
+        humidity_min=Least('humidity_min', Value(agg['humidity_min'])),
+        humidity_max=Greatest('humidity_max', Value(agg['humidity_max'])),
+    )
+
+
+def add_to_rollups(samples):
+    """Fold (timestamp, temperature, humidity) samples into the rollups, one write per touched bucket"""
+    for (resolution, bucket), agg in summarize(samples).items():
+        with transaction.atomic():
+            if _merge(resolution, bucket, agg):
+                continue
+            try:
+                with transaction.atomic():
+                    ProbeDataRollup.objects.create(resolution=resolution, bucket=bucket, **agg)
+            except IntegrityError:
+                # Another process created the bucket in the meantime
+                _merge(resolution, bucket, agg)
+
+
+def update_rollups(records):
+    """Add saved ProbeData records to the rollups; errors are printed, never raised"""
+    try:
+        add_to_rollups((record.timestamp, record.temperature, record.humidity) for record in records)
+    except Exception as e:
+        print(f"Error updating probe data rollups: {e}")
+
+
+def rebuild_rollups(since=None, chunk_size=5000):
+    """Recompute rollups from raw rows, starting at the day of ``since`` (default: oldest raw row).
+
+    Rollups of earlier days are left alone, since their raw rows may already be pruned.
+    Returns the number of raw rows replayed.
+    """
+    if since is None:
+        since = ProbeData.objects.aggregate(first=Min('timestamp'))['first']
+        if since is None:
+            return 0
+    since = bucket_start(since, ProbeDataRollup.DAY)
+
+    rows = 0
+    with transaction.atomic():
+        ProbeDataRollup.objects.filter(bucket__gte=since).delete()
+        samples = (ProbeData.objects.filter(timestamp__gte=since).order_by('timestamp')
+                   .values_list('timestamp', 'temperature', 'humidity'))
+        chunk = []
+        for sample in samples.iterator(chunk_size=chunk_size):
+            chunk.append(sample)
+            if len(chunk) >= chunk_size:
+                add_to_rollups(chunk)
+                rows += len(chunk)
+                chunk = []
+        add_to_rollups(chunk)
+        rows += len(chunk)
+    return rows
+
+
+def prune(now=None, raw_days=RAW_RETENTION_DAYS, rollup_days=None, dry_run=False, batch_size=5000):
+    """Delete raw rows and rollups past their retention; returns {tier: rows deleted (or due)}"""
+    now = now or timezone.now()
+    rollup_days = {**ROLLUP_RETENTION_DAYS, **(rollup_days or {})}
+    deleted = {}
+
+    if raw_days is not None:
+        expired = ProbeData.objects.filter(timestamp__lt=now - timedelta(days=raw_days))
+        if dry_run:
+            deleted['raw'] = expired.count()
+        else:
+            # Delete in batches so the table isn't locked for one huge statement
+            deleted['raw'] = 0
+            while True:
+                ids = list(expired.values_list('id', flat=True)[:batch_size])
+                if not ids:
+                    break
+                deleted['raw'] += ProbeData.objects.filter(id__in=ids).delete()[0]
+
+    for resolution, days in rollup_days.items():
+        if days is None:
+            continue
+        expired = ProbeDataRollup.objects.filter(resolution=resolution, bucket__lt=now - timedelta(days=days))
+        deleted[resolution] = expired.count() if dry_run else expired.delete()[0]
+    return deleted
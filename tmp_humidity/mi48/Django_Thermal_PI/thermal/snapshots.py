@@ -0,0 +1,143 @@
+"""Index of the saved log images (static/logs) in the ThermalSnapshot table.
+
+Log pages used to list and parse the whole directory on every request. Each
+saved image now gets a ThermalSnapshot row (timestamp, probe position,
+temperature) and a small thumbnail in static/logs/thumbs, so the pages run an
+indexed, paginated query. New images are rendered from the raw frame in
+memory and encoded once; the frame itself is kept next to the image as a .npy
+file for later reanalysis. Images saved before the table existed are picked up
+by migration 0011 and the import_log_images command, which parse the
+"<jalali date>_<time>_<temp>.jpg" file names.
+"""
+import io
+import os
+from zoneinfo import ZoneInfo
+
+import cv2
+import jdatetime
+import numpy as np
+from django.conf import settings
+from PIL import Image
+
+from .file_writer import atomic_write
+
+IRAN_TZ = ZoneInfo("Asia/Tehran")
+STATIC_DIR = os.path.join(settings.BASE_DIR, 'static')
+LOG_DIR = os.path.join(STATIC_DIR, 'logs')
+THUMBNAIL_DIR = os.path.join(LOG_DIR, 'thumbs')
+THUMBNAIL_SIZE = tuple(getattr(settings, 'THERMAL_THUMBNAIL_SIZE', (160, 120)))
+PAGE_SIZE = getattr(settings, 'THERMAL_LOG_PAGE_SIZE', 50)
+
+
+def log_filename(timestamp, temperature):
+    """File name of a log image: Jalali date and time (Iran) and the temperature"""
+    jalali_dt = jdatetime.datetime.fromgregorian(datetime=timestamp.astimezone(IRAN_TZ))
+    return f"{jalali_dt.strftime('%Y-%m-%d_%H-%M-%S')}_{temperature:.1f}.jpg"
+
+
+def parse_log_filename(filename):
+    """(timestamp, temperature) from a log image name, or None if it doesn't follow the pattern"""
+    if not filename.endswith('.jpg'):
+        return None
+    try:
+        date, time, temp = filename[:-len('.jpg')].split('_')
+        year, month, day = (int(part) for part in date.split('-'))
+        hour, minute, second = (int(part) for part in time.split('-'))
+        timestamp = jdatetime.datetime(year, month, day, hour, minute, second).togregorian()
+        return timestamp.replace(tzinfo=IRAN_TZ), float(temp)
+    except ValueError:
+        return None
+
+
+def make_thumbnail(filename):
+    """Write the thumbnail of static/logs/<filename>; returns its path relative to static/"""
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    with Image.open(os.path.join(LOG_DIR, filename)) as img:
+        img.thumbnail(THUMBNAIL_SIZE)
+        img.convert('RGB').save(os.path.join(THUMBNAIL_DIR, filename), 'JPEG', quality=80)
+    return f'logs/thumbs/{filename}'
+
+
+def mark_cell(image, row, col, shape):
+    """Draw a white box around grid cell (row, col) of a rendered ``shape`` frame, in place"""
+    height, width = image.shape[:2]
+    cell_width = width / shape[1]
+    cell_height = height / shape[0]
+    top_left = (round(col * cell_width), round(row * cell_height))
+    bottom_right = (round((col + 1) * cell_width), round((row + 1) * cell_height))
+    cv2.rectangle(image, top_left, bottom_right, (255, 255, 255), 2)
+    return image
+
+
+def _encode_jpeg(image, quality):
+    ok, buf = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise ValueError("Could not encode log image")
+    return buf.tobytes()
+
+
+def write_snapshot_files(filename, image, frame, quality):
+    """Write the log image, its thumbnail and the raw frame; returns (thumbnail, raw) paths relative to static/"""
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    atomic_write(os.path.join(LOG_DIR, filename), _encode_jpeg(image, quality))
+
+    height, width = image.shape[:2]
+    scale = min(THUMBNAIL_SIZE[0] / width, THUMBNAIL_SIZE[1] / height, 1)
+    thumbnail = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+    atomic_write(os.path.join(THUMBNAIL_DIR, filename), _encode_jpeg(thumbnail, 80))
+
+    raw_name = filename[:-len('.jpg')] + '.npy'
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(frame, dtype=np.float32))
+    atomic_write(os.path.join(LOG_DIR, raw_name), buffer.getvalue())
+    return f'logs/thumbs/{filename}', f'logs/{raw_name}'
+
+
+def record_snapshot(filename, timestamp, temperature, row=None, col=None, frame_id=None, thumbnail='', raw_path=''):
+    """Create (or refresh) the ThermalSnapshot of static/logs/<filename>"""
+    from .models import ThermalSnapshot
+
+    snapshot, _ = ThermalSnapshot.objects.update_or_create(
+        path=f'logs/{filename}',
+        defaults={
+            'timestamp': timestamp,
+            'temperature': temperature,
+            'row': row,
+            'col': col,
+            'frame_id': frame_id,
+            'thumbnail': thumbnail,
+            'raw_path': raw_path,
+        },
+    )
+    return snapshot
+
+
+def import_log_files(snapshot_model, thumbnails=True, log_dir=LOG_DIR):
+    """Index log images that have no row yet; returns (imported, skipped file names).
+
+    ``snapshot_model`` is the model to index into (ThermalSnapshot).
+    """
+    if not os.path.isdir(log_dir):
+        return 0, []
+    known = set(snapshot_model.objects.values_list('path', flat=True))
+    new = []
+    skipped = []
+    for entry in os.scandir(log_dir):
+        if not entry.is_file() or not entry.name.endswith('.jpg') or f'logs/{entry.name}' in known:
+            continue
+        parsed = parse_log_filename(entry.name)
+        if parsed is None:
+            skipped.append(entry.name)
+            continue
+        timestamp, temperature = parsed
+        thumbnail = ''
+        if thumbnails:
+            try:
+                thumbnail = make_thumbnail(entry.name)
+            except OSError as e:
+                print(f"Error creating thumbnail for {entry.name}: {e}")
+        new.append(snapshot_model(path=f'logs/{entry.name}', timestamp=timestamp,
+                                  temperature=temperature, thumbnail=thumbnail))
+    snapshot_model.objects.bulk_create(new, batch_size=500)
+    return len(new), skipped
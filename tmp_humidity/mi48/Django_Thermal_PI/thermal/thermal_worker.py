@@ -1,4 +1,3 @@
-import requests
 from django.http import JsonResponse
 import numpy as np
 import os
@@ -17,16 +16,72 @@ from zoneinfo import ZoneInfo
 
 # Add Django project path to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# frame_codec.py lives next to thermal_api.py
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
 from thermal.views import auto_save_probe_data
+from thermal.frame_bus import FrameBus
+from thermal.frame_client import FrameClient
+from thermal.renderer import ThermalRenderer
+from thermal.file_writer import FileWriter, format_thermal_map
+from thermal.cd_profile import get_cd_buffer, save_cd_profile
+from thermal.alarms import get_alarm_engine, record_alarm_events
+from django.conf import settings
+from frame_codec import decode_frames
+from frame_archive import FrameRecorder
+from frame_replay import ReplayClient, ReplaySensor
 
 DATA_IS_CORRECT = True
 PI_IP = "172.16.15.20"
 PATH = "../static/"
-LAST_SAVE_TIME = time.time()
-SAVE_INTERVAL = 60
+# Probe data is saved from the first frame of every sampling slot (records are unique per slot)
+LAST_SAVE_SLOT = None
+SAVE_INTERVAL = settings.THERMAL_SAVE_INTERVAL
+# Sensor frame rate until the API reports its own; frames are taken at most MAX_FPS times a second
+SENSOR_FPS = 15
+MAX_FPS = 5
+# Let the API hold a request this long for the next frame instead of answering 204
+LONG_POLL = 1.0
+STATS_INTERVAL = 300
+
+# Raw frames shared with the Django process (see thermal/frame_bus.py)
+FRAME_BUS = FrameBus(create=True)
+# Live images are rendered by Django from the frame bus; the worker only keeps a periodic snapshot on disk
+RENDERER = ThermalRenderer(size=settings.THERMAL_IMAGE_SIZE, quality=settings.THERMAL_IMAGE_QUALITY)
+LAST_SNAPSHOT_TIME = 0
+# thermal_map.txt and the snapshot are encoded and replaced atomically off the fetch loop
+WRITER = FileWriter()
+WRITER.start()
+# Cross-direction profile of every frame, summarized into a CDProfile record every SAVE_INTERVAL
+CD_BUFFER = get_cd_buffer(FRAME_BUS.shape[1])
+# Alarm rules (THERMAL_ALARM_RULES) evaluated on every frame
+ALARMS = get_alarm_engine()
+# Raw frames kept on disk for later analysis (see frame_archive.py)
+ARCHIVE = FrameRecorder(
+    settings.THERMAL_ARCHIVE_DIR,
+    interval=settings.THERMAL_ARCHIVE_INTERVAL,
+    max_bytes=settings.THERMAL_ARCHIVE_MAX_BYTES,
+    max_age_days=settings.THERMAL_ARCHIVE_MAX_DAYS,
+) if settings.THERMAL_ARCHIVE_DIR else None
+
+
+def decode_response(response):
+    return decode_frames(response.content)[0]
+
+
+# THERMAL_REPLAY=<recording> feeds recorded frames instead of the sensor Pi (see frame_replay.py),
+# played THERMAL_REPLAY_SPEED times as fast (0 = as fast as possible)
+REPLAY = os.environ.get("THERMAL_REPLAY")
+if REPLAY:
+    CLIENT = ReplayClient(
+        ReplaySensor(REPLAY, FRAME_BUS.shape, fps=SENSOR_FPS, speed=float(os.environ.get("THERMAL_REPLAY_SPEED", 1))),
+        max_fps=MAX_FPS,
+    )
+else:
+    CLIENT = FrameClient(f"http://{PI_IP}:5000/temperature.bin", decode_response,
+                         fps=SENSOR_FPS, max_fps=MAX_FPS, conditional=True, long_poll=LONG_POLL)
 
 # Get Iran/Tehran timezone
 IRAN_TZ = ZoneInfo("Asia/Tehran")
@@ -50,47 +105,53 @@ def save_thermal_image(data):
 
     arr = np.array(data["temperature"]).reshape((62, 80))
     arr = np.fliplr(arr)
-    with open(f"{PATH}thermal_map.txt", "w") as f:
-        for row in arr:
-            f.write(",".join(f"{temp:.2f}" for temp in row) + "\n")
-
-    norm = cv2.normalize(arr, None, 0, 255, cv2.NORM_MINMAX)
-    img = np.uint8(norm)
-    img_resized = cv2.resize(img, (800, 620), interpolation=cv2.INTER_LINEAR)
-    color_img = cv2.applyColorMap(img_resized, cv2.COLORMAP_INFERNO)
-    cv2.imwrite(f"{PATH}thermal_image.jpg", color_img)
-    
+    timestamp = time.time()
+    frame_id = FRAME_BUS.publish(arr, timestamp)
+    CD_BUFFER.add_frame(frame_id, timestamp, arr)
+    record_alarm_events(ALARMS.evaluate_frame(arr, timestamp, frame_id))
+    if ARCHIVE is not None:
+        ARCHIVE.add(arr, frame_id=frame_id)
+    WRITER.submit(f"{PATH}thermal_map.txt", format_thermal_map, arr)
+
     # Use Iran/Tehran timezone for logging
     iran_dt = datetime.now(IRAN_TZ)
     jalali_dt = jdatetime.datetime.fromgregorian(datetime=iran_dt)
-    print(f"New Image Saved - Gregorian: {iran_dt.strftime('%Y-%m-%d %H:%M:%S %Z')} - Jalali: {jalali_dt.strftime('%Y-%m-%d %H:%M:%S')}")
-    
+
+    global LAST_SNAPSHOT_TIME
+    if time.time() - LAST_SNAPSHOT_TIME >= settings.THERMAL_SNAPSHOT_INTERVAL:
+        WRITER.submit(f"{PATH}thermal_image.jpg", RENDERER.render_bytes, arr)
+        LAST_SNAPSHOT_TIME = time.time()
+        print(f"New Image Saved - Gregorian: {iran_dt.strftime('%Y-%m-%d %H:%M:%S %Z')} - Jalali: {jalali_dt.strftime('%Y-%m-%d %H:%M:%S')}")
+
     # Auto-save probe data after saving thermal image
-    global LAST_SAVE_TIME
-    current_time = time.time()
-    if current_time - LAST_SAVE_TIME >= SAVE_INTERVAL:
-        # Auto-save probe data every minute
+    global LAST_SAVE_SLOT
+    save_slot = int(timestamp // SAVE_INTERVAL)
+    if save_slot != LAST_SAVE_SLOT:
+        # Auto-save probe data once per sampling slot
         try:
-            auto_save_probe_data()
-            LAST_SAVE_TIME = time.time()
+            auto_save_probe_data(arr, timestamp)
+            if settings.THERMAL_CD_PROFILE_RECORDS:
+                save_cd_profile(CD_BUFFER)
+            LAST_SAVE_SLOT = save_slot
             print(f"Data saved to database at - Gregorian: {iran_dt.strftime('%Y-%m-%d %H:%M:%S %Z')} - Jalali: {jalali_dt.strftime('%Y-%m-%d %H:%M:%S')}")
         except Exception as e:
             print(f"Error auto-saving probe data: {e}")
 
 
 def api_live_new_data():
+    last_stats = time.time()
     while DATA_IS_CORRECT:
-        try:
-            response = requests.get(f"http://{PI_IP}:5000/temperature", timeout=10)
-            if response.ok:
-                data = response.json()
-                save_thermal_image(data)
-            else:
-                print("Error from API:", response.status_code)
-        except Exception as e:
-            print("Error:", e)
+        frame = CLIENT.fetch()
+        if frame is not None:
+            try:
+                save_thermal_image({"temperature": frame["frame"]})
+            except Exception as e:
+                print("Error:", e)
 
-        time.sleep(0.5)
+        if time.time() - last_stats >= STATS_INTERVAL:
+            print("Frame client stats:", CLIENT.stats())
+            last_stats = time.time()
+        CLIENT.wait()
 
 
 
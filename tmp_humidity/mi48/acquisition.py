@@ -0,0 +1,107 @@
+# acquisition.py
+#
+# Background sensor acquisition for thermal_api.py. A single thread owns the
+# sensor and reads at the configured frame rate; HTTP handlers only look at
+# the frames already in memory, so clients never touch the serial/I2C port.
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class FrameAcquisition:
+    """Continuously read frames into a latest-frame slot and a bounded history.
+
+    ``read_func`` returns a 2D numpy array or None. Each frame is stored as a
+    (frame_id, timestamp, array) tuple. The latest slot is replaced with a
+    single reference assignment, so readers never need a lock.
+    """
+
+    def __init__(self, read_func, fps, history_size=32):
+        self.read_func = read_func
+        self.fps = fps
+        self.history = deque(maxlen=history_size)
+        self.latest = None
+        self.frames = 0
+        self.errors = 0
+        self.measured_fps = 0.0
+        self._new_frame = threading.Condition()
+        self._running = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name="thermal-acquisition", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        interval = 1.0 / self.fps if self.fps else 0
+        error_delay = 0.1
+        while self._running.is_set():
+            started = time.monotonic()
+            try:
+                frame = self.read_func()
+            except Exception as e:
+                frame = None
+                logger.error(f"Error reading sensor frame: {e}")
+
+            if frame is None:
+                self.errors += 1
+                time.sleep(error_delay)
+                error_delay = min(error_delay * 2, 2.0)
+                continue
+            error_delay = 0.1
+
+            self.frames += 1
+            entry = (self.frames, time.time(), frame)
+            self.history.append(entry)
+            self.latest = entry
+            with self._new_frame:
+                self._new_frame.notify_all()
+
+            elapsed = time.monotonic() - started
+            if interval and elapsed < interval:
+                time.sleep(interval - elapsed)
+            frame_time = time.monotonic() - started
+            if frame_time > 0:
+                # Exponential moving average of the achieved frame rate
+                rate = 1.0 / frame_time
+                self.measured_fps = rate if not self.measured_fps else 0.9 * self.measured_fps + 0.1 * rate
+
+    def since(self, frame_id, count=None):
+        """Frames newer than ``frame_id`` still in the history, oldest first"""
+        frames = [entry for entry in list(self.history) if entry[0] > frame_id]
+        return frames[-count:] if count else frames
+
+    def wait_for_frame(self, after_id, timeout=None):
+        """Block until a frame newer than ``after_id`` exists; returns it or None"""
+        latest = self.latest
+        if latest is not None and latest[0] > after_id:
+            return latest
+        with self._new_frame:
+            self._new_frame.wait_for(
+                lambda: self.latest is not None and self.latest[0] > after_id, timeout)
+        latest = self.latest
+        return latest if latest is not None and latest[0] > after_id else None
+
+    def stats(self):
+        latest = self.latest
+        return {
+            "frame_id": latest[0] if latest else 0,
+            "frame_age": round(time.time() - latest[1], 3) if latest else None,
+            "frames": self.frames,
+            "errors": self.errors,
+            "fps": self.fps,
+            "measured_fps": round(self.measured_fps, 2),
+        }
@@ -0,0 +1,341 @@
+# frame_archive.py
+#
+# Append-only archive of raw thermal frames for later analysis.
+#
+# Frames are stored as float16 in one chunk per hour (UTC), named after the
+# chunk start, e.g. 20261019-130000:
+#
+#   <chunk>.raw   header (magic, rows, cols) + frames, appended while the
+#                 chunk is being recorded; readable with np.memmap
+#   <chunk>.idx   one (timestamp float64, frame id uint64) record per frame
+#   <chunk>.npz   the finished chunk: timestamps, frame_ids and the frames
+#                 zlib-compressed in blocks of BLOCK_FRAMES, so reading a
+#                 time range only decompresses the blocks it touches
+#
+# Finished chunks are compressed in a background thread. The oldest chunks
+# are deleted once the archive exceeds max_bytes or max_age_days, so it fits
+# on the SD card.
+
+import logging
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"THFA"
+# magic, dtype code (2 = float16), reserved, rows, cols
+HEADER = struct.Struct("<4sBBHH")
+HEADER_SIZE = 32
+DTYPE = np.dtype("<f2")
+INDEX_DTYPE = np.dtype([("timestamp", "<f8"), ("frame_id", "<u8")])
+NAME_FORMAT = "%Y%m%d-%H%M%S"
+CHUNK_SECONDS = 3600
+BLOCK_FRAMES = 300
+MAX_BYTES = 2 * 1024 ** 3
+MAX_AGE_DAYS = 30
+
+# One compression/retention pass at a time per process
+_maintenance_lock = threading.Lock()
+
+
+def chunk_name(start):
+    return datetime.fromtimestamp(start, timezone.utc).strftime(NAME_FORMAT)
+
+
+def chunk_start(name):
+    """Unix start time of a chunk from its name, or None for other files"""
+    try:
+        return datetime.strptime(name, NAME_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+
+def _read_header(path):
+    with open(path, "rb") as f:
+        magic, code, _, rows, cols = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or code != 2:
+        raise ValueError(f"{path} is not a thermal frame archive chunk")
+    return rows, cols
+
+
+def _open_raw(directory, name):
+    """(index, memmapped frames) of an unfinished chunk, cut to the frames present in both files"""
+    raw_path = os.path.join(directory, name + ".raw")
+    rows, cols = _read_header(raw_path)
+    index = np.fromfile(os.path.join(directory, name + ".idx"), dtype=INDEX_DTYPE)
+    frame_size = rows * cols * DTYPE.itemsize
+    count = min(len(index), (os.path.getsize(raw_path) - HEADER_SIZE) // frame_size)
+    if count == 0:
+        return index[:0], np.empty((0, rows, cols), dtype=DTYPE)
+    frames = np.memmap(raw_path, dtype=DTYPE, mode="r", offset=HEADER_SIZE, shape=(count, rows, cols))
+    return index[:count], frames
+
+
+def _chunk_files(directory):
+    """{chunk name: [paths]} of everything in the archive directory"""
+    chunks = {}
+    if not os.path.isdir(directory):
+        return chunks
+    for entry in os.scandir(directory):
+        name, ext = os.path.splitext(entry.name)
+        if ext in (".raw", ".idx", ".npz") and chunk_start(name) is not None:
+            chunks.setdefault(name, []).append(entry.path)
+    return chunks
+
+
+def seal_chunk(directory, name, block_frames=BLOCK_FRAMES):
+    """Compress an unfinished chunk into <name>.npz and remove its .raw/.idx files"""
+    index, frames = _open_raw(directory, name)
+    arrays = {
+        "timestamps": index["timestamp"],
+        "frame_ids": index["frame_id"],
+        "shape": np.array(frames.shape[1:]),
+        "block_frames": np.array(block_frames),
+    }
+    for block, first in enumerate(range(0, len(frames), block_frames)):
+        arrays[f"frames_{block}"] = np.asarray(frames[first:first + block_frames])
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, os.path.join(directory, name + ".npz"))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    del frames
+    for ext in (".raw", ".idx"):
+        os.unlink(os.path.join(directory, name + ext))
+
+
+def apply_retention(directory, max_bytes=MAX_BYTES, max_age_days=MAX_AGE_DAYS, before=None, now=None):
+    """Delete the oldest chunks (only those named before ``before``) until the archive fits; returns the names deleted"""
+    chunks = _chunk_files(directory)
+    sizes = {name: sum(os.path.getsize(path) for path in paths) for name, paths in chunks.items()}
+    total = sum(sizes.values())
+    oldest_allowed = (now or time.time()) - max_age_days * 86400 if max_age_days else None
+    deleted = []
+    for name in sorted(chunks):
+        if before is not None and name >= before:
+            break
+        too_old = oldest_allowed is not None and chunk_start(name) < oldest_allowed
+        if not too_old and (not max_bytes or total <= max_bytes):
+            break
+        for path in chunks[name]:
+            os.unlink(path)
+        total -= sizes[name]
+        deleted.append(name)
+    return deleted
+
+
+class FrameRecorder:
+    """Append frames to the archive, at most one per ``interval`` seconds.
+
+    ``add`` only appends to buffered files (flushed every ``flush_interval``
+    seconds to spare the SD card); compressing finished chunks and deleting
+    old ones happens in a background thread.
+    """
+
+    def __init__(self, directory, interval=1.0, chunk_seconds=CHUNK_SECONDS, compress=True,
+                 block_frames=BLOCK_FRAMES, max_bytes=MAX_BYTES, max_age_days=MAX_AGE_DAYS, flush_interval=10):
+        self.directory = directory
+        self.interval = interval
+        self.chunk_seconds = chunk_seconds
+        self.compress = compress
+        self.block_frames = block_frames
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.flush_interval = flush_interval
+        self.recorded = 0
+        self.errors = 0
+        self._chunk = None  # (name, shape, chunk end)
+        self._raw = None
+        self._idx = None
+        self._last_time = 0.0
+        self._last_flush = 0.0
+        self._maintenance = None
+        self._maintenance_due = threading.Event()
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, frame, timestamp=None, frame_id=0):
+        """Archive ``frame`` unless one was recorded less than ``interval`` ago; returns True if recorded"""
+        timestamp = time.time() if timestamp is None else timestamp
+        if timestamp - self._last_time < self.interval:
+            return False
+        frame = np.asarray(frame)
+        try:
+            if self._chunk is None or timestamp >= self._chunk[2] or frame.shape != self._chunk[1]:
+                self._open(timestamp, frame.shape)
+            self._raw.write(np.ascontiguousarray(frame, dtype=DTYPE).tobytes())
+            self._idx.write(np.array([(timestamp, frame_id)], dtype=INDEX_DTYPE).tobytes())
+            if timestamp - self._last_flush >= self.flush_interval:
+                self.flush()
+                self._last_flush = timestamp
+        except OSError as e:
+            self.errors += 1
+            logger.error(f"Error archiving frame: {e}")
+            return False
+        self._last_time = timestamp
+        self.recorded += 1
+        return True
+
+    def flush(self):
+        if self._raw is not None:
+            self._raw.flush()
+            self._idx.flush()
+
+    def _open(self, timestamp, shape):
+        self._close_files()
+        start = timestamp - timestamp % self.chunk_seconds
+        name = chunk_name(start)
+        raw_path = os.path.join(self.directory, name + ".raw")
+        idx_path = os.path.join(self.directory, name + ".idx")
+
+        resumable = False
+        if os.path.exists(raw_path) and os.path.exists(idx_path):
+            try:
+                resumable = _read_header(raw_path) == tuple(shape)
+            except (OSError, ValueError, struct.error):
+                pass
+        if not resumable and (os.path.exists(raw_path) or os.path.exists(os.path.join(self.directory, name + ".npz"))):
+            # The frame size changed within the hour; start a separate chunk
+            name = chunk_name(timestamp)
+            raw_path = os.path.join(self.directory, name + ".raw")
+            idx_path = os.path.join(self.directory, name + ".idx")
+        # Set before the files exist so maintenance never compresses the chunk being recorded
+        self._chunk = (name, tuple(shape), start + self.chunk_seconds)
+
+        if resumable:
+            # Continue the chunk after a restart, dropping a frame cut short by a crash
+            count = len(_open_raw(self.directory, name)[0])
+            frame_size = shape[0] * shape[1] * DTYPE.itemsize
+            os.truncate(raw_path, HEADER_SIZE + count * frame_size)
+            os.truncate(idx_path, count * INDEX_DTYPE.itemsize)
+            self._raw = open(raw_path, "ab")
+            self._idx = open(idx_path, "ab")
+        else:
+            self._raw = open(raw_path, "wb")
+            self._raw.write(HEADER.pack(MAGIC, 2, 0, shape[0], shape[1]).ljust(HEADER_SIZE, b"\0"))
+            self._idx = open(idx_path, "wb")
+        self._start_maintenance()
+
+    def _close_files(self):
+        for f in (self._raw, self._idx):
+            if f is not None:
+                f.close()
+        self._raw = self._idx = None
+
+    def _start_maintenance(self):
+        self._maintenance_due.set()
+        if self._maintenance is not None and self._maintenance.is_alive():
+            return
+        self._maintenance = threading.Thread(target=self._maintenance_loop, name="frame-archive", daemon=True)
+        self._maintenance.start()
+
+    def _maintenance_loop(self):
+        # Runs again if a chunk was finished while the previous pass was busy
+        while self._maintenance_due.is_set():
+            self._maintenance_due.clear()
+            self.maintain()
+
+    def maintain(self):
+        """Compress finished chunks and apply the retention policy"""
+        # Chunk names sort by time; only chunks older than the one being recorded are touched
+        current = self._chunk[0] if self._chunk else None
+        with _maintenance_lock:
+            try:
+                if self.compress:
+                    for name, paths in sorted(_chunk_files(self.directory).items()):
+                        if (current is None or name < current) and any(path.endswith(".raw") for path in paths):
+                            seal_chunk(self.directory, name, self.block_frames)
+                deleted = apply_retention(self.directory, self.max_bytes, self.max_age_days, before=current)
+                if deleted:
+                    logger.info(f"Frame archive: deleted {len(deleted)} old chunks")
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Error maintaining frame archive: {e}")
+
+    def close(self):
+        """Flush and close the current chunk (it is compressed by the next recorder)"""
+        self._close_files()
+        self._chunk = None
+
+    def stats(self):
+        return {"recorded": self.recorded, "errors": self.errors,
+                "chunk": self._chunk[0] if self._chunk else None}
+
+
+class FrameArchive:
+    """Read frames back from an archive directory by time range"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def chunks(self):
+        """[(start, name, finished)] of all chunks, oldest first"""
+        result = []
+        for name, paths in sorted(_chunk_files(self.directory).items()):
+            finished = any(path.endswith(".npz") for path in paths)
+            result.append((chunk_start(name), name, finished))
+        return result
+
+    def size(self):
+        """Bytes used by the archive"""
+        return sum(os.path.getsize(path) for paths in _chunk_files(self.directory).values() for path in paths)
+
+    def iter_range(self, start=None, end=None):
+        """Yield (timestamps, frame_ids, frames) per chunk for start <= timestamp < end.
+
+        Frames of an unfinished chunk are a read-only memmap; of a finished
+        chunk, only the blocks covering the range are decompressed.
+        """
+        chunks = self.chunks()
+        for i, (chunk_begin, name, finished) in enumerate(chunks):
+            next_begin = chunks[i + 1][0] if i + 1 < len(chunks) else None
+            if end is not None and chunk_begin >= end:
+                break
+            if start is not None and next_begin is not None and next_begin <= start:
+                continue
+            result = self._read_npz(name, start, end) if finished else self._read_raw(name, start, end)
+            if result is not None and len(result[0]):
+                yield result
+
+    def read(self, start=None, end=None, step=1):
+        """All frames for start <= timestamp < end (every ``step``-th one) as (timestamps, frame_ids, float16 frames)"""
+        parts = [(t[::step], ids[::step], np.asarray(frames[::step])) for t, ids, frames in self.iter_range(start, end)]
+        if not parts:
+            return np.empty(0), np.empty(0, dtype=np.uint64), np.empty((0, 0, 0), dtype=DTYPE)
+        if len({frames.shape[1:] for _, _, frames in parts}) > 1:
+            raise ValueError("The frame size changed within the range; read it chunk by chunk with iter_range")
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def _bounds(self, timestamps, start, end):
+        first = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        last = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="left"))
+        return first, last
+
+    def _read_raw(self, name, start, end):
+        try:
+            index, frames = _open_raw(self.directory, name)
+        except FileNotFoundError:
+            return None  # Compressed or deleted meanwhile
+        first, last = self._bounds(index["timestamp"], start, end)
+        return index["timestamp"][first:last], index["frame_id"][first:last], frames[first:last]
+
+    def _read_npz(self, name, start, end):
+        with np.load(os.path.join(self.directory, name + ".npz")) as data:
+            timestamps = data["timestamps"]
+            first, last = self._bounds(timestamps, start, end)
+            rows, cols = data["shape"]
+            if first >= last:
+                return timestamps[:0], data["frame_ids"][:0], np.empty((0, rows, cols), dtype=DTYPE)
+            block_frames = int(data["block_frames"])
+            blocks = range(first // block_frames, (last - 1) // block_frames + 1)
+            frames = np.concatenate([data[f"frames_{block}"] for block in blocks])
+            offset = blocks[0] * block_frames
+            return timestamps[first:last], data["frame_ids"][first:last], frames[first - offset:last - offset]
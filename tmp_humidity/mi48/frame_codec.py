@@ -0,0 +1,56 @@
+# frame_codec.py
+#
+# Binary wire format for thermal frames served by thermal_api.py.
+# Each frame is a fixed header followed by rows*cols little-endian floats:
+#
+#   magic   4s   b"THF1"
+#   dtype   B    2 = float16, 4 = float32
+#   flags   B    reserved (0)
+#   rows    H
+#   cols    H
+#   fps     H    sensor frame rate (0 if unknown)
+#   frame   Q    frame id, increases by one per sensor frame
+#   time    d    acquisition time (unix seconds)
+#
+# A batch (/frames) is simply several encoded frames back to back.
+
+import struct
+
+import numpy as np
+
+MAGIC = b"THF1"
+HEADER = struct.Struct("<4sBBHHHQd")
+DTYPES = {2: np.dtype("<f2"), 4: np.dtype("<f4")}
+DTYPE_CODES = {"f16": 2, "float16": 2, "f32": 4, "float32": 4}
+CONTENT_TYPE = "application/x-thermal-frame"
+
+
+def encode_frame(frame, frame_id, timestamp, dtype="f16", fps=0):
+    """Encode a 2D temperature array as header + raw little-endian bytes"""
+    code = DTYPE_CODES[dtype]
+    rows, cols = frame.shape
+    header = HEADER.pack(MAGIC, code, 0, rows, cols, fps, frame_id, timestamp)
+    return header + np.ascontiguousarray(frame, dtype=DTYPES[code]).tobytes()
+
+
+def decode_frames(buf):
+    """Decode one or more frames; returns a list of dicts with a float32 'frame' array"""
+    frames = []
+    view = memoryview(buf)
+    offset = 0
+    while offset < len(view):
+        magic, code, _, rows, cols, fps, frame_id, timestamp = HEADER.unpack_from(view, offset)
+        if magic != MAGIC or code not in DTYPES:
+            raise ValueError("Invalid thermal frame header")
+        offset += HEADER.size
+        dtype = DTYPES[code]
+        count = rows * cols
+        data = np.frombuffer(view, dtype=dtype, count=count, offset=offset)
+        offset += count * dtype.itemsize
+        frames.append({
+            "frame_id": frame_id,
+            "timestamp": timestamp,
+            "fps": fps,
+            "frame": data.reshape((rows, cols)).astype(np.float32),
+        })
+    return frames
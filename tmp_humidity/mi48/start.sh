@@ -1,4 +1,21 @@
 #!/bin/bash
+#
+# ./start.sh           sensor, frame pipeline and Django in one process (manage.py run_thermal_service)
+# ./start.sh --split   Flask API, Django and thermal_worker.py as three processes
+
+if [ "$1" != "--split" ]; then
+    cd /home/admin/mlx90640-library
+    source env/bin/activate
+    cd Django_Thermal_PI/
+    echo "Starting thermal service..."
+    fuser -k 5000/tcp
+    fuser -k 8001/tcp
+    pkill -f run_thermal_service
+    python manage.py run_thermal_service --host 0.0.0.0 --port 8001 --api-port 5000 &
+
+    echo " All services are running."
+    exit 0
+fi
 
 # Flask
 cd /home/admin/mlx90640-library
@@ -30,4 +47,3 @@ cd Django_Thermal_PI/thermal
 python3 thermal_worker.py &
 
 echo " All services are running."
-
@@ -1,5 +1,9 @@
 #!/bin/bash
 
+echo "Stopping thermal service..."
+# SIGINT lets it write the queued probe data first
+pkill -INT -f run_thermal_service && sleep 3
+
 echo "Stopping Flask (port 5000)..."
 fuser -k 5000/tcp
 
@@ -1,11 +1,25 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request, Response
 import numpy as np
+import base64
+import json
+import time
 import signal
 import sys
+import os
 import logging
 
-from senxor.mi48 import MI48
-from senxor.utils import connect_senxor
+from frame_codec import encode_frame, CONTENT_TYPE, DTYPE_CODES
+from acquisition import FrameAcquisition
+
+# THERMAL_REPLAY=<recording> serves recorded frames instead of the sensor (see frame_replay.py);
+# THERMAL_REPLAY_SPEED scales the playback rate, 0 = as fast as possible
+REPLAY = os.environ.get("THERMAL_REPLAY")
+REPLAY_SPEED = float(os.environ.get("THERMAL_REPLAY_SPEED", 1))
+if REPLAY:
+    from frame_replay import ReplaySensor
+else:
+    from senxor.mi48 import MI48
+    from senxor.utils import connect_senxor
 
 app = Flask(__name__)
 
@@ -13,46 +27,194 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# connect to sensor
-mi48, connected_port, port_names = connect_senxor()
-logger.info(f"Connected to: {connected_port}")
-
 # config
-mi48.set_fps(15)
-mi48.disable_filter(f1=True, f2=True, f3=True)
-mi48.set_filter_1(85)
-mi48.enable_filter(f1=True, f2=False, f3=False, f3_ks_5=False)
-mi48.set_offset_corr(0.0)
-mi48.set_sens_factor(100)
+FPS = 15
+FRAME_SHAPE = (62, 80)
+HISTORY_SIZE = 32
+MAX_WAIT = 2.0  # longest ?wait= a client may block for a new frame
+STREAM_HEARTBEAT = 15  # seconds between keep-alive comments on /stream
+
+# Set by start_acquisition()
+mi48 = None
+acquisition = None
+# Changes with every start of the acquisition, whose frame ids start again at 1
+boot_id = None
+
+
+def open_sensor():
+    """Connect to the sensor (or the THERMAL_REPLAY recording), configure it and start streaming"""
+    if REPLAY:
+        sensor = ReplaySensor(REPLAY, FRAME_SHAPE, speed=REPLAY_SPEED)
+        connected_port = f"replay of {REPLAY}"
+    else:
+        sensor, connected_port, port_names = connect_senxor()
+    logger.info(f"Connected to: {connected_port}")
+
+    sensor.set_fps(FPS)
+    sensor.disable_filter(f1=True, f2=True, f3=True)
+    sensor.set_filter_1(85)
+    sensor.enable_filter(f1=True, f2=False, f3=False, f3_ks_5=False)
+    sensor.set_offset_corr(0.0)
+    sensor.set_sens_factor(100)
+
+    # start
+    sensor.start(stream=True, with_header=False)
+    return sensor
+
+
+def read_frame():
+    """Read one frame from the sensor (called only by the acquisition thread)"""
+    data, header = mi48.read()
+    if data is None:
+        return None
+
+    temp_array = data.reshape(FRAME_SHAPE)
+    #temp_array = np.flipud(temp_array)
+    temp_array = np.fliplr(temp_array)
+    return temp_array
+
+
+def start_acquisition():
+    """Open the sensor and read it in the background; also used by the single-process thermal service"""
+    global mi48, acquisition, boot_id
+    mi48 = open_sensor()
+    # An accelerated replay reads faster than the sensor would
+    acquisition = FrameAcquisition(read_frame, FPS * REPLAY_SPEED if REPLAY else FPS, HISTORY_SIZE)
+    acquisition.start()
+    boot_id = f"{time.time_ns():x}"
+    return acquisition
+
+
+def stop_acquisition():
+    acquisition.stop()
+    mi48.stop()
+
 
-# start
-mi48.start(stream=True, with_header=False)
+@app.after_request
+def add_boot_id(response):
+    """Lets clients passing ?since= notice that frame ids restarted"""
+    if boot_id:
+        response.headers["X-Boot-Id"] = boot_id
+    return response
+
+
+def requested_dtype():
+    dtype = request.args.get("dtype", "f16")
+    return dtype if dtype in DTYPE_CODES else None
+
+
+def requested_frame():
+    """Latest frame newer than ?since=<frame_id>, optionally waiting up to ?wait=<seconds>"""
+    since = request.args.get("since", 0, type=int)
+    wait = min(request.args.get("wait", 0, type=float), MAX_WAIT)
+    if wait > 0:
+        return acquisition.wait_for_frame(since, wait)
+    latest = acquisition.latest
+    return latest if latest is not None and latest[0] > since else None
 
 
 @app.route("/temperature", methods=["GET"])
 def get_temperature_data():
 
-    data, header = mi48.read()
-    if data is None:
+    if acquisition.latest is None:
         return jsonify({"error": "No data from sensor"}), 500
+    entry = requested_frame()
+    if entry is None:
+        return "", 204
 
-    temp_array = data.reshape((62, 80))
-    #temp_array = np.flipud(temp_array)
-    temp_array = np.fliplr(temp_array)
+    frame_id, timestamp, temp_array = entry
     temperature_list = temp_array.tolist()
-    return jsonify({"temperature": temperature_list})
+    return jsonify({"temperature": temperature_list, "frame_id": frame_id, "timestamp": timestamp})
+
 
+@app.route("/temperature.bin", methods=["GET"])
+def get_temperature_binary():
+    """Latest frame as raw little-endian floats (see frame_codec.py); ?dtype=f16|f32"""
+    dtype = requested_dtype()
+    if dtype is None:
+        return jsonify({"error": "dtype must be f16 or f32"}), 400
+    if acquisition.latest is None:
+        return jsonify({"error": "No data from sensor"}), 500
+    entry = requested_frame()
+    if entry is None:
+        return "", 204
+
+    frame_id, timestamp, temp_array = entry
+    body = encode_frame(temp_array, frame_id, timestamp, dtype, FPS)
+    return Response(body, mimetype=CONTENT_TYPE, headers={"X-Frame-Id": str(frame_id)})
+
+
+@app.route("/frames", methods=["GET"])
+def get_frames():
+    """Recent frames back to back; ?since=<frame_id>&count=<n>&dtype=f16|f32"""
+    dtype = requested_dtype()
+    if dtype is None:
+        return jsonify({"error": "dtype must be f16 or f32"}), 400
+    since = request.args.get("since", 0, type=int)
+    count = min(request.args.get("count", HISTORY_SIZE, type=int), HISTORY_SIZE)
+
+    frames = acquisition.since(since, count)
+    body = b"".join(encode_frame(arr, frame_id, timestamp, dtype, FPS) for frame_id, timestamp, arr in frames)
+    return Response(body, mimetype=CONTENT_TYPE, headers={"X-Frame-Count": str(len(frames))})
+
+
+@app.route("/stream", methods=["GET"])
+def stream_frames():
+    """Server-Sent Events stream of frames as they are acquired.
+
+    ?format=json (default) sends the temperature grid, ?format=bin sends the
+    base64-encoded binary frame. ?fps=<n> caps the rate for this client. Only
+    the newest frame is sent, so slow clients skip frames instead of lagging.
+    """
+    binary = request.args.get("format", "json") == "bin"
+    dtype = requested_dtype() or "f16"
+    since = request.args.get("since", 0, type=int)
+    max_fps = request.args.get("fps", FPS, type=float)
+    min_interval = 1.0 / max_fps if max_fps > 0 else 0
+
+    def events(last_id):
+        yield "retry: 2000\n\n"
+        while True:
+            started = time.monotonic()
+            entry = acquisition.wait_for_frame(last_id, STREAM_HEARTBEAT)
+            if entry is None:
+                yield ": keep-alive\n\n"
+                continue
+            frame_id, timestamp, temp_array = entry
+            skipped = frame_id - last_id - 1 if last_id else 0
+            last_id = frame_id
+            if binary:
+                data = base64.b64encode(encode_frame(temp_array, frame_id, timestamp, dtype, FPS)).decode()
+            else:
+                data = json.dumps({
+                    "frame_id": frame_id,
+                    "timestamp": timestamp,
+                    "skipped": skipped,
+                    "temperature": np.round(temp_array.astype(np.float32), 2).tolist(),
+                })
+            yield f"id: {frame_id}\nevent: frame\ndata: {data}\n\n"
+            elapsed = time.monotonic() - started
+            if elapsed < min_interval:
+                time.sleep(min_interval - elapsed)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(events(since), mimetype="text/event-stream", headers=headers)
+
+
+@app.route("/status", methods=["GET"])
+def get_status():
+    return jsonify({**acquisition.stats(), "boot_id": boot_id})
 
 
 def cleanup_on_exit(signal_received, frame):
     logger.info("Stopping sensor and cleaning up...")
-    mi48.stop()
+    stop_acquisition()
     sys.exit(0)
 
-signal.signal(signal.SIGINT, cleanup_on_exit)
-signal.signal(signal.SIGTERM, cleanup_on_exit)
-
 
 if __name__ == "__main__":
+    start_acquisition()
+    signal.signal(signal.SIGINT, cleanup_on_exit)
+    signal.signal(signal.SIGTERM, cleanup_on_exit)
     app.run(host="0.0.0.0", port=5000)
 
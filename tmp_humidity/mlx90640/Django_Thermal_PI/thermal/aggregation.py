@@ -0,0 +1,154 @@
+"""Time-bucketed humidity series for the charts, aggregated in the database.
+
+Rows are grouped by integer division of their Unix time (shifted to Iran
+time), so only one (sum, count) row per bucket leaves the database and no
+per-row timezone conversion runs in Python or in SQLite user functions.
+Weeks start on Saturday; months are Jalali months, merged from day buckets.
+Periods whose raw rows have been pruned are filled from the ProbeDataRollup
+tables. Results are cached per bucket size and range.
+"""
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import jdatetime
+from django.core.cache import cache
+from django.db.models import Count, Func, IntegerField, Min, Sum
+from django.utils import timezone
+
+from .models import ProbeData, ProbeDataRollup
+
+IRAN_TZ = ZoneInfo("Asia/Tehran")
+# Iran has kept a fixed UTC+03:30 since 2022 (no daylight saving)
+UTC_OFFSET = 12600
+DAY = 86400
+# Bucket size in seconds and shift that puts bucket edges on local midnight / Saturday
+BUCKET_SECONDS = {
+    'minute': (60, UTC_OFFSET),
+    'hour': (3600, UTC_OFFSET),
+    'day': (DAY, UTC_OFFSET),
+    'week': (7 * DAY, UTC_OFFSET - 2 * DAY),  # 1970-01-01 was a Thursday
+}
+BUCKETS = ('minute', 'hour', 'day', 'week', 'month')
+# Finest rollup that can be merged into each bucket size
+ROLLUP_RESOLUTION = {
+    'minute': ProbeDataRollup.MINUTE,
+    'hour': ProbeDataRollup.HOUR,
+    'day': ProbeDataRollup.DAY,
+    'week': ProbeDataRollup.DAY,
+    'month': ProbeDataRollup.DAY,
+}
+# Seconds a cached series stays valid; the newest bucket keeps filling up meanwhile
+CACHE_TIMEOUT = {'minute': 15, 'hour': 60, 'day': 300, 'week': 900, 'month': 900}
+LABEL_FORMAT = '%Y/%m/%d %H:%M:%S'
+
+
+class Epoch(Func):
+    """Unix time (integer seconds) of a datetime column"""
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)",
+                           **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(EXTRACT(EPOCH FROM %(expressions)s) AS INTEGER)",
+                           **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="UNIX_TIMESTAMP(%(expressions)s)", **extra_context)
+
+
+def jalali_month_start(timestamp):
+    """Start (Iran time) of the Jalali month containing ``timestamp``"""
+    jalali = jdatetime.datetime.fromgregorian(datetime=timestamp.astimezone(IRAN_TZ))
+    return jdatetime.datetime(jalali.year, jalali.month, 1).togregorian().replace(tzinfo=IRAN_TZ)
+
+
+def bucket_floor(timestamp, bucket):
+    """Start of the bucket containing ``timestamp`` (Iran time)"""
+    if bucket == 'month':
+        return jalali_month_start(timestamp)
+    size, shift = BUCKET_SECONDS[bucket]
+    start = (int(timestamp.timestamp()) + shift) // size * size - shift
+    return datetime.fromtimestamp(start, IRAN_TZ)
+
+
+def next_bucket(start, bucket):
+    """Start of the bucket following the one that starts at ``start``"""
+    if bucket == 'month':
+        return jalali_month_start(start + timedelta(days=32))
+    return bucket_floor(start + timedelta(seconds=BUCKET_SECONDS[bucket][0]), bucket)
+
+
+def _grouped(queryset, field, bucket, total, samples):
+    """{bucket start: (sum, count)} grouped in SQL; months are merged from day buckets"""
+    size, shift = BUCKET_SECONDS['day' if bucket == 'month' else bucket]
+    rows = (queryset.annotate(period=(Epoch(field) + shift) / size)
+            .order_by().values('period')
+            .annotate(total=total, samples=samples)
+            .values_list('period', 'total', 'samples'))
+    totals = {}
+    for period, period_total, period_samples in rows:
+        start = datetime.fromtimestamp(period * size - shift, IRAN_TZ)
+        if bucket == 'month':
+            start = jalali_month_start(start)
+        previous = totals.get(start, (0, 0))
+        totals[start] = (previous[0] + period_total, previous[1] + period_samples)
+    return totals
+
+
+def _raw_buckets(bucket, start, end):
+    rows = ProbeData.objects.all()
+    if start is not None:
+        rows = rows.filter(timestamp__gte=start)
+    if end is not None:
+        rows = rows.filter(timestamp__lt=end)
+    return _grouped(rows, 'timestamp', bucket, Sum('humidity'), Count('id'))
+
+
+def _rollup_buckets(bucket, start, end):
+    rollups = ProbeDataRollup.objects.filter(resolution=ROLLUP_RESOLUTION[bucket])
+    if start is not None:
+        rollups = rollups.filter(bucket__gte=start)
+    if end is not None:
+        rollups = rollups.filter(bucket__lt=end)
+    return _grouped(rollups, 'bucket', bucket, Sum('humidity_sum'), Sum('count'))
+
+
+def humidity_series(bucket, start=None, end=None):
+    """Mean humidity per bucket between ``start`` and ``end`` as (labels, values, bucket starts)"""
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket '{bucket}'")
+    start = bucket_floor(start, bucket) if start is not None else None
+    key = f"thermal:humidity_series:{bucket}:{start and start.timestamp()}:{end and bucket_floor(end, bucket).timestamp()}"
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    oldest_raw = ProbeData.objects.aggregate(first=Min('timestamp'))['first']
+    if oldest_raw is None:
+        # Every raw row has been pruned; only the rollups are left
+        totals = _rollup_buckets(bucket, start, end)
+    else:
+        totals = {}
+        if start is None or start < oldest_raw:
+            # Raw rows before oldest_raw may have been pruned, so older buckets come from
+            # the rollups, and so does the one holding oldest_raw unless its rollup is
+            # missing or smaller (rows saved before rollups existed)
+            first_raw = bucket_floor(oldest_raw, bucket)
+            totals = _rollup_buckets(bucket, start, next_bucket(first_raw, bucket))
+        for period, (total, samples) in _raw_buckets(bucket, start, end).items():
+            if totals.get(period, (0, 0))[1] < samples:
+                totals[period] = (total, samples)
+
+    periods = sorted(totals)
+    values = [round(totals[p][0] / totals[p][1], 2) for p in periods]
+    labels = [jdatetime.datetime.fromgregorian(datetime=p).strftime(LABEL_FORMAT) for p in periods]
+    result = (labels, values, periods)
+    cache.set(key, result, CACHE_TIMEOUT[bucket])
+    return result
+
+
+def recent_humidity_series(bucket, period):
+    """humidity_series for the last ``period`` (a timedelta) up to now"""
+    return humidity_series(bucket, start=timezone.now() - period)
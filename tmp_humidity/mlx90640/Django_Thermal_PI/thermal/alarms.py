@@ -0,0 +1,345 @@
+"""Alarm rules evaluated on every frame.
+
+Rules are configured in THERMAL_ALARM_RULES. Each one watches the temperature
+or humidity of every checked probe (target "probes") or their average
+(target "average"):
+
+- range: raised when the value leaves [low, high]; cleared only once it is
+  back inside by ``hysteresis``, so a value hovering at a limit doesn't flap
+- rate: raised when the value changes faster than ``max_rate`` per second,
+  measured over the last ``window`` seconds; cleared below
+  ``max_rate - hysteresis``
+
+A condition has to hold for ``debounce`` seconds before the alarm is raised,
+and its end as long before it is cleared. Only these transitions are stored,
+as AlarmEvent rows, which /view/alarms/stream/ pushes to the pages. While an
+alarm of a ``manual_mode`` rule is raised, the system is in manual mode and
+probe data is not saved. Values outside the range of a ``manual_mode`` rule
+are not saved either, even before the alarm is raised (AlarmEngine.rejects):
+debounce and hysteresis only decide when alarm events are raised and cleared.
+
+The raised alarms are those whose latest event is RAISED, whichever process
+evaluated them. An engine takes that state from the database when it starts,
+and again before evaluating after a pause (another process may have evaluated
+meanwhile, e.g. the pages while the worker was stopped), so a restart never
+leaves an alarm raised that nothing will clear.
+
+State is a few arrays per rule and a frame costs one probe sample and a
+handful of vectorized comparisons, so the worker evaluates every frame it
+processes.
+"""
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Max
+
+from .config_cache import get_probe_config
+from .frame_bus import STALE_AFTER
+from .formula import FormulaError, compile_formula
+from .models import AlarmEvent
+from .probes import get_probe_sampler
+
+RULES = getattr(settings, 'THERMAL_ALARM_RULES', [])
+AVERAGE = 'average'
+
+
+class AlarmRule:
+    """One configured rule and the alarm state of each of its targets"""
+
+    def __init__(self, name, metric='temperature', target=AVERAGE, kind='range', low=None, high=None,
+                 max_rate=None, window=10.0, hysteresis=0.0, debounce=0.0, manual_mode=False):
+        if metric not in ('temperature', 'humidity'):
+            raise ValueError(f"Alarm rule {name}: unknown metric {metric!r}")
+        if target not in (AVERAGE, 'probes'):
+            raise ValueError(f"Alarm rule {name}: unknown target {target!r}")
+        if kind == 'range' and low is None and high is None:
+            raise ValueError(f"Alarm rule {name}: a range rule needs low and/or high")
+        if kind == 'rate' and max_rate is None:
+            raise ValueError(f"Alarm rule {name}: a rate rule needs max_rate")
+        if kind not in ('range', 'rate'):
+            raise ValueError(f"Alarm rule {name}: unknown kind {kind!r}")
+        self.name = name
+        self.metric = metric
+        self.target = target
+        self.kind = kind
+        self.low = -np.inf if low is None else low
+        self.high = np.inf if high is None else high
+        self.max_rate = max_rate
+        self.window = window
+        self.hysteresis = hysteresis
+        self.debounce = debounce
+        self.manual_mode = manual_mode
+
+        self.keys = []
+        self.active = np.zeros(0, dtype=bool)
+        self.since = np.zeros(0)  # When the condition started to differ from ``active`` (nan: it doesn't)
+        self.history = deque()  # (timestamp, values) over the rate window
+
+    def load(self, raised):
+        """Take over the alarm state of the database: ``raised`` are the targets raised there.
+
+        The debounce of a target whose state doesn't change goes on.
+        """
+        raised = set(raised)
+        added = sorted(raised.difference(self.keys))
+        self.keys = self.keys + added
+        was_active = np.append(self.active, np.zeros(len(added), dtype=bool))
+        self.active = np.array([key in raised for key in self.keys], dtype=bool)
+        self.since = np.where(was_active == self.active, np.append(self.since, np.full(len(added), np.nan)), np.nan)
+        if added:
+            self.history.clear()
+
+    def _rekey(self, keys):
+        """Follow a change of the probe set; returns the keys of dropped targets that were raised"""
+        old = dict(zip(self.keys, zip(self.active.tolist(), self.since.tolist())))
+        self.keys = list(keys)
+        self.active = np.array([old.get(key, (False, np.nan))[0] for key in keys], dtype=bool)
+        self.since = np.array([old.get(key, (False, np.nan))[1] for key in keys], dtype=float)
+        self.history.clear()
+        return [key for key, (active, _) in old.items() if active and key not in self.keys]
+
+    def measure(self, timestamp, values):
+        """(in alarm, measured value) per target; hysteresis applies to the targets already raised"""
+        margin = np.where(self.active, self.hysteresis, 0.0)
+        if self.kind == 'range':
+            return (values < self.low + margin) | (values > self.high - margin), values
+
+        self.history.append((timestamp, values))
+        while len(self.history) > 1 and timestamp - self.history[1][0] >= self.window:
+            self.history.popleft()
+        first_time, first_values = self.history[0]
+        elapsed = timestamp - first_time
+        if elapsed < self.window / 2:
+            return self.active.copy(), np.full(len(values), np.nan)  # Too little history yet
+        rate = (values - first_values) / elapsed
+        return np.abs(rate) > self.max_rate - margin, rate
+
+    def evaluate(self, timestamp, keys, values):
+        """Transitions caused by ``values`` (one per key) at ``timestamp``: [(key, raised, value)]"""
+        transitions = []
+        if keys != self.keys:
+            transitions = [(key, False, None) for key in self._rekey(keys)]
+        if not len(values):
+            return transitions
+
+        alarm, measured = self.measure(timestamp, values)
+        changing = alarm != self.active
+        self.since = np.where(changing, np.where(np.isnan(self.since), timestamp, self.since), np.nan)
+        flip = changing & (timestamp - self.since >= self.debounce)
+        for i in np.flatnonzero(flip).tolist():
+            self.active[i] = alarm[i]
+            self.since[i] = np.nan
+            value = float(measured[i])
+            transitions.append((self.keys[i], bool(alarm[i]), None if np.isnan(value) else round(value, 3)))
+        return transitions
+
+    def describe(self, key, raised, value):
+        unit = '°C' if self.metric == 'temperature' else '%'
+        subject = f"{self.metric} of {key}"
+        if not raised:
+            return f"{subject} back to normal"
+        if self.kind == 'range':
+            return f"{subject} {value:.2f}{unit} outside {self.low:g}-{self.high:g}{unit}"
+        return f"{subject} changing {value:+.2f}{unit}/s (limit {self.max_rate:g}{unit}/s)"
+
+
+class AlarmEngine:
+    """Evaluates all rules on sampled probe values and keeps their alarm state"""
+
+    def __init__(self, rules=None):
+        self.rules = [AlarmRule(**rule) for rule in (RULES if rules is None else rules)]
+        self.evaluations = 0
+        self.seconds = 0.0
+        self.last_evaluated = None
+        self._lock = threading.Lock()
+
+    @property
+    def manual_mode(self):
+        """True while an alarm of a manual_mode rule is raised"""
+        return any(rule.manual_mode and rule.active.any() for rule in self.rules)
+
+    def load_state(self):
+        """Take the raised alarms from the database; returns the AlarmEvents (unsaved) clearing
+        those of rules no longer configured, which would otherwise stay raised"""
+        raised = active_alarms()
+        with self._lock:
+            for rule in self.rules:
+                rule.load([event.target for event in raised if event.rule == rule.name])
+        names = {rule.name for rule in self.rules}
+        timestamp = time.time()
+        return [self._event(timestamp, event.rule, event.target, False, None, event.manual_mode,
+                            f"{event.target}: alarm rule {event.rule} is no longer configured")
+                for event in raised if event.rule not in names]
+
+    def evaluate(self, timestamp, keys, temperatures, humidities, frame_id=None):
+        """AlarmEvents (unsaved) for the alarms raised or cleared by these probe values at ``timestamp``"""
+        started = time.perf_counter()
+        temperatures = np.asarray(temperatures, dtype=float)
+        humidities = np.asarray(humidities, dtype=float)
+        events = []
+        with self._lock:
+            self._evaluate_rules(timestamp, keys, temperatures, humidities, frame_id, events)
+            self.last_evaluated = time.monotonic()
+        self.evaluations += 1
+        self.seconds += time.perf_counter() - started
+        return events
+
+    @staticmethod
+    def _targets(rule, keys, temperatures, humidities):
+        """(target keys, values) the rule watches"""
+        values = temperatures if rule.metric == 'temperature' else humidities
+        if rule.target == AVERAGE:
+            return ([AVERAGE], values.mean(keepdims=True)) if len(values) else ([], values)
+        return keys, values
+
+    def rejects(self, keys, temperatures, humidities):
+        """Messages of the manual_mode range rules these probe values are outside of right now.
+
+        Ignores debounce and hysteresis and changes no alarm state: values
+        outside such a range are not saved even before the alarm is raised.
+        """
+        temperatures = np.asarray(temperatures, dtype=float)
+        humidities = np.asarray(humidities, dtype=float)
+        messages = []
+        for rule in self.rules:
+            if not rule.manual_mode or rule.kind != 'range':
+                continue
+            rule_keys, values = self._targets(rule, keys, temperatures, humidities)
+            for key, value in zip(rule_keys, values.tolist()):
+                if value < rule.low or value > rule.high:
+                    messages.append(rule.describe(key, True, value))
+        return messages
+
+    def _evaluate_rules(self, timestamp, keys, temperatures, humidities, frame_id, events):
+        for rule in self.rules:
+            rule_keys, values = self._targets(rule, keys, temperatures, humidities)
+            for key, raised, value in rule.evaluate(timestamp, rule_keys, values):
+                events.append(self._event(timestamp, rule.name, key, raised, value, rule.manual_mode,
+                                          rule.describe(key, raised, value), frame_id))
+
+    @staticmethod
+    def _event(timestamp, rule, target, raised, value, manual_mode, message, frame_id=None):
+        return AlarmEvent(
+            timestamp=datetime.fromtimestamp(timestamp, dt_timezone.utc),
+            rule=rule,
+            target=target,
+            state=AlarmEvent.RAISED if raised else AlarmEvent.CLEARED,
+            value=value,
+            manual_mode=manual_mode,
+            message=message[:255],
+            frame_id=frame_id,
+        )
+
+    def evaluate_frame(self, grid, timestamp=None, frame_id=None, config=None):
+        """Sample the configured probes on ``grid`` and evaluate them; returns the AlarmEvents (unsaved)"""
+        timestamp = time.time() if timestamp is None else timestamp
+        events = []
+        if self.last_evaluated is not None and time.monotonic() - self.last_evaluated > STALE_AFTER:
+            # The pages evaluate while no frames are published
+            events = self.load_state()
+        config = config or get_probe_config()
+        if not config or config.probe_count == 0:
+            return events + self.evaluate(timestamp, [], [], [], frame_id)
+        sampler = get_probe_sampler(config, grid.shape)
+        temperatures = sampler.sample(grid)
+        try:
+            humidities = np.nan_to_num(compile_formula(config.active_formula)(temperatures),
+                                       nan=0.0, posinf=0.0, neginf=0.0)
+        except (FormulaError, ValueError, TypeError):
+            humidities = np.zeros_like(temperatures)
+        return events + self.evaluate(timestamp, sampler.keys, temperatures, humidities, frame_id)
+
+    def stats(self):
+        return {
+            'evaluations': self.evaluations,
+            'mean_ms': round(self.seconds / self.evaluations * 1000, 3) if self.evaluations else None,
+            'active': [f"{rule.name}:{key}" for rule in self.rules
+                       for key, active in zip(rule.keys, rule.active) if active],
+        }
+
+
+def record_alarm_events(events):
+    """Store AlarmEvents; errors are printed, never raised"""
+    if not events:
+        return
+    for event in events:
+        manual = event.manual_mode and event.state == AlarmEvent.RAISED
+        print(f"ALARM {event.state}: {event.message}" + (" - system switched to manual mode" if manual else ""))
+    try:
+        AlarmEvent.objects.bulk_create(events)
+    except Exception as e:
+        print(f"Error storing alarm events: {e}")
+
+
+def active_alarms():
+    """Latest event of every rule/target that is currently raised, from whichever process evaluated them"""
+    latest = AlarmEvent.objects.values('rule', 'target').annotate(last=Max('id')).values('last')
+    return list(AlarmEvent.objects.filter(id__in=latest, state=AlarmEvent.RAISED).order_by('-timestamp'))
+
+
+_feed = deque(maxlen=200)
+_feed_lock = threading.Lock()
+_feed_checked = 0.0
+_feed_last_id = None
+
+
+def alarm_events_after(last_id, max_age=1.0):
+    """AlarmEvents with an id above ``last_id``, oldest first.
+
+    Served from one per-process snapshot of the newest events, refreshed at
+    most every ``max_age`` seconds, so the open alarm streams don't each query
+    the table. Only a client further behind than the snapshot reads the table.
+    """
+    global _feed_checked, _feed_last_id
+    with _feed_lock:
+        if time.monotonic() - _feed_checked >= max_age:
+            if _feed_last_id is None:
+                new = list(AlarmEvent.objects.order_by('-id')[:_feed.maxlen])[::-1]
+            else:
+                new = list(AlarmEvent.objects.filter(id__gt=_feed_last_id).order_by('id')[:_feed.maxlen])
+            _feed.extend(new)
+            _feed_last_id = new[-1].id if new else (_feed_last_id or 0)
+            _feed_checked = time.monotonic()
+        events = list(_feed)
+    if events and last_id < events[0].id - 1:
+        return list(AlarmEvent.objects.filter(id__gt=last_id).order_by('id')[:_feed.maxlen])
+    return [event for event in events if event.id > last_id]
+
+
+def manual_mode_active():
+    return any(event.manual_mode for event in active_alarms())
+
+
+def event_payload(event):
+    return {
+        'id': event.id,
+        'timestamp': event.timestamp.isoformat(),
+        'rule': event.rule,
+        'target': event.target,
+        'state': event.state,
+        'value': event.value,
+        'manual_mode': event.manual_mode,
+        'message': event.message,
+        'frame_id': event.frame_id,
+    }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_alarm_engine():
+    """This process's AlarmEngine, built from THERMAL_ALARM_RULES and the stored alarm state on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AlarmEngine()
+            try:
+                record_alarm_events(_engine.load_state())
+            except Exception as e:
+                print(f"Error loading the alarm state: {e}")
+        return _engine
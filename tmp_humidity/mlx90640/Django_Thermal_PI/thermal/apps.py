@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ThermalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'thermal'
+
+    def ready(self):
+        from . import config_cache  # noqa: F401  (connects the invalidation signals)
@@ -0,0 +1,98 @@
+"""Atomic, background file output for the thermal worker.
+
+Files such as static/thermal_map.txt and static/thermal_image.jpg are read by
+Django while the worker keeps replacing them. Every write goes to a temporary
+file in the same directory and is moved into place with os.replace, so a
+reader sees either the old or the new file, never a partial one. Writes run
+on a background thread so slow storage (SD cards) doesn't stall acquisition.
+"""
+import os
+import tempfile
+import threading
+from functools import lru_cache
+
+
+def atomic_write(path, data):
+    """Write bytes or text to ``path`` via a temp file and os.replace"""
+    if isinstance(data, str):
+        data = data.encode()
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+@lru_cache(maxsize=8)
+def _row_format(cols, precision):
+    return ",".join([f"%.{precision}f"] * cols)
+
+
+def format_thermal_map(grid, precision=2, trailing_newline=True):
+    """Comma separated rows of ``grid`` (the thermal_map.txt format), one format call per row"""
+    fmt = _row_format(grid.shape[1], precision)
+    text = "\n".join([fmt % tuple(row) for row in grid.tolist()])
+    return text + "\n" if trailing_newline else text
+
+
+class FileWriter:
+    """Background thread that writes files atomically.
+
+    Only the newest pending write for each path is kept: if the disk falls
+    behind, intermediate versions are dropped instead of queueing up.
+    """
+
+    def __init__(self):
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="thermal-file-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Finish pending writes and stop the thread"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, path, encode, *args):
+        """Write ``encode(*args)`` to ``path``; encoding also happens on the writer thread"""
+        with self._cond:
+            if path in self._pending:
+                self.dropped += 1
+            self._pending[path] = (encode, args)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or not self._running)
+                if not self._pending:
+                    return
+                path, (encode, args) = self._pending.popitem()
+            try:
+                atomic_write(path, encode(*args))
+                self.written += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"Error writing {path}: {e}")
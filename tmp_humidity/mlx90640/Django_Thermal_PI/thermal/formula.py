@@ -0,0 +1,159 @@
+"""Safe, compiled humidity formulas.
+
+Formulas are arithmetic expressions in ``temp`` such as
+``-0.0338*temp**2 + (-0.7663) * temp + 6.6305``. They are parsed once with
+the ``ast`` module and only numbers, ``temp``, + - * / ** and parentheses are
+accepted, so nothing else can be executed. Polynomials (every formula in
+views.FORMULA) are reduced to coefficients and evaluated with Horner's method;
+anything else that passes the whitelist is evaluated from its AST, in
+float64 so that huge powers overflow to inf instead of growing Python ints.
+Both accept a float or a NumPy array of temperatures.
+"""
+import ast
+import operator
+from functools import lru_cache
+
+import numpy as np
+
+VARIABLE = "temp"
+MAX_LENGTH = 500
+MAX_POWER = 10
+MAX_DEGREE = 20  # Nested powers beyond this are evaluated from the AST rather than expanded
+
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+}
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+class FormulaError(ValueError):
+    """The formula is not a valid arithmetic expression in ``temp``"""
+
+
+def parse_formula(formula):
+    """Parse and validate ``formula``; returns the expression's AST body"""
+    if not isinstance(formula, str) or not formula.strip():
+        raise FormulaError("Formula is empty")
+    if len(formula) > MAX_LENGTH:
+        raise FormulaError("Formula is too long")
+    try:
+        tree = ast.parse(formula.strip(), mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"Invalid formula: {e.msg}") from None
+    _validate(tree.body)
+    return tree.body
+
+
+def _validate(node):
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        _validate(node.left)
+        _validate(node.right)
+        if isinstance(node.op, ast.Pow):
+            exponent = _constant(node.right)
+            if exponent is None or abs(exponent) > MAX_POWER:
+                raise FormulaError(f"Exponents must be numbers between -{MAX_POWER} and {MAX_POWER}")
+    elif isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        _validate(node.operand)
+    elif isinstance(node, ast.Name) and node.id == VARIABLE:
+        pass
+    elif isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        pass
+    else:
+        raise FormulaError(f"Unsupported element in formula: {ast.unparse(node)}")
+
+
+def _constant(node):
+    """Numeric value of a constant (optionally signed) node, else None"""
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.operand, ast.Constant):
+        return UNARY_OPERATORS[type(node.op)](node.operand.value)
+    return None
+
+
+def _coefficients(node):
+    """Polynomial coefficients (lowest power first) of ``node``, or None if it is not a polynomial"""
+    if isinstance(node, ast.Constant):
+        return np.array([float(node.value)])
+    if isinstance(node, ast.Name):
+        return np.array([0.0, 1.0])
+    if isinstance(node, ast.UnaryOp):
+        inner = _coefficients(node.operand)
+        return None if inner is None else UNARY_OPERATORS[type(node.op)](inner)
+
+    left = _coefficients(node.left)
+    if isinstance(node.op, ast.Pow):
+        exponent = _constant(node.right)
+        if left is None or exponent != int(exponent) or exponent < 0 or (len(left) - 1) * exponent > MAX_DEGREE:
+            return None
+        return np.polynomial.polynomial.polypow(left, int(exponent))
+    right = _coefficients(node.right)
+    if left is None or right is None:
+        return None
+    if isinstance(node.op, ast.Add):
+        return np.polynomial.polynomial.polyadd(left, right)
+    if isinstance(node.op, ast.Sub):
+        return np.polynomial.polynomial.polysub(left, right)
+    if isinstance(node.op, ast.Mult):
+        if len(left) + len(right) - 2 > MAX_DEGREE:
+            return None
+        return np.polynomial.polynomial.polymul(left, right)
+    if len(right) == 1 and right[0] != 0:  # Division by a constant
+        return left / right[0]
+    return None
+
+
+def _evaluate(node, temp):
+    if isinstance(node, ast.Constant):
+        return np.float64(node.value)
+    if isinstance(node, ast.Name):
+        return temp
+    if isinstance(node, ast.UnaryOp):
+        return UNARY_OPERATORS[type(node.op)](_evaluate(node.operand, temp))
+    return BINARY_OPERATORS[type(node.op)](_evaluate(node.left, temp), _evaluate(node.right, temp))
+
+
+def horner(coefficients, temp):
+    """Evaluate a polynomial (coefficients lowest power first) at ``temp``"""
+    result = np.zeros_like(temp, dtype=np.float64) + coefficients[-1]
+    for c in coefficients[-2::-1]:
+        result = result * temp + c
+    return result
+
+
+def compile_formula(formula):
+    """Return a function of ``temp`` (float or array) for ``formula``; raises FormulaError"""
+    if not isinstance(formula, str):
+        # Checked before the cache, which can't hash e.g. a list
+        raise FormulaError("Formula must be a string")
+    return _compile(formula)
+
+
+@lru_cache(maxsize=64)
+def _compile(formula):
+    body = parse_formula(formula)
+    coefficients = _coefficients(body)
+    if coefficients is not None:
+        coefficients = np.trim_zeros(coefficients, "b")
+        if not len(coefficients):
+            coefficients = np.zeros(1)
+        coefficients = tuple(coefficients.tolist())
+        return lambda temp: horner(coefficients, np.asarray(temp, dtype=np.float64))
+
+    def evaluate(temp):
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            return np.asarray(_evaluate(body, np.asarray(temp, dtype=np.float64)), dtype=np.float64)
+    return evaluate
+
+
+def evaluate_formula(formula, temp):
+    """Evaluate ``formula`` at a temperature or an array of temperatures"""
+    result = compile_formula(formula)(temp)
+    return float(result) if np.ndim(result) == 0 else result
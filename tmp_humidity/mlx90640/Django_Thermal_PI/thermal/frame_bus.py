@@ -0,0 +1,192 @@
+"""Shared-memory ring buffer holding the latest raw thermal frames.
+
+The thermal worker publishes every frame here and Django views read them back
+without going through thermal_map.txt. Each slot is guarded by a sequence
+counter (odd while being written) so readers never see a half-written frame.
+"""
+import struct
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from django.conf import settings
+
+MAGIC = b"THFB"
+# magic, rows, cols, slots, latest frame id
+HEADER = struct.Struct("<4sHHIQ")
+HEADER_SIZE = 64
+# creation stamp (ns) of the segment, kept in the spare header bytes
+BOOT_STAMP = struct.Struct("<Q")
+BOOT_STAMP_OFFSET = HEADER.size
+# sequence, frame id, timestamp
+SLOT_HEADER = struct.Struct("<QQd")
+SLOT_HEADER_SIZE = 32
+
+BUS_NAME = getattr(settings, "THERMAL_FRAME_BUS_NAME", "thermal_frames")
+BUS_SLOTS = getattr(settings, "THERMAL_FRAME_BUS_SLOTS", 16)
+FRAME_SHAPE = tuple(getattr(settings, "THERMAL_FRAME_SHAPE", (62, 80)))
+# A reader re-attaches when no frame arrived for this long (the worker may have restarted)
+STALE_AFTER = 10
+
+
+class FrameBus:
+    """Ring buffer of float32 frames in a named shared memory segment"""
+
+    def __init__(self, name=BUS_NAME, shape=FRAME_SHAPE, slots=BUS_SLOTS, create=False):
+        self.name = name
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.frame_size = self.shape[0] * self.shape[1] * 4
+        self.slot_size = SLOT_HEADER_SIZE + self.frame_size
+        size = HEADER_SIZE + self.slot_size * slots
+
+        if create:
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                # Left over from a previous worker run; start from a clean segment
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            HEADER.pack_into(self._shm.buf, 0, MAGIC, self.shape[0], self.shape[1], slots, 0)
+            BOOT_STAMP.pack_into(self._shm.buf, BOOT_STAMP_OFFSET, time.time_ns())
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Readers must not unlink the segment when they exit
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+            magic, rows, cols, slots, _ = HEADER.unpack_from(self._shm.buf, 0)
+            if magic != MAGIC:
+                self._shm.close()
+                raise ValueError(f"Shared memory '{name}' is not a thermal frame bus")
+            self.shape = (rows, cols)
+            self.slots = slots
+            self.frame_size = rows * cols * 4
+            self.slot_size = SLOT_HEADER_SIZE + self.frame_size
+
+        self._owner = create
+
+    def _slot_offset(self, frame_id):
+        return HEADER_SIZE + (frame_id % self.slots) * self.slot_size
+
+    def _frame_view(self, offset):
+        return np.ndarray(self.shape, dtype=np.float32, buffer=self._shm.buf,
+                          offset=offset + SLOT_HEADER_SIZE)
+
+    @property
+    def latest_id(self):
+        """Id of the most recently published frame (0 if nothing published yet)"""
+        return HEADER.unpack_from(self._shm.buf, 0)[4]
+
+    @property
+    def boot_stamp(self):
+        """Creation stamp of the segment; changes whenever the worker recreates it"""
+        return BOOT_STAMP.unpack_from(self._shm.buf, BOOT_STAMP_OFFSET)[0]
+
+    def is_stale(self, max_age=STALE_AFTER):
+        """True if the newest frame is older than ``max_age`` seconds"""
+        frame_id = self.latest_id
+        if frame_id == 0:
+            return True
+        timestamp = SLOT_HEADER.unpack_from(self._shm.buf, self._slot_offset(frame_id))[2]
+        return time.time() - timestamp > max_age
+
+    def publish(self, frame, timestamp=None):
+        """Write a frame into the next slot and return its frame id"""
+        frame = np.asarray(frame, dtype=np.float32).reshape(self.shape)
+        timestamp = time.time() if timestamp is None else timestamp
+        frame_id = self.latest_id + 1
+        offset = self._slot_offset(frame_id)
+
+        seq = SLOT_HEADER.unpack_from(self._shm.buf, offset)[0]
+        SLOT_HEADER.pack_into(self._shm.buf, offset, seq + 1, frame_id, timestamp)
+        self._frame_view(offset)[...] = frame
+        SLOT_HEADER.pack_into(self._shm.buf, offset, seq + 2, frame_id, timestamp)
+
+        HEADER.pack_into(self._shm.buf, 0, MAGIC, self.shape[0], self.shape[1], self.slots, frame_id)
+        return frame_id
+
+    def read(self, frame_id, retries=3):
+        """Return (frame_id, timestamp, frame) for a frame still in the ring, else None"""
+        if frame_id <= 0:
+            return None
+        offset = self._slot_offset(frame_id)
+        for _ in range(retries):
+            seq_before, slot_id, timestamp = SLOT_HEADER.unpack_from(self._shm.buf, offset)
+            if slot_id != frame_id:
+                return None  # Overwritten by a newer frame
+            if seq_before % 2:
+                time.sleep(0.0005)  # Writer is mid-update
+                continue
+            frame = self._frame_view(offset).copy()
+            if SLOT_HEADER.unpack_from(self._shm.buf, offset)[0] == seq_before:
+                return slot_id, timestamp, frame
+        return None
+
+    def latest(self):
+        """Return (frame_id, timestamp, frame) for the newest frame, else None"""
+        frame_id = self.latest_id
+        result = self.read(frame_id)
+        if result is None and frame_id > 1:
+            # The newest slot was being rewritten; fall back to the previous frame
+            result = self.read(frame_id - 1)
+        return result
+
+    def history(self, count):
+        """Return up to ``count`` most recent frames, oldest first"""
+        latest_id = self.latest_id
+        frames = []
+        for frame_id in range(max(1, latest_id - min(count, self.slots) + 1), latest_id + 1):
+            result = self.read(frame_id)
+            if result is not None:
+                frames.append(result)
+        return frames
+
+    def close(self):
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+_reader = None
+_checked_at = 0
+_owned = None
+
+
+def use_frame_bus(bus):
+    """Serve get_frame_bus() from ``bus``, when the frames are published in this process"""
+    global _owned
+    _owned = bus
+
+
+def get_frame_bus():
+    """Attach to the worker's frame bus, or return None if it is not running"""
+    global _reader, _checked_at
+    if _owned is not None:
+        return _owned
+    if _reader is not None and _reader.is_stale() and time.time() - _checked_at > STALE_AFTER:
+        # The worker may have restarted: look at the segment at most every STALE_AFTER
+        # seconds and switch only when it was recreated, not merely quiet (sensor down)
+        _checked_at = time.time()
+        try:
+            current = FrameBus()
+        except (FileNotFoundError, ValueError):
+            current = None
+        if current is None or current.boot_stamp != _reader.boot_stamp:
+            # Other callers may still hold the old handle; it is closed when garbage collected
+            _reader = current
+        else:
+            current.close()
+    if _reader is None:
+        _checked_at = time.time()
+        try:
+            _reader = FrameBus()
+        except (FileNotFoundError, ValueError):
+            return None
+    return _reader
+
+
+def latest_frame():
+    """Convenience wrapper returning the latest (frame_id, timestamp, frame) or None"""
+    bus = get_frame_bus()
+    return bus.latest() if bus is not None else None
@@ -0,0 +1,78 @@
+"""Per-pixel humidity maps computed from whole thermal frames.
+
+The active formula is applied to every pixel of a frame in one vectorized
+call. The resulting map, its statistics and the cross-machine (CD) profile
+are computed once per frame id and formula, however many clients ask.
+"""
+import threading
+
+import numpy as np
+
+from .formula import compile_formula
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def compute_humidity_map(grid, formula):
+    """Humidity (%) for every pixel of ``grid``, clamped to 0-100; raises FormulaError"""
+    humidity = compile_formula(formula)(grid)
+    humidity = np.nan_to_num(humidity, nan=0.0, posinf=0.0, neginf=0.0)
+    return np.clip(humidity, 0, 100).astype(np.float32)
+
+
+def humidity_stats(humidity):
+    """Summary statistics of a humidity map"""
+    percentiles = np.percentile(humidity, PERCENTILES)
+    stats = {
+        'mean': float(humidity.mean()),
+        'std': float(humidity.std()),
+        'min': float(humidity.min()),
+        'max': float(humidity.max()),
+    }
+    stats.update({f'p{p}': float(value) for p, value in zip(PERCENTILES, percentiles)})
+    return {key: round(value, 2) for key, value in stats.items()}
+
+
+def cd_profile(humidity):
+    """Mean humidity of every column, i.e. across the paper web"""
+    return humidity.mean(axis=0)
+
+
+class HumidityMap:
+    """Humidity map, statistics and CD profile of one frame"""
+
+    def __init__(self, frame_id, timestamp, grid, formula):
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.formula = formula
+        self.map = compute_humidity_map(grid, formula)
+        self.stats = humidity_stats(self.map)
+        self.profile = cd_profile(self.map)
+
+    def as_dict(self, include_map=False):
+        data = {
+            'frame_id': self.frame_id,
+            'timestamp': self.timestamp,
+            'formula': self.formula,
+            'rows': self.map.shape[0],
+            'cols': self.map.shape[1],
+            'stats': self.stats,
+            'profile': np.round(self.profile.astype(np.float64), 2).tolist(),
+        }
+        if include_map:
+            data['humidity'] = np.round(self.map.astype(np.float64), 2).tolist()
+        return data
+
+
+_lock = threading.Lock()
+_latest = None
+
+
+def humidity_for_frame(frame_id, timestamp, grid, formula):
+    """HumidityMap of a frame, reused while the frame and formula stay the same"""
+    global _latest
+    key = (frame_id or timestamp, formula)
+    with _lock:
+        if _latest is None or _latest[0] != key:
+            _latest = (key, HumidityMap(frame_id, timestamp, grid, formula))
+        return _latest[1]
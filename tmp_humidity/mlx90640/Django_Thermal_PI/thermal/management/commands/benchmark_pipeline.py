@@ -0,0 +1,281 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from thermal.alarms import AlarmEngine
+from thermal.config_cache import get_probe_config
+from thermal.frame_bus import FrameBus
+from thermal.models import ProbeConfiguration
+from thermal.renderer import ThermalRenderer
+from thermal.views import FORMULA, sample_probes, save_probe_record
+import numpy as np
+import requests
+import platform
+import resource
+import tempfile
+import shutil
+import json
+import time
+import sys
+import os
+
+# frame_codec.py, frame_replay.py and frame_archive.py live next to thermal_api.py
+sys.path.append(str(settings.BASE_DIR.parent))
+from frame_archive import FrameRecorder  # noqa: E402
+from frame_codec import decode_frames, encode_frame  # noqa: E402
+from frame_replay import ReplaySensor  # noqa: E402
+
+STAGES = ['acquire', 'serialize', 'transfer', 'decode', 'publish', 'archive', 'render', 'probes', 'alarms',
+          'db_insert']
+
+
+def summarize(samples):
+    """Mean and percentiles in milliseconds of durations in seconds"""
+    ms = np.asarray(samples) * 1000
+    return {
+        'count': len(ms),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        return None
+
+
+def soc_temperature():
+    """CPU temperature on the Pi (None elsewhere)"""
+    try:
+        with open('/sys/class/thermal/thermal_zone0/temp') as f:
+            return int(f.read()) / 1000
+    except (OSError, ValueError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Time every stage of the thermal pipeline (acquire, serialize, transfer, decode, render, '
+            'probe extraction, alarm rules, DB insert) on a synthetic or replayed sensor; database writes are rolled back')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--replay',
+            help='Recording to play instead of synthetic frames (anything frame_replay.py reads)'
+        )
+        parser.add_argument(
+            '--speed',
+            type=float,
+            default=0,
+            help='Replay speed; 0 runs as fast as the pipeline allows (default: 0)'
+        )
+        parser.add_argument(
+            '--url',
+            help='Fetch frames from a running thermal_api.py (e.g. http://127.0.0.1:5000/temperature.bin) '
+                 'instead of reading the sensor in-process; acquire and serialize then happen in the API'
+        )
+        parser.add_argument(
+            '--frames',
+            type=int,
+            default=300,
+            help='Frames to measure (default: 300)'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=5,
+            help='Frames run before measuring (default: 5)'
+        )
+        parser.add_argument(
+            '--dtype',
+            default='f16',
+            choices=['f16', 'f32'],
+            help='Wire format of the serialized frames (default: f16)'
+        )
+        parser.add_argument(
+            '--probes',
+            type=int,
+            help='Use a temporary configuration with this many probes instead of the saved one'
+        )
+        parser.add_argument(
+            '--save-every',
+            type=int,
+            default=1,
+            help='Insert a ProbeData record every N frames, 0 to skip the database (default: 1)'
+        )
+        parser.add_argument(
+            '--json',
+            help='Append the results as one JSON line to this file ("-" prints only the JSON)'
+        )
+
+    def probe_configuration(self, shape, count):
+        config = None if count else get_probe_config()
+        if config and config.probe_count:
+            return config
+        count = count or 10
+        rng = np.random.default_rng(0)
+        probes = {f'probe{i + 1}': {'x': int(rng.integers(shape[1])), 'y': int(rng.integers(shape[0]))}
+                  for i in range(count)}
+        # Created inside the rolled-back transaction
+        return ProbeConfiguration.objects.create(
+            active_formula=FORMULA[0],
+            probe_count=count,
+            probes_data=probes,
+            checked_probes=list(range(1, count + 1)),
+        )
+
+    def frame_source(self, options, shape, workdir):
+        if options['replay']:
+            return ReplaySensor(options['replay'], shape, speed=options['speed'])
+        # Smooth gradient with sensor-like noise, 40-60 degrees
+        rng = np.random.default_rng(0)
+        base = np.add.outer(np.linspace(40, 60, shape[0]), np.linspace(0, 5, shape[1]))
+        frames = base + rng.normal(0, 0.3, (100,) + shape)
+        path = os.path.join(workdir, 'synthetic.npy')
+        np.save(path, frames.astype(np.float32))
+        return ReplaySensor(path, shape, fps=15, speed=options['speed'])
+
+    def handle(self, *args, **options):
+        shape = tuple(getattr(settings, 'THERMAL_FRAME_SHAPE', (62, 80)))
+        if options['frames'] < 1:
+            raise CommandError('--frames must be at least 1')
+        total = options['warmup'] + options['frames']
+        save_every = options['save_every']
+        workdir = tempfile.mkdtemp(prefix='thermal_bench_')
+        timings = {stage: [] for stage in STAGES}
+        latencies = []
+
+        # Private frame bus, archive and alarm state, so a running worker is not disturbed
+        bus = FrameBus(name=f'thermal_bench_{os.getpid()}', shape=shape, create=True)
+        recorder = FrameRecorder(os.path.join(workdir, 'archive'), interval=0)
+        renderer = ThermalRenderer(size=settings.THERMAL_IMAGE_SIZE, quality=settings.THERMAL_IMAGE_QUALITY)
+        alarms = AlarmEngine()
+        session = requests.Session() if options['url'] else None
+        sensor = None if options['url'] else self.frame_source(options, shape, workdir)
+
+        try:
+            with transaction.atomic():
+                config = self.probe_configuration(shape, options['probes'])
+                last_id = 0
+                for i in range(total):
+                    measured = i >= options['warmup']
+                    if i == options['warmup']:
+                        started = time.perf_counter()
+                        cpu_started = cpu_seconds()
+                    stage_times = {}
+
+                    t0 = time.perf_counter()
+                    if session is None:
+                        data, _ = sensor.read()
+                        if data is None:
+                            raise CommandError('The recording ended')
+                        grid = np.fliplr(data.reshape(shape))
+                        t1 = time.perf_counter()
+                        stage_times['acquire'] = t1 - t0
+                        body = encode_frame(grid, i + 1, time.time(), options['dtype'])
+                        t0 = time.perf_counter()
+                        stage_times['serialize'] = t0 - t1
+                    else:
+                        response = session.get(options['url'], params={'since': last_id, 'wait': 2}, timeout=10)
+                        if response.status_code != 200:
+                            raise CommandError(f'{options["url"]} answered {response.status_code}')
+                        body = response.content
+                        t1 = time.perf_counter()
+                        stage_times['transfer'] = t1 - t0
+                        t0 = t1
+
+                    frame = decode_frames(body)[0]
+                    last_id = frame['frame_id']
+                    arr = np.fliplr(frame['frame'])
+                    t1 = time.perf_counter()
+                    stage_times['decode'] = t1 - t0
+
+                    frame_id = bus.publish(arr)
+                    t2 = time.perf_counter()
+                    stage_times['publish'] = t2 - t1
+
+                    recorder.add(arr, frame_id=frame_id)
+                    t3 = time.perf_counter()
+                    stage_times['archive'] = t3 - t2
+
+                    renderer.render_bytes(arr)
+                    t4 = time.perf_counter()
+                    stage_times['render'] = t4 - t3
+
+                    sampled = sample_probes(config, arr)
+                    t5 = time.perf_counter()
+                    stage_times['probes'] = t5 - t4
+
+                    # Events are not stored: the benchmark must not raise alarms on the real system
+                    alarms.evaluate_frame(arr, config=config)
+                    t6 = time.perf_counter()
+                    stage_times['alarms'] = t6 - t5
+
+                    if save_every and sampled is not None and i % save_every == 0:
+                        save_probe_record(config, *sampled, one_per_slot=False, buffered=False)
+                        stage_times['db_insert'] = time.perf_counter() - t6
+
+                    if measured:
+                        for stage, seconds in stage_times.items():
+                            timings[stage].append(seconds)
+                        # From the frame's acquisition to the end of the pipeline
+                        latencies.append(time.time() - frame['timestamp'])
+
+                duration = time.perf_counter() - started
+                cpu = cpu_seconds() - cpu_started
+                transaction.set_rollback(True)
+        finally:
+            recorder.close()
+            bus.close()  # Unlinks the private segment
+            shutil.rmtree(workdir, ignore_errors=True)
+            if session is not None:
+                session.close()
+
+        result = {
+            'timestamp': timezone.now().isoformat(),
+            'host': platform.node(),
+            'machine': platform.machine(),
+            'python': platform.python_version(),
+            'source': options['url'] or options['replay'] or 'synthetic',
+            'speed': options['speed'],
+            'shape': list(shape),
+            'dtype': options['dtype'],
+            'probes': len(sampled[0]) if sampled else 0,
+            'save_every': save_every,
+            'frames': options['frames'],
+            'duration_s': round(duration, 3),
+            'fps': round(options['frames'] / duration, 2),
+            'stages': {stage: summarize(samples) for stage, samples in timings.items() if samples},
+            'latency': summarize(latencies),
+            'cpu_percent': round(cpu / duration * 100, 1),
+            'rss_mb': round(rss_mb(), 1) if rss_mb() is not None else None,
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'load_avg': [round(load, 2) for load in os.getloadavg()],
+            'soc_temperature': soc_temperature(),
+        }
+
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(result))
+            return
+        if options['json']:
+            with open(options['json'], 'a') as f:
+                f.write(json.dumps(result) + '\n')
+
+        self.stdout.write(f'{result["frames"]} frames from {result["source"]} in {result["duration_s"]} s: '
+                          f'{result["fps"]} fps, CPU {result["cpu_percent"]}%, RSS {result["rss_mb"]} MB')
+        self.stdout.write(f'{"stage":<12}{"mean":>10}{"p50":>10}{"p95":>10}{"p99":>10}{"max":>10}  (ms)')
+        for stage, stats in list(result['stages'].items()) + [('latency', result['latency'])]:
+            self.stdout.write(f'{stage:<12}{stats["mean_ms"]:>10.3f}{stats["p50_ms"]:>10.3f}'
+                              f'{stats["p95_ms"]:>10.3f}{stats["p99_ms"]:>10.3f}{stats["max_ms"]:>10.3f}')
+        if options['json']:
+            self.stdout.write(self.style.SUCCESS(f'Results appended to {options["json"]}'))
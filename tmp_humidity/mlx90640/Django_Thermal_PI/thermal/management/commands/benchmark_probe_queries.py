@@ -0,0 +1,146 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Min
+from django.utils import timezone
+from thermal.aggregation import Epoch, _raw_buckets
+from thermal.models import ProbeData
+from thermal.probe_storage import pack_probes
+from datetime import timedelta
+import numpy as np
+import json
+import time
+
+
+class Command(BaseCommand):
+    help = 'Time ProbeData queries on generated data (a year of 10 s samples by default); nothing is kept'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='Days of generated samples (default: 365)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=10,
+            help='Seconds between samples (default: 10)'
+        )
+        parser.add_argument(
+            '--probes',
+            type=int,
+            default=10,
+            help='Probes per sample (default: 10)'
+        )
+        parser.add_argument(
+            '--packed',
+            action='store_true',
+            help='Store per-probe values in the packed binary column instead of JSON'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per query (default: 5)'
+        )
+
+    def probes_data(self, rng, count, temperature, humidity):
+        data = {
+            f'probe{i + 1}': {
+                'x': int(rng.integers(80)),
+                'y': int(rng.integers(62)),
+                'temperature': round(float(temperature + rng.normal(0, 0.5)), 2),
+                'humidity': round(float(humidity + rng.normal(0, 1)), 2),
+            }
+            for i in range(count)
+        }
+        data[f'avg1-{count}'] = {
+            'temperature': round(temperature, 2),
+            'humidity': round(humidity, 2),
+            'checked_probes': list(range(1, count + 1)),
+            'formula': '0.05*x**2 - 5*x + 150',
+        }
+        return data
+
+    def generate(self, now, options, chunk_size=20000):
+        """Insert the samples with plain INSERTs (bulk_create would overwrite the timestamps)"""
+        rng = np.random.default_rng(0)
+        interval = options['interval']
+        total = options['days'] * 86400 // interval
+        start = now - timedelta(seconds=total * interval)
+        columns = ['timestamp', 'humidity', 'temperature', 'active_formula', 'probe_count', 'probes_data', 'probe_values']
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            connection.ops.quote_name(ProbeData._meta.db_table),
+            ', '.join(connection.ops.quote_name(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+
+        # Probe payloads are generated once and reused; only their size matters here
+        payloads = []
+        for _ in range(100):
+            data = self.probes_data(rng, options['probes'], rng.uniform(40, 60), rng.uniform(20, 80))
+            packed, rest = pack_probes(data)
+            payloads.append((json.dumps(rest), packed) if options['packed'] else (json.dumps(data), None))
+
+        temperatures = rng.uniform(40, 60, total).round(2)
+        humidities = rng.uniform(20, 80, total).round(2)
+        with connection.cursor() as cursor:
+            for first in range(0, total, chunk_size):
+                rows = []
+                for i in range(first, min(first + chunk_size, total)):
+                    probes_json, packed = payloads[i % len(payloads)]
+                    timestamp = connection.ops.adapt_datetimefield_value(start + timedelta(seconds=i * interval))
+                    rows.append((timestamp, float(humidities[i]), float(temperatures[i]), '0.05*x**2 - 5*x + 150',
+                                 options['probes'], probes_json, packed))
+                cursor.executemany(sql, rows)
+        return total, payloads
+
+    def timed(self, func, repeat):
+        func()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        return (time.perf_counter() - start) / repeat * 1000, result
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        now = timezone.now()
+        mode = 'packed' if options['packed'] else 'JSON'
+
+        with transaction.atomic():
+            start = time.perf_counter()
+            total, payloads = self.generate(now, options)
+            self.stdout.write(f'Inserted {total} samples with {options["probes"]} probes ({mode}) '
+                              f'in {time.perf_counter() - start:.1f} s')
+
+            probes_json, packed = payloads[0]
+            self.stdout.write(f'Per-probe payload: {len(probes_json) + len(packed or b"")} bytes per record')
+
+            hour_ago = now - timedelta(hours=1)
+            day_ago = now - timedelta(days=1)
+            month_ago = now - timedelta(days=30)
+            cases = [
+                ('last hour, full rows', lambda: len(list(ProbeData.objects.filter(timestamp__gte=hour_ago)))),
+                ('last hour, series()', lambda: len(list(ProbeData.objects.filter(timestamp__gte=hour_ago).series()))),
+                ('last day, full rows', lambda: len(list(ProbeData.objects.filter(timestamp__gte=day_ago)))),
+                ('last day, series()', lambda: len(list(ProbeData.objects.filter(timestamp__gte=day_ago).series()))),
+                ('last day, values_list', lambda: len(list(
+                    ProbeData.objects.filter(timestamp__gte=day_ago).values_list('timestamp', 'humidity')))),
+                ('last day, index bypassed', lambda: len(list(
+                    ProbeData.objects.annotate(epoch=Epoch('timestamp'))
+                    .filter(epoch__gte=int(day_ago.timestamp())).values_list('timestamp', 'humidity')))),
+                ('30 days hourly means (SQL)', lambda: len(_raw_buckets('hour', month_ago, None))),
+                ('oldest timestamp', lambda: ProbeData.objects.aggregate(first=Min('timestamp'))['first'] and 1),
+                ('latest record', lambda: ProbeData.objects.without_probes().first() and 1),
+            ]
+            for label, func in cases:
+                ms, rows = self.timed(func, repeat)
+                self.stdout.write(f'{label:<28} {ms:>10.2f} ms  ({rows} rows)')
+
+            self.stdout.write('Plan for the last-day query:')
+            self.stdout.write(ProbeData.objects.filter(timestamp__gte=day_ago).series().explain())
+
+            # Throw the generated rows away
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, generated data rolled back'))
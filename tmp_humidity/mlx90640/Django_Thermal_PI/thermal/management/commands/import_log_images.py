@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from thermal.models import ThermalSnapshot
+from thermal.snapshots import LOG_DIR, import_log_files, make_thumbnail
+import os
+
+
+class Command(BaseCommand):
+    help = 'Index log images in static/logs that have no ThermalSnapshot yet and create missing thumbnails'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-thumbnails',
+            action='store_true',
+            help='Only index the files, without creating thumbnails'
+        )
+        parser.add_argument(
+            '--remove-missing',
+            action='store_true',
+            help='Delete snapshots whose image file no longer exists'
+        )
+
+    def handle(self, *args, **options):
+        thumbnails = not options['no_thumbnails']
+        imported, skipped = import_log_files(ThermalSnapshot, thumbnails=thumbnails)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {imported} log images from {LOG_DIR}'))
+        for filename in skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {filename}: unknown file name format'))
+
+        if thumbnails:
+            # Files indexed by the migration or with --no-thumbnails
+            created = 0
+            for snapshot in ThermalSnapshot.objects.filter(thumbnail='').only('id', 'path').iterator():
+                try:
+                    snapshot.thumbnail = make_thumbnail(os.path.basename(snapshot.path))
+                except OSError as e:
+                    self.stdout.write(self.style.WARNING(f'No thumbnail for {snapshot.path}: {e}'))
+                    continue
+                snapshot.save(update_fields=['thumbnail'])
+                created += 1
+            self.stdout.write(f'Created {created} missing thumbnails')
+
+        if options['remove_missing']:
+            missing = [snapshot.id for snapshot in ThermalSnapshot.objects.only('id', 'path').iterator()
+                       if not os.path.exists(os.path.join(LOG_DIR, os.path.basename(snapshot.path)))]
+            ThermalSnapshot.objects.filter(id__in=missing).delete()
+            self.stdout.write(f'Removed {len(missing)} snapshots without an image file')
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from thermal.models import ProbeData, ProbeDataRollup
+from thermal.rollups import RAW_RETENTION_DAYS, ROLLUP_RETENTION_DAYS, prune, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Delete raw ProbeData and minute/hour rollups older than their retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--raw-days',
+            type=int,
+            default=RAW_RETENTION_DAYS,
+            help=f'Days of raw probe data to keep (default: {RAW_RETENTION_DAYS})'
+        )
+        parser.add_argument(
+            '--minute-days',
+            type=int,
+            default=ROLLUP_RETENTION_DAYS[ProbeDataRollup.MINUTE],
+            help='Days of minute rollups to keep'
+        )
+        parser.add_argument(
+            '--hour-days',
+            type=int,
+            default=ROLLUP_RETENTION_DAYS[ProbeDataRollup.HOUR],
+            help='Days of hour rollups to keep'
+        )
+        parser.add_argument(
+            '--rebuild-rollups',
+            action='store_true',
+            help='Recompute all rollups from the raw rows before pruning'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be deleted'
+        )
+
+    def handle(self, *args, **options):
+        # Raw rows saved before rollups existed must be rolled up before they are deleted
+        if options['rebuild_rollups'] or (not ProbeDataRollup.objects.exists() and ProbeData.objects.exists()):
+            if options['dry_run']:
+                self.stdout.write('Rollups would be rebuilt from the raw probe data')
+            else:
+                rows = rebuild_rollups()
+                self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups from {rows} raw rows'))
+
+        deleted = prune(
+            raw_days=options['raw_days'],
+            rollup_days={
+                ProbeDataRollup.MINUTE: options['minute_days'],
+                ProbeDataRollup.HOUR: options['hour_days'],
+            },
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        for tier, count in deleted.items():
+            self.stdout.write(f'{verb} {count} {tier} rows')
+        self.stdout.write(self.style.SUCCESS('Pruning finished'))
@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.conf import settings
+from django.apps import apps
+from thermal.service import ThermalService, serve_in_thread
+from werkzeug.serving import make_server
+import asyncio
+import signal
+import sys
+
+# thermal_api.py and frame_archive.py live next to the Django project
+sys.path.append(str(settings.BASE_DIR.parent))
+import thermal_api  # noqa: E402
+from frame_archive import FrameRecorder  # noqa: E402
+
+
+class Command(BaseCommand):
+    help = ('Run the sensor API, the frame pipeline and the Django site in one process '
+            '(replaces thermal_api.py, thermal_worker.py and runserver)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host',
+            default='0.0.0.0',
+            help='Address both servers listen on (default: 0.0.0.0)'
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8001,
+            help='Port of the Django site (default: 8001)'
+        )
+        parser.add_argument(
+            '--api-port',
+            type=int,
+            default=5000,
+            help='Port of the sensor API (/temperature, /stream, ...), 0 to disable (default: 5000)'
+        )
+        parser.add_argument(
+            '--max-fps',
+            type=float,
+            default=5,
+            help='Frames processed per second at most, 0 for every sensor frame (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        host = options['host']
+        servers = []
+        service = None
+        acquisition = thermal_api.start_acquisition()
+        try:
+            archive = None
+            if settings.THERMAL_ARCHIVE_DIR:
+                archive = FrameRecorder(settings.THERMAL_ARCHIVE_DIR, interval=settings.THERMAL_ARCHIVE_INTERVAL,
+                                        max_bytes=settings.THERMAL_ARCHIVE_MAX_BYTES,
+                                        max_age_days=settings.THERMAL_ARCHIVE_MAX_DAYS)
+            service = ThermalService(acquisition, max_fps=options['max_fps'] or None, archive=archive)
+
+            try:
+                if options['api_port']:
+                    servers.append(make_server(host, options['api_port'], thermal_api.app, threaded=True))
+                    serve_in_thread(servers[-1], 'thermal-api')
+
+                handler = get_internal_wsgi_application()
+                if settings.DEBUG and apps.is_installed('django.contrib.staticfiles'):
+                    from django.contrib.staticfiles.handlers import StaticFilesHandler
+                    handler = StaticFilesHandler(handler)
+                servers.append(ThreadedWSGIServer((host, options['port']), WSGIRequestHandler))
+                servers[-1].set_app(handler)
+                serve_in_thread(servers[-1], 'django')
+            except OSError as e:
+                raise CommandError(f'Could not start the servers: {e}')
+
+            self.stdout.write(self.style.SUCCESS(
+                f'Thermal service running: site on {host}:{options["port"]}'
+                + (f', sensor API on {host}:{options["api_port"]}' if options['api_port'] else '')
+            ))
+            asyncio.run(self.run_service(service))
+            self.stdout.write(f'Thermal service stopped: {service.stats()}')
+        finally:
+            for server in servers:
+                server.shutdown()
+                server.server_close()
+            if service is not None:
+                service.close()
+            thermal_api.stop_acquisition()
+
+    async def run_service(self, service):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await service.run(stop)
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 00:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thermal', '0008_cdprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProbeDataRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=6)),
+                ('bucket', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('temperature_sum', models.FloatField(default=0)),
+                ('temperature_min', models.FloatField()),
+                ('temperature_max', models.FloatField()),
+                ('humidity_sum', models.FloatField(default=0)),
+                ('humidity_min', models.FloatField()),
+                ('humidity_max', models.FloatField()),
+            ],
+            options={
+                'ordering': ['resolution', '-bucket'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='probedatarollup',
+            constraint=models.UniqueConstraint(fields=('resolution', 'bucket'), name='unique_probe_rollup_bucket'),
+        ),
+    ]
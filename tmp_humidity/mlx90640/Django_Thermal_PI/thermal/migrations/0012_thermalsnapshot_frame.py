@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thermal', '0011_thermalsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thermalsnapshot',
+            name='frame_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='thermalsnapshot',
+            name='raw_path',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
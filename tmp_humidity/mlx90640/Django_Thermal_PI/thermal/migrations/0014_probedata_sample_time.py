@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('thermal', '0013_probedata_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='probedata',
+            name='sample_time',
+            field=models.DateTimeField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -1,9 +1,15 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 import json
+import os
 import jdatetime
+import numpy as np
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
+from .probe_storage import unpack_probes
+
 IRAN_TZ = ZoneInfo("Asia/Tehran")
 
 class ProbeConfiguration(models.Model):
@@ -127,13 +133,29 @@ class ProbeConfiguration(models.Model):
         
         return None
 
+class ProbeDataQuerySet(models.QuerySet):
+    def series(self):
+        """Only the columns needed for charts and aggregates"""
+        return self.only('timestamp', 'temperature', 'humidity')
+
+    def without_probes(self):
+        """Everything except the per-probe payload"""
+        return self.defer('probes_data', 'probe_values')
+
+
 class ProbeData(models.Model):
-    timestamp = models.DateTimeField(auto_now_add=True)  # Store formatted timestamp
+    # Set when the sample is taken; records written later by the probe buffer keep it (thermal/probe_buffer.py)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
+    # Start of the THERMAL_SAVE_INTERVAL slot the record samples; one record per slot, whoever saves it
+    sample_time = models.DateTimeField(null=True, blank=True, unique=True, editable=False)
     humidity = models.FloatField()
     temperature = models.FloatField()
     active_formula = models.TextField()
     probe_count = models.IntegerField()
     probes_data = models.JSONField()  # Store all probe data as JSON
+    probe_values = models.BinaryField(null=True, blank=True)  # Packed per-probe values (thermal/probe_storage.py)
+    
+    objects = ProbeDataQuerySet.as_manager()
     
     class Meta:
         ordering = ['-timestamp']
@@ -142,7 +164,7 @@ class ProbeData(models.Model):
         return f"ProbeData {self.timestamp} - {self.probe_count} probes"
     
     def save(self, *args, **kwargs):
-        # Timestamp is automatically set by auto_now_add=True
+        # Timestamp defaults to the time the record is created
         super().save(*args, **kwargs)
     
     def get_jalali_date(self):
@@ -166,9 +188,165 @@ class ProbeData(models.Model):
             return str(self.timestamp)
     
     def get_probes_data(self):
-        """Get probes data as Python dict"""
-        return self.probes_data if isinstance(self.probes_data, dict) else json.loads(self.probes_data)
+        """Get probes data as Python dict, including the packed per-probe values"""
+        probes_data = self.probes_data if isinstance(self.probes_data, dict) else json.loads(self.probes_data)
+        if not self.probe_values:
+            return probes_data
+        return {**unpack_probes(self.probe_values), **probes_data}
     
     def set_probes_data(self, data):
         """Set probes data from Python dict"""
-        self.probes_data = data
\ No newline at end of file
+        self.probes_data = data
+        self.probe_values = None
+
+class CDProfile(models.Model):
+    """Cross-direction temperature profile and detected streaks over a window of frames"""
+    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    frame_id = models.BigIntegerField(default=0)  # Newest frame in the window
+    window_rows = models.IntegerField()  # Number of frames in the window
+    window_seconds = models.FloatField()
+    mean_temperature = models.FloatField()
+    min_temperature = models.FloatField()
+    max_temperature = models.FloatField()
+    profile = models.JSONField(default=list)  # Mean temperature of every column over the window
+    streak_count = models.IntegerField(default=0)
+    streaks = models.JSONField(default=list)  # [{"type": "wet"|"dry", "start_col", "end_col", ...}]
+    
+    class Meta:
+        ordering = ['-timestamp']
+    
+    def __str__(self):
+        return f"CDProfile {self.timestamp} - {self.streak_count} streaks"
+    
+    def get_jalali_date(self):
+        """Convert stored timestamp to Jalali format"""
+        try:
+            if self.timestamp:
+                dt = self.timestamp.astimezone(IRAN_TZ)
+                jalali_dt = jdatetime.datetime.fromgregorian(datetime=dt)
+                return jalali_dt.strftime('%Y/%m/%d %H:%M:%S')
+            return str(self.timestamp)
+        except Exception as e:
+            return str(self.timestamp)
+
+
+class ProbeDataRollup(models.Model):
+    """Minute/hour/day aggregates of ProbeData, maintained as records are saved (see thermal/rollups.py)"""
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    DAY = 'day'
+    RESOLUTION_CHOICES = [
+        (MINUTE, 'Minute'),
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    ]
+
+    resolution = models.CharField(max_length=6, choices=RESOLUTION_CHOICES)
+    bucket = models.DateTimeField()  # Start of the minute/hour/day in Iran time
+    count = models.IntegerField(default=0)
+    temperature_sum = models.FloatField(default=0)
+    temperature_min = models.FloatField()
+    temperature_max = models.FloatField()
+    humidity_sum = models.FloatField(default=0)
+    humidity_min = models.FloatField()
+    humidity_max = models.FloatField()
+    
+    class Meta:
+        ordering = ['resolution', '-bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['resolution', 'bucket'], name='unique_probe_rollup_bucket'),
+        ]
+    
+    def __str__(self):
+        return f"ProbeDataRollup {self.resolution} {self.bucket} - {self.count} samples"
+    
+    @property
+    def temperature_mean(self):
+        return self.temperature_sum / self.count if self.count else None
+    
+    @property
+    def humidity_mean(self):
+        return self.humidity_sum / self.count if self.count else None
+
+
+class ThermalSnapshot(models.Model):
+    """Log image saved from the thermal view (see thermal/snapshots.py)"""
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
+    path = models.CharField(max_length=255, unique=True)  # Relative to the static directory, e.g. logs/<name>.jpg
+    thumbnail = models.CharField(max_length=255, blank=True)  # Relative to the static directory; empty if not made yet
+    row = models.IntegerField(null=True, blank=True)  # Marked probe position on the grid
+    col = models.IntegerField(null=True, blank=True)
+    temperature = models.FloatField(null=True, blank=True)  # Average temperature around the marked position
+    frame_id = models.BigIntegerField(null=True, blank=True)  # Frame bus id of the rendered frame
+    raw_path = models.CharField(max_length=255, blank=True)  # Raw frame as .npy, relative to the static directory
+    
+    class Meta:
+        ordering = ['-timestamp']
+    
+    def __str__(self):
+        return f"ThermalSnapshot {self.timestamp} - {self.temperature}"
+    
+    def load_frame(self):
+        """Raw temperature grid the image was rendered from, or None for images saved without one"""
+        if not self.raw_path:
+            return None
+        return np.load(os.path.join(settings.BASE_DIR, 'static', self.raw_path))
+    
+    @property
+    def url(self):
+        return settings.STATIC_URL + self.path
+    
+    @property
+    def thumbnail_url(self):
+        return settings.STATIC_URL + (self.thumbnail or self.path)
+    
+    def get_jalali_date(self):
+        """Convert stored timestamp to Jalali format"""
+        try:
+            if self.timestamp:
+                dt = self.timestamp.astimezone(IRAN_TZ)
+                jalali_dt = jdatetime.datetime.fromgregorian(datetime=dt)
+                return jalali_dt.strftime('%Y/%m/%d %H:%M:%S')
+            return str(self.timestamp)
+        except Exception as e:
+            return str(self.timestamp)
+
+
+class AlarmEvent(models.Model):
+    """An alarm raised or cleared by an alarm rule (see thermal/alarms.py)"""
+    RAISED = 'raised'
+    CLEARED = 'cleared'
+    STATE_CHOICES = [
+        (RAISED, 'Raised'),
+        (CLEARED, 'Cleared'),
+    ]
+
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
+    rule = models.CharField(max_length=64)  # Name of the rule in THERMAL_ALARM_RULES
+    target = models.CharField(max_length=32)  # Probe key, or "average" for the average of the checked probes
+    state = models.CharField(max_length=7, choices=STATE_CHOICES)
+    value = models.FloatField(null=True, blank=True)  # Temperature/humidity, or its rate per second for rate rules
+    manual_mode = models.BooleanField(default=False)  # The rule switches the system to manual mode while raised
+    message = models.CharField(max_length=255, blank=True)
+    frame_id = models.BigIntegerField(null=True, blank=True)  # Frame bus id of the frame that triggered it
+    
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            # Latest event of every rule/target, i.e. the alarms currently active
+            models.Index(fields=['rule', 'target', 'timestamp'], name='alarm_event_rule_target'),
+        ]
+    
+    def __str__(self):
+        return f"AlarmEvent {self.timestamp} - {self.rule} {self.target} {self.state}"
+    
+    def get_jalali_date(self):
+        """Convert stored timestamp to Jalali format"""
+        try:
+            if self.timestamp:
+                dt = self.timestamp.astimezone(IRAN_TZ)
+                jalali_dt = jdatetime.datetime.fromgregorian(datetime=dt)
+                return jalali_dt.strftime('%Y/%m/%d %H:%M:%S')
+            return str(self.timestamp)
+        except Exception as e:
+            return str(self.timestamp)
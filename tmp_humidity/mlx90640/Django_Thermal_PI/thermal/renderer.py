@@ -0,0 +1,59 @@
+"""Render raw thermal frames to colour-mapped JPEG/PNG bytes in memory.
+
+The colormap lookup table is built once per colormap, and the intermediate
+uint8/resized/colour images are allocated once per output size, so rendering
+a frame is a normalize, a resize, a table lookup and an in-memory encode.
+"""
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+DEFAULT_SIZE = (800, 620)  # (width, height)
+DEFAULT_QUALITY = 85
+PNG_COMPRESSION = 1  # 0-9; low levels are much faster and only slightly larger
+
+
+@lru_cache(maxsize=None)
+def colormap_lut(colormap=cv2.COLORMAP_INFERNO):
+    """256x1x3 BGR lookup table for one of OpenCV's built-in colormaps"""
+    ramp = np.arange(256, dtype=np.uint8).reshape(256, 1)
+    return cv2.applyColorMap(ramp, colormap)
+
+
+class ThermalRenderer:
+    """Reusable renderer for frames of one output size and colormap"""
+
+    def __init__(self, size=DEFAULT_SIZE, colormap=cv2.COLORMAP_INFERNO, quality=DEFAULT_QUALITY):
+        self.size = tuple(size)
+        self.quality = quality
+        self.lut = colormap_lut(colormap)
+        width, height = self.size
+        self._resized = np.empty((height, width), dtype=np.uint8)
+        self._color = np.empty((height, width, 3), dtype=np.uint8)
+        self._gray = None
+
+    def render(self, frame):
+        """Colour-mapped BGR image of ``frame``; the array is reused by the next call"""
+        frame = np.asarray(frame, dtype=np.float32)
+        if self._gray is None or self._gray.shape != frame.shape:
+            self._gray = np.empty(frame.shape, dtype=np.uint8)
+        cv2.normalize(frame, self._gray, 0, 255, cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+        cv2.resize(self._gray, self.size, dst=self._resized, interpolation=cv2.INTER_LINEAR)
+        cv2.applyColorMap(self._resized, self.lut, dst=self._color)
+        return self._color
+
+    def encode(self, image, fmt="jpg", quality=None):
+        """Encode a BGR image to JPEG or PNG bytes"""
+        if fmt == "png":
+            params = [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION]
+        else:
+            fmt = "jpg"
+            params = [cv2.IMWRITE_JPEG_QUALITY, int(quality or self.quality)]
+        ok, buf = cv2.imencode(f".{fmt}", image, params)
+        if not ok:
+            raise ValueError(f"Could not encode thermal image as {fmt}")
+        return buf.tobytes()
+
+    def render_bytes(self, frame, fmt="jpg", quality=None):
+        return self.encode(self.render(frame), fmt, quality)
@@ -0,0 +1,214 @@
+"""Single-process thermal service (manage.py run_thermal_service).
+
+The default deployment runs three processes: thermal_api.py owns the
+sensor, thermal_worker.py polls it over HTTP and writes the frame bus and
+files, and the Django server answers the browser. Here the three share one
+interpreter: thermal_api's acquisition thread reads the sensor, an asyncio
+pipeline moves frames through bounded queues (acquire -> process ->
+database) and the Flask API and the Django site are served from threads of
+the same process.
+
+When a stage falls behind, the frame queue drops its oldest frame instead of
+adding latency. The ORM is synchronous, so database jobs (probe data, CD
+profiles) run on one dedicated thread, several at a time in one transaction.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .alarms import get_alarm_engine, record_alarm_events
+from .cd_profile import get_cd_buffer, save_cd_profile
+from .file_writer import FileWriter, format_thermal_map
+from .frame_bus import FrameBus, use_frame_bus
+from .renderer import ThermalRenderer
+from .views import auto_save_probe_data
+
+STATIC_DIR = os.path.join(settings.BASE_DIR, 'static')
+SAVE_INTERVAL = getattr(settings, 'THERMAL_SAVE_INTERVAL', 60)
+FRAME_QUEUE_SIZE = getattr(settings, 'THERMAL_SERVICE_FRAME_QUEUE', 4)
+DB_QUEUE_SIZE = getattr(settings, 'THERMAL_SERVICE_DB_QUEUE', 100)
+DB_BATCH_SIZE = getattr(settings, 'THERMAL_SERVICE_DB_BATCH', 20)
+DB_BATCH_DELAY = getattr(settings, 'THERMAL_SERVICE_DB_BATCH_DELAY', 2.0)
+STATS_INTERVAL = 300
+
+
+class ThermalService:
+    """Frame pipeline fed by a FrameAcquisition (see acquisition.py)"""
+
+    def __init__(self, acquisition, max_fps=None, archive=None, save_interval=SAVE_INTERVAL):
+        self.acquisition = acquisition
+        self.max_fps = max_fps
+        self.archive = archive
+        self.save_interval = save_interval
+
+        # Raw frames for the Django views of this process and any other reader
+        self.bus = FrameBus(create=True)
+        use_frame_bus(self.bus)
+        self.cd_buffer = get_cd_buffer(self.bus.shape[1])
+        self.alarms = get_alarm_engine()
+        self.renderer = ThermalRenderer(size=settings.THERMAL_IMAGE_SIZE, quality=settings.THERMAL_IMAGE_QUALITY)
+        # thermal_map.txt and the snapshot are encoded and replaced atomically off the event loop
+        self.writer = FileWriter()
+        self.db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thermal-db')
+
+        self.frames = None
+        self.db_jobs = None
+        self._batch = []
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+        self.db_written = 0
+        self.db_batches = 0
+        self.db_dropped = 0
+        self.db_errors = 0
+
+    async def acquire(self):
+        """Hand every new sensor frame to the process stage, dropping the oldest one if it is behind"""
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self.max_fps if self.max_fps else 0
+        last_id = 0
+        while True:
+            started = loop.time()
+            entry = await loop.run_in_executor(None, self.acquisition.wait_for_frame, last_id, 1.0)
+            if entry is None:
+                continue
+            last_id = entry[0]
+            self.received += 1
+            if self.frames.full():
+                self.frames.get_nowait()
+                self.dropped += 1
+            self.frames.put_nowait(entry)
+            if interval:
+                await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+
+    async def process(self):
+        """Publish, archive and write each frame, evaluate the alarm rules; queue the database saves"""
+        loop = asyncio.get_running_loop()
+        last_snapshot = 0
+        last_slot = None
+        while True:
+            _, timestamp, frame = await self.frames.get()
+            # Same orientation as the worker stores the API's frames
+            arr = np.fliplr(frame)
+            frame_id = self.bus.publish(arr, timestamp)
+            self.cd_buffer.add_frame(frame_id, timestamp, arr)
+            # The probe configuration may have to be read from the database, which can't be done on the event loop
+            events = await loop.run_in_executor(None, self.alarms.evaluate_frame, arr, timestamp, frame_id)
+            if events:
+                self.submit_db(record_alarm_events, events)
+            if self.archive is not None:
+                self.archive.add(arr, timestamp, frame_id)
+            self.writer.submit(os.path.join(STATIC_DIR, 'thermal_map.txt'), format_thermal_map, arr, 2, False)
+
+            now = time.monotonic()
+            if now - last_snapshot >= settings.THERMAL_SNAPSHOT_INTERVAL:
+                self.writer.submit(os.path.join(STATIC_DIR, 'thermal_image.jpg'), self.renderer.render_bytes, arr)
+                last_snapshot = now
+            # First frame of every sampling slot (probe records are unique per slot)
+            slot = int(timestamp // self.save_interval)
+            if slot != last_slot:
+                self.submit_db(auto_save_probe_data, arr, timestamp)
+                if settings.THERMAL_CD_PROFILE_RECORDS:
+                    self.submit_db(save_cd_profile, self.cd_buffer)
+                last_slot = slot
+            self.processed += 1
+
+    def submit_db(self, func, *args):
+        try:
+            self.db_jobs.put_nowait((func, args))
+        except asyncio.QueueFull:
+            self.db_dropped += 1
+            print(f"Database queue full, dropped {func.__name__}")
+
+    async def write(self):
+        """Run queued database jobs in batches on the database thread"""
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch = [await self.db_jobs.get()]
+            deadline = loop.time() + DB_BATCH_DELAY
+            while len(self._batch) < DB_BATCH_SIZE:
+                try:
+                    self._batch.append(await asyncio.wait_for(self.db_jobs.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            jobs, self._batch = self._batch, []
+            await loop.run_in_executor(self.db_executor, self.run_db_jobs, jobs)
+
+    def run_db_jobs(self, jobs):
+        close_old_connections()
+        try:
+            with transaction.atomic():
+                for func, args in jobs:
+                    try:
+                        # A failing job is rolled back to its savepoint without losing the others
+                        with transaction.atomic():
+                            func(*args)
+                    except Exception as e:
+                        self.db_errors += 1
+                        print(f"Error in {func.__name__}: {e}")
+            self.db_written += len(jobs)
+            self.db_batches += 1
+        except Exception as e:
+            self.db_errors += 1
+            print(f"Error writing {len(jobs)} database jobs: {e}")
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            print("Thermal service stats:", self.stats())
+
+    def stats(self):
+        return {
+            "received": self.received,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "frame_queue": self.frames.qsize() if self.frames else 0,
+            "db_queue": self.db_jobs.qsize() if self.db_jobs else 0,
+            "db_written": self.db_written,
+            "db_batches": self.db_batches,
+            "db_dropped": self.db_dropped,
+            "db_errors": self.db_errors,
+            "acquisition": self.acquisition.stats(),
+            "alarms": self.alarms.stats(),
+        }
+
+    async def run(self, stop):
+        """Run the pipeline until the ``stop`` event is set, then write what is still queued"""
+        self.frames = asyncio.Queue(maxsize=FRAME_QUEUE_SIZE)
+        self.db_jobs = asyncio.Queue(maxsize=DB_QUEUE_SIZE)
+        self.writer.start()
+        tasks = [asyncio.create_task(stage) for stage in (self.acquire(), self.process(), self.write(), self.report())]
+        try:
+            await stop.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Jobs still being collected into a batch, then the rest of the queue
+            pending = self._batch
+            while not self.db_jobs.empty():
+                pending.append(self.db_jobs.get_nowait())
+            if pending:
+                await asyncio.get_running_loop().run_in_executor(self.db_executor, self.run_db_jobs, pending)
+            self.db_executor.shutdown()
+            self.writer.stop()
+            if self.archive is not None:
+                self.archive.close()
+
+    def close(self):
+        """Release the frame bus, once nothing in the process reads it any more"""
+        use_frame_bus(None)
+        self.bus.close()
+
+
+def serve_in_thread(server, name):
+    """Run a blocking ``serve_forever`` server on a daemon thread"""
+    thread = threading.Thread(target=server.serve_forever, name=name, daemon=True)
+    thread.start()
+    return thread
@@ -13,4 +13,12 @@ urlpatterns = [
     path("get-probe-config/", get_probe_configuration, name="get_probe_config"),
     path("test/", test_view, name="test_view"),
     path("chart/", chart_view, name="chart_view"),
+    path("frame/", frame_data, name="frame_data"),
+    path("stream/", frame_stream, name="frame_stream"),
+    path("thermal-image.jpg", thermal_image, name="thermal_image"),
+    path("humidity/", humidity_data, name="humidity_data"),
+    path("humidity.bin", humidity_binary, name="humidity_binary"),
+    path("cd-profile/", cd_profile_data, name="cd_profile"),
+    path("alarms/", alarm_data, name="alarm_data"),
+    path("alarms/stream/", alarm_stream, name="alarm_stream"),
 ]
\ No newline at end of file
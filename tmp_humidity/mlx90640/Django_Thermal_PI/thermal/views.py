@@ -1,14 +1,29 @@
 from django.shortcuts import render
-from django.http import JsonResponse
-import time, os, shutil, json
+from django.core.paginator import Paginator
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+import time, os, shutil, json, threading
 from django.views.decorators.csrf import csrf_exempt
-from datetime import datetime
+from datetime import datetime, timezone as dt_timezone
 from django.conf import settings
+from django.utils import timezone
 from PIL import Image, ImageDraw
 import jdatetime
 from zoneinfo import ZoneInfo
-from .models import ProbeData
+import numpy as np
 from .models import ProbeConfiguration
+from .models import ThermalSnapshot
+from .frame_bus import get_frame_bus, STALE_AFTER
+from .renderer import ThermalRenderer
+from .probes import get_probe_sampler, ProbeSampler
+from .formula import compile_formula, evaluate_formula, FormulaError
+from .humidity_map import humidity_for_frame
+from .cd_profile import update_from_bus, analyze
+from .probe_buffer import insert_probe_records, queue_probe_record, sample_slot
+from .aggregation import humidity_series
+from .config_cache import get_probe_config
+from .alarms import active_alarms, alarm_events_after, event_payload, get_alarm_engine, record_alarm_events
+from .models import AlarmEvent
+from .snapshots import PAGE_SIZE, log_filename, mark_cell, record_snapshot, write_snapshot_files
 
 DATA_IS_CORRECT = True
 PI_IP = "192.168.221.102"
@@ -25,6 +40,24 @@ DATA_FILE = os.path.join(settings.BASE_DIR, "device_inputs.json")
 # Get Iran/Tehran timezone
 IRAN_TZ = ZoneInfo("Asia/Tehran")
 
+# Log images listed on the main page
+LOG_PREVIEW = 20
+
+# Server-Sent Events frame stream
+STREAM_POLL_INTERVAL = 0.05  # seconds between frame bus checks
+STREAM_MAX_FPS = 5  # upper bound on frames pushed to one client
+STREAM_HEARTBEAT = 15  # seconds between keep-alive comments
+# Seconds a stream holds its server thread; the browser then reconnects, resuming after its Last-Event-ID
+STREAM_MAX_AGE = 300
+STREAM_RECONNECT = 100  # ms the browser waits before reconnecting a stream closed for its age
+ALARM_POLL_INTERVAL = 1.0  # seconds between alarm event checks of an alarm stream
+PAGE_ALARM_LOCK = threading.Lock()  # One page evaluation at a time, from the stored state
+
+# Live thermal image rendered from the latest frame; one encoded image per frame/format/quality
+RENDERER = ThermalRenderer(size=settings.THERMAL_IMAGE_SIZE, quality=settings.THERMAL_IMAGE_QUALITY)
+RENDER_LOCK = threading.Lock()
+RENDERED_IMAGES = {}
+
 
 
 def test_view(request):
@@ -32,67 +65,54 @@ def test_view(request):
     return JsonResponse({'status': 'success', 'message': 'Test view working'})
 
 def thermal_view(request):
-    log_dir = os.path.join(settings.BASE_DIR, 'static', 'logs')
-    logs = []
-
-    if os.path.exists(log_dir):
-        for filename in sorted(os.listdir(log_dir), reverse=True):
-            if filename.endswith('.jpg'):
-                details = filename.split("_")
-                logs.append({'path':f'/static/logs/{filename}','date':details[0],'time':details[1].replace("-",":"),'temp':details[2].replace(".jpg","")})
+    # Latest log images, newest first (the full list is on the logs page)
+    logs = ThermalSnapshot.objects.all()[:LOG_PREVIEW]
     return render(request,"thermal/index.html",context={"log":logs,"formuls":FORMULA})
 
 def show_log(request):
-    log_dir = os.path.join(settings.BASE_DIR, 'static', 'logs')
-    logs = []
-
-    if os.path.exists(log_dir):
-        for filename in sorted(os.listdir(log_dir), reverse=True):
-            if filename.endswith('.jpg'):
-                details = filename.split("_")
-                logs.append({'path':f'/static/logs/{filename}','date':details[0],'time':details[1].replace("-",":"),'temp':details[2].replace(".jpg","")})
-    return render(request,"thermal/logs.html",context={"log":logs})
+    page = Paginator(ThermalSnapshot.objects.all(), PAGE_SIZE).get_page(request.GET.get('page'))
+    return render(request,"thermal/logs.html",context={"log":page,"page":page})
 
 @csrf_exempt
 def save_log_image(request):
+    """Save the clicked frame (?frame_id) as a log image with the selected cell marked, plus its raw data"""
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
             row = data.get("row")
             col = data.get("col")
-            avg_temp = data.get("avg_temp")
-
-            # Use Iran/Tehran timezone for timestamp
-            iran_dt = datetime.now(IRAN_TZ)
-            jalali_dt = jdatetime.datetime.fromgregorian(datetime=iran_dt)
-            timestamp = jalali_dt.strftime("%Y-%m-%d_%H-%M-%S")
-            temp_part = f"{avg_temp:.1f}"
-            filename = f"{timestamp}_{temp_part}.jpg"
+            requested_id = data.get("frame_id") or 0
 
-            src_path = os.path.join("static", "thermal_image.jpg")
-            dst_path = os.path.join("static/logs", filename)
+            # The frame the user clicked on if it is still in the frame bus, else the latest one
+            frame = load_frame(int(requested_id))
+            if frame is None:
+                return JsonResponse({'error': 'No thermal data available'}, status=503)
+            frame_id, timestamp, grid = frame
+            if not (isinstance(row, int) and isinstance(col, int)
+                    and 0 <= row < grid.shape[0] and 0 <= col < grid.shape[1]):
+                return JsonResponse({'error': 'Invalid position'}, status=400)
 
-            os.makedirs("static/logs", exist_ok=True)
+            # Same 3x3 average the page shows for the clicked cell
+            avg_temp = float(ProbeSampler([('log', row, col)], grid.shape, 3, None).sample(grid)[0])
 
-            # draw
-            with Image.open(src_path) as img:
-                draw = ImageDraw.Draw(img)
-
-                img_width, img_height = img.size
-                cell_width = img_width / 80
-                cell_height = img_height / 62
-
-                left = col * cell_width
-                top = row * cell_height
-                right = left + cell_width
-                bottom = top + cell_height
-
-                # orange rectangle
-                draw.rectangle([left, top, right, bottom], outline="white", width=2)
+            # Use Iran/Tehran timezone for timestamp
+            iran_dt = datetime.fromtimestamp(timestamp, IRAN_TZ)
+            filename = log_filename(iran_dt, avg_temp)
 
-                img.save(dst_path)
+            with RENDER_LOCK:
+                image = mark_cell(RENDERER.render(grid).copy(), row, col, grid.shape)
+            thumbnail, raw_path = write_snapshot_files(filename, image, grid, RENDERER.quality)
 
-            return JsonResponse({'status': 'ok'})
+            snapshot = record_snapshot(filename, iran_dt, round(avg_temp, 2), row, col,
+                                       frame_id or None, thumbnail, raw_path)
+            return JsonResponse({
+                'status': 'ok',
+                'id': snapshot.id,
+                'path': snapshot.url,
+                'frame_id': frame_id,
+                'exact_frame': bool(requested_id) and frame_id == int(requested_id),
+                'temperature': snapshot.temperature,
+            })
 
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
@@ -103,20 +123,14 @@ def save_log_image(request):
 def calculate_formula(formula):
     min_v = 480
     max_v = 600
-    output = []
     targets = [i / 10.0 for i in range(min_v, max_v, 1)]
-    i = 1
-    for f in formula:
-        for x in targets:
-            newformula = f.replace("temp", str(x))
-            Humidity = eval(newformula)
-            if i > 1:
-                for y in output:
-                    if y["temp"] == x:
-                        y[f"f{i}"] = f"{Humidity:.2f}"
-            else:
-                output.append({"temp": x, f"f{i}": f"{Humidity:.2f}"})
-        i += 1
+    output = [{"temp": x} for x in targets]
+    temps = np.array(targets)
+    for i, f in enumerate(formula, start=1):
+        # One vectorized evaluation per formula instead of one eval per cell
+        humidity = evaluate_formula(f, temps)
+        for row, value in zip(output, humidity.tolist()):
+            row[f"f{i}"] = f"{value:.2f}"
     return output
 
 
@@ -176,30 +190,38 @@ def save_probe_data(request):
             if humidity is None or temperature is None or not active_formula:
                 return JsonResponse({'error': 'Missing required fields'}, status=400)
             
-            # Check temperature range - if out of range, don't save and return alarm status
-            if temperature < 35 or temperature > 70:
+            # Manual mode or temperature out of range - don't save and return alarm status
+            sampled_by_server, alarm = check_page_probe_data(probes_data, temperature, humidity)
+            if alarm is not None:
+                return alarm
+            
+            # While the worker samples the frames itself, pages don't add records of their own
+            if sampled_by_server:
                 return JsonResponse({
-                    'status': 'alarm',
-                    'message': 'the system has switched to manual mode',
-                    'temperature': temperature,
-                    'humidity': humidity,
-                    'alarm_triggered': True,
-                    'reason': 'Temperature out of range (below 30°C or above 70°C)'
+                    'status': 'success',
+                    'saved': False,
+                    'reason': 'sampled by the server',
+                    'probe_count': probe_count,
+                    'alarm_triggered': False
                 })
             
-            # Create and save probe data record only if temperature is in range
-            probe_record = ProbeData.objects.create(
-                humidity=humidity,
-                temperature=temperature,
-                active_formula=active_formula,
-                probe_count=probe_count,
-                probes_data=probes_data
-            )
+            # Queue the probe data record (in range, checked above); it is written in a batch.
+            # One record per sampling slot, however many pages post in it
+            timestamp = timezone.now()
+            saved = queue_probe_record({
+                'timestamp': timestamp,
+                'sample_time': sample_slot(timestamp.timestamp()),
+                'humidity': humidity,
+                'temperature': temperature,
+                'active_formula': active_formula,
+                'probe_count': probe_count,
+                'probes_data': probes_data,
+            })
             
             return JsonResponse({
                 'status': 'success',
-                'id': probe_record.id,
-                'timestamp': probe_record.timestamp.isoformat(),
+                'saved': saved,
+                'timestamp': timestamp.isoformat(),
                 'probe_count': probe_count,
                 'alarm_triggered': False
             })
@@ -227,33 +249,24 @@ def update_probe_configuration(request):
             # Validate required fields
             if not active_formula:
                 return JsonResponse({'error': 'Missing active_formula'}, status=400)
+            try:
+                compile_formula(active_formula)
+            except FormulaError as e:
+                return JsonResponse({'error': str(e)}, status=400)
             
             # Calculate probe count excluding average data
             probe_count = len([k for k in probes_data.keys() if not k.startswith('avg')])
             
-            # Create or update probe configuration
-            config, created = ProbeConfiguration.objects.get_or_create(
-                id=1,  # Always use ID 1 for the current configuration
-                defaults={
-                    'active_formula': active_formula,
-                    'probes_data': probes_data,
-                    'probe_count': probe_count,
-                    'checked_probes': checked_probes
-                }
-            )
-            
-            if not created:
-                # Update existing configuration
-                config.active_formula = active_formula
-                config.probes_data = probes_data
-                config.probe_count = probe_count
-                config.checked_probes = checked_probes
-                config.save()
+            # Create or update probe configuration (always ID 1 for the current configuration)
+            config = ProbeConfiguration.objects.filter(id=1).first() or ProbeConfiguration(id=1)
+            config.active_formula = active_formula
+            config.probes_data = probes_data
+            config.probe_count = probe_count
+            config.checked_probes = checked_probes
             
-            # Calculate and save average for checked probes
+            # Add the average for checked probes to probes_data, then write everything once
             avg_data = config.calculate_checked_probes_average()
-            if avg_data:
-                config.save()  # Save the updated probes_data with average
+            config.save()
             
             return JsonResponse({
                 'status': 'success',
@@ -275,7 +288,7 @@ def update_probe_configuration(request):
 def get_probe_configuration(request):
     """Get current probe configuration"""
     try:
-        config = ProbeConfiguration.objects.first()
+        config = get_probe_config()
         if config:
             return JsonResponse({
                 'status': 'success',
@@ -296,162 +309,433 @@ def get_probe_configuration(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-def auto_save_probe_data():
+def load_latest_frame():
+    """Return (frame_id, timestamp, grid) from the frame bus, falling back to thermal_map.txt"""
+    bus = get_frame_bus()
+    if bus is not None:
+        latest = bus.latest()
+        if latest is not None and time.time() - latest[1] <= STALE_AFTER:
+            return latest
+
+    thermal_map_path = os.path.join(settings.BASE_DIR, 'static', 'thermal_map.txt')
+    if not os.path.exists(thermal_map_path):
+        return None
+    try:
+        grid = np.loadtxt(thermal_map_path, delimiter=',', ndmin=2, dtype=np.float32)
+    except ValueError:
+        return None  # Malformed file
+    if grid.size == 0:
+        return None
+    return 0, os.path.getmtime(thermal_map_path), grid
+
+
+def load_frame(frame_id):
+    """(frame_id, timestamp, grid) of ``frame_id`` while it is still in the frame bus, else the latest frame"""
+    bus = get_frame_bus()
+    if bus is not None and frame_id > 0:
+        frame = bus.read(frame_id)
+        if frame is not None:
+            return frame
+    return load_latest_frame()
+
+
+def frame_data(request):
+    """Latest thermal frame as JSON; ?since=<frame_id> returns 204 if that is still the latest"""
+    latest = load_latest_frame()
+    if latest is None:
+        return JsonResponse({'error': 'No thermal data available'}, status=503)
+
+    frame_id, timestamp, grid = latest
+    since = request.GET.get('since')
+    # A ?since= above the latest id is from before a worker restart: the client gets the new frame
+    if frame_id and since and since.isdigit() and int(since) == frame_id:
+        return HttpResponse(status=204)
+
+    return JsonResponse(frame_payload(frame_id, timestamp, grid))
+
+
+def frame_payload(frame_id, timestamp, grid):
+    return {
+        'frame_id': frame_id,
+        'timestamp': timestamp,
+        'rows': grid.shape[0],
+        'cols': grid.shape[1],
+        'temperature': np.round(grid.astype(np.float64), 2).tolist(),
+    }
+
+
+def frame_stream(request):
+    """Push new frames to the browser as Server-Sent Events.
+
+    Only the newest frame is ever sent: a slow client simply skips the frames
+    it could not keep up with instead of queueing them.
+    """
+    bus = get_frame_bus()
+    if bus is None:
+        return JsonResponse({'error': 'Thermal worker is not running'}, status=503)
+
+    # A reconnecting EventSource sends the id of the last frame it got
+    since = request.headers.get('Last-Event-ID') or request.GET.get('since', '')
+    fps = request.GET.get('fps', '')
+    max_fps = min(int(fps), STREAM_MAX_FPS) if fps.isdigit() and int(fps) > 0 else STREAM_MAX_FPS
+
+    def events():
+        last_id = int(since) if since.isdigit() else 0
+        last_sent = 0
+        last_heartbeat = time.time()
+        yield 'retry: 2000\n\n'
+        current_bus = bus
+        closes_at = time.time() + STREAM_MAX_AGE
+        while True:
+            now = time.time()
+            if now >= closes_at:
+                yield f'retry: {STREAM_RECONNECT}\n\n'
+                return
+            if current_bus.is_stale():
+                # The worker may have restarted with a new shared memory segment
+                fresh = get_frame_bus()
+                if fresh is not None and fresh is not current_bus and not fresh.is_stale():
+                    current_bus, last_id = fresh, 0
+            elif current_bus.latest_id < last_id:
+                last_id = 0  # Frame ids restarted (e.g. the client's ?since= is from before a worker restart)
+            elif current_bus.latest_id > last_id and now - last_sent >= 1.0 / max_fps:
+                latest = current_bus.latest()
+                if latest is not None:
+                    payload = frame_payload(*latest)
+                    payload['skipped'] = max(0, latest[0] - last_id - 1) if last_id else 0
+                    last_id = latest[0]
+                    last_sent = last_heartbeat = now
+                    yield f'id: {last_id}\nevent: frame\ndata: {json.dumps(payload)}\n\n'
+                    continue
+            if now - last_heartbeat >= STREAM_HEARTBEAT:
+                last_heartbeat = now
+                yield ': keep-alive\n\n'
+            time.sleep(STREAM_POLL_INTERVAL)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def thermal_image(request):
+    """Latest frame as a colour-mapped JPEG (?format=png, ?quality=10-95), rendered once per frame"""
+    latest = load_latest_frame()
+    if latest is None:
+        return JsonResponse({'error': 'No thermal data available'}, status=503)
+
+    frame_id, timestamp, grid = latest
+    fmt = 'png' if request.GET.get('format') == 'png' else 'jpg'
+    quality = request.GET.get('quality', '')
+    quality = min(max(int(quality), 10), 95) if quality.isdigit() else RENDERER.quality
+    key = (frame_id or timestamp, fmt, quality)
+    etag = '"{}-{}-{}"'.format(*key)
+    if request.headers.get('If-None-Match') == etag:
+        return HttpResponse(status=304)
+
+    with RENDER_LOCK:
+        image = RENDERED_IMAGES.get(key)
+        if image is None:
+            image = RENDERER.render_bytes(grid, fmt, quality)
+            if any(cached[0] != key[0] for cached in RENDERED_IMAGES):
+                RENDERED_IMAGES.clear()  # Drop images of older frames
+            RENDERED_IMAGES[key] = image
+
+    response = HttpResponse(image, content_type='image/png' if fmt == 'png' else 'image/jpeg')
+    response['Cache-Control'] = 'no-cache'
+    response['ETag'] = etag
+    return response
+
+
+def active_formula():
+    """Formula of the current probe configuration (the first built-in formula if none is saved)"""
+    config = get_probe_config()
+    return config.active_formula if config else FORMULA[0]
+
+
+def latest_humidity_map(request):
+    """HumidityMap of the latest frame, or a JsonResponse describing why there is none"""
+    latest = load_latest_frame()
+    if latest is None:
+        return JsonResponse({'error': 'No thermal data available'}, status=503)
+    try:
+        return humidity_for_frame(*latest, active_formula())
+    except FormulaError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+
+def humidity_data(request):
+    """Humidity statistics and CD profile of the latest frame as JSON; ?map=1 adds the full map"""
+    result = latest_humidity_map(request)
+    if isinstance(result, JsonResponse):
+        return result
+    since = request.GET.get('since')
+    if result.frame_id and since and since.isdigit() and int(since) >= result.frame_id:
+        return HttpResponse(status=204)
+    return JsonResponse(result.as_dict(include_map=request.GET.get('map') == '1'))
+
+
+def humidity_binary(request):
+    """Humidity map of the latest frame as raw little-endian float32 (?dtype=f16 for float16)"""
+    result = latest_humidity_map(request)
+    if isinstance(result, JsonResponse):
+        return result
+    dtype = '<f2' if request.GET.get('dtype') == 'f16' else '<f4'
+    response = HttpResponse(result.map.astype(dtype).tobytes(), content_type='application/octet-stream')
+    response['X-Frame-Id'] = result.frame_id
+    response['X-Frame-Timestamp'] = result.timestamp
+    response['X-Frame-Shape'] = '{},{}'.format(*result.map.shape)
+    response['X-Frame-Dtype'] = dtype
+    return response
+
+
+def cd_profile_data(request):
+    """CD temperature profile and wet/dry streaks over the recent frames (?rows=N, ?matrix=1)"""
+    bus = get_frame_bus()
+    if bus is None:
+        return JsonResponse({'error': 'Thermal worker is not running'}, status=503)
+
+    buffer = update_from_bus(bus)
+    rows = request.GET.get('rows', '')
+    rows = int(rows) if rows.isdigit() and int(rows) > 0 else None
+    result = analyze(buffer, rows)
+    if result is None:
+        return JsonResponse({'error': 'No thermal data available'}, status=503)
+
+    if request.GET.get('matrix') == '1':
+        timestamps, frame_ids, profiles = buffer.window(rows)
+        result['timestamps'] = np.round(timestamps, 3).tolist()
+        result['matrix'] = np.round(profiles.astype(np.float64), 2).tolist()
+    return JsonResponse(result)
+
+
+def sample_probes(config, grid):
+    """(probes_data, average temperature, average humidity) of the configured probes on ``grid``, or None if no probe has a position"""
+    # Kernel average around every probe in one vectorized gather
+    sampler = get_probe_sampler(config, grid.shape)
+    if not sampler.keys:
+        return None
+    probe_temps = sampler.sample(grid)
+    # Calculate humidity for all probes using active formula
+    probe_humidity = calculate_humidity_from_formula(probe_temps, config.active_formula)
+
+    probes_data = {}
+    for probe_key, (row, col), avg_temp, humidity in zip(
+            sampler.keys, sampler.positions.tolist(), probe_temps.tolist(), probe_humidity.tolist()):
+        probes_data[probe_key] = {
+            'x': col,
+            'y': row,
+            'temperature': round(avg_temp, 2),
+            'humidity': round(humidity, 2)
+        }
+    return probes_data, float(np.mean(probe_temps)), float(np.mean(probe_humidity))
+
+
+def probe_values(probes_data, temperature, humidity):
+    """(keys, temperatures, humidities) of the probes in ``probes_data``; the averages alone if it has none"""
+    probes = {key: value for key, value in probes_data.items()
+              if not key.startswith('avg') and isinstance(value, dict) and 'temperature' in value}
+    if not probes:
+        probes = {'page': {'temperature': temperature, 'humidity': humidity}}
+    return (list(probes),
+            [float(value['temperature']) for value in probes.values()],
+            [float(value.get('humidity') or 0) for value in probes.values()])
+
+
+def evaluate_page_alarms(probes_data, temperature, humidity):
+    """Run the alarm rules on the probe values a page posted, when no worker evaluates the frames"""
+    engine = get_alarm_engine()
+    with PAGE_ALARM_LOCK:
+        # The worker or another process may have evaluated last; the current state is in the database
+        events = engine.load_state()
+        events += engine.evaluate(time.time(), *probe_values(probes_data, temperature, humidity))
+        record_alarm_events(events)
+
+
+def save_refusal(keys, temperatures, humidities):
+    """Why these probe values must not be saved, as (reason, raised manual-mode AlarmEvents), or None.
+
+    Nothing is saved while a manual-mode alarm is raised, nor values outside a
+    manual-mode range rule, even before its debounce raises the alarm.
+    """
+    manual = [event for event in active_alarms() if event.manual_mode]
+    if manual:
+        return manual[0].message, manual
+    rejected = get_alarm_engine().rejects(keys, temperatures, humidities)
+    if rejected:
+        return rejected[0], []
+    return None
+
+
+def check_page_probe_data(probes_data, temperature, humidity):
+    """Alarm handling of probe data posted by a page: (sampled by the server, alarm JsonResponse or None).
+
+    While the worker samples the frames itself it also evaluates the alarm
+    rules; otherwise they are evaluated on the values the page sends. The
+    response is set when the values must not be saved (see save_refusal).
+    """
+    sampled_by_server = server_sampler_running()
+    if not sampled_by_server:
+        evaluate_page_alarms(probes_data, temperature, humidity)
+    refusal = save_refusal(*probe_values(probes_data, temperature, humidity))
+    if refusal is None:
+        return sampled_by_server, None
+    reason, alarms = refusal
+    return sampled_by_server, JsonResponse({
+        'status': 'alarm',
+        'message': 'the system has switched to manual mode',
+        'temperature': temperature,
+        'humidity': humidity,
+        'alarm_triggered': True,
+        'reason': reason,
+        'alarms': [event_payload(event) for event in alarms]
+    })
+
+
+def alarm_data(request):
+    """Active alarms and the latest alarm events"""
+    limit = min(int(request.GET['limit']), 500) if request.GET.get('limit', '').isdigit() else 50
+    active = active_alarms()
+    return JsonResponse({
+        'manual_mode': any(event.manual_mode for event in active),
+        'active': [event_payload(event) for event in active],
+        'events': [event_payload(event) for event in AlarmEvent.objects.order_by('-id')[:limit]],
+    })
+
+
+def alarm_stream(request):
+    """Push new alarm events to the browser as Server-Sent Events.
+
+    Events come from the AlarmEvent table, so alarms raised by the worker
+    process reach every page; all streams of a process share one snapshot of
+    the newest events (see alarm_events_after). A reconnecting client resumes
+    after its Last-Event-ID; a new one gets the currently active alarms first.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', '')
+
+    def events():
+        yield 'retry: 5000\n\n'
+        if last_event_id.isdigit():
+            last_id = int(last_event_id)
+        else:
+            last = AlarmEvent.objects.order_by('-id').values_list('id', flat=True).first()
+            last_id = last or 0
+            for event in reversed(active_alarms()):
+                yield f'event: alarm\ndata: {json.dumps(event_payload(event))}\n\n'
+            # Sets the client's Last-Event-ID, so a reconnect gets the events missed meanwhile
+            yield f'id: {last_id}\n\n'
+        last_heartbeat = time.time()
+        closes_at = last_heartbeat + STREAM_MAX_AGE
+        while True:
+            if time.time() >= closes_at:
+                yield f'retry: {STREAM_RECONNECT}\n\n'
+                return
+            new = alarm_events_after(last_id, ALARM_POLL_INTERVAL)
+            for event in new:
+                last_id = event.id
+                yield f'id: {last_id}\nevent: alarm\ndata: {json.dumps(event_payload(event))}\n\n'
+            now = time.time()
+            if new:
+                last_heartbeat = now
+            elif now - last_heartbeat >= STREAM_HEARTBEAT:
+                last_heartbeat = now
+                yield ': keep-alive\n\n'
+            time.sleep(ALARM_POLL_INTERVAL)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def server_sampler_running():
+    """True while the worker (or thermal service) publishes frames, and so saves the probe data itself"""
+    bus = get_frame_bus()
+    return bus is not None and not bus.is_stale()
+
+
+def save_probe_record(config, probes_data, avg_temp, avg_humidity, timestamp=None, one_per_slot=True, buffered=True):
+    """Store sampled probes as a ProbeData record (with the average entry) through the probe buffer, or right away.
+
+    ``timestamp`` (epoch seconds) is when the frame was taken, by default now. Unless ``one_per_slot`` is off,
+    nothing is stored when its sampling slot already has a record; returns whether a record was stored (or queued).
+    """
+    # Get checked probes - if none checked, use all probes
+    checked_probes = config.get_checked_probes() or list(range(1, config.probe_count + 1))
+    probe_count = len(probes_data)
+    probes_data = dict(probes_data)
+    probes_data[f'avg{min(checked_probes)}-{max(checked_probes)}'] = {
+        'temperature': round(avg_temp, 2),
+        'humidity': round(avg_humidity, 2),
+        'checked_probes': checked_probes,
+        'formula': config.active_formula
+    }
+    timestamp = time.time() if timestamp is None else timestamp
+    entry = {
+        'timestamp': datetime.fromtimestamp(timestamp, dt_timezone.utc),
+        'sample_time': sample_slot(timestamp) if one_per_slot else None,
+        'humidity': round(avg_humidity, 2),
+        'temperature': round(avg_temp, 2),
+        'active_formula': config.active_formula,
+        'probe_count': probe_count,
+        'probes_data': probes_data,
+    }
+    if buffered:
+        return queue_probe_record(entry)
+    return bool(insert_probe_records([entry]))
+
+
+def auto_save_probe_data(grid=None, timestamp=None):
     print("auto_save_probe_data")
-    """Automatically save probe data from thermal map file"""
+    """Automatically save probe data of ``grid`` taken at ``timestamp``, by default the latest frame"""
     try:
-        # Get current probe configuration
-        config = ProbeConfiguration.objects.first()
+        # Get current probe configuration (cached; reloaded only when it changes)
+        config = get_probe_config()
         if not config or config.probe_count == 0:
             return  # No probes configured
         
-        # Read thermal map data
-        thermal_map_path = os.path.join(settings.BASE_DIR, 'static', 'thermal_map.txt')
-        if not os.path.exists(thermal_map_path):
-            return  # No thermal data available
-        
-        # Read and parse thermal map
-        with open(thermal_map_path, 'r') as f:
-            lines = f.readlines()
+        if grid is None:
+            # Latest frame from the worker's frame bus (or thermal_map.txt)
+            latest = load_latest_frame()
+            if latest is None:
+                return  # No thermal data available
+            _, timestamp, grid = latest
         
-        if not lines:
+        sampled = sample_probes(config, grid)
+        if sampled is None:
             return
+        probes_data, avg_temp, avg_humidity = sampled
         
-        # Parse temperature data into 2D array
-        grid_data = []
-        for line in lines:
-            row = [float(temp) for temp in line.strip().split(',')]
-            grid_data.append(row)
-        
-        if not grid_data:
+        # Don't save in manual mode or out of range (thermal/alarms.py)
+        refusal = save_refusal(*probe_values(probes_data, avg_temp, avg_humidity))
+        if refusal is not None:
+            print(f"ALARM: {refusal[0]} - probe data not saved")
             return
         
-        # Calculate averages for each probe
-        total_temp = 0
-        total_humidity = 0
-        valid_probes = 0
-        probes_data = {}
-        
-        # Get checked probes - if none checked, use all probes
-        checked_probes = config.get_checked_probes()
-        if not checked_probes:
-            # Default to all probes if none checked
-            checked_probes = list(range(1, config.probe_count + 1))
-        
-        for probe_id in checked_probes:
-            probe_key = f"probe{probe_id}"
-            probe_info = config.probes_data.get(probe_key, {})
-            
-            try:
-                row = probe_info.get('y')
-                col = probe_info.get('x')
-                
-                if row is not None and col is not None and 0 <= row < len(grid_data) and 0 <= col < len(grid_data[0]):
-                    # Calculate average around probe point (3x3 area for accuracy)
-                    temp_sum = 0
-                    temp_count = 0
-                    
-                    for r in range(max(0, row-1), min(len(grid_data), row+2)):
-                        for c in range(max(0, col-1), min(len(grid_data[0]), col+2)):
-                            if 0 <= r < len(grid_data) and 0 <= c < len(grid_data[0]):
-                                temp_sum += grid_data[r][c]
-                                temp_count += 1
-                    
-                    if temp_count > 0:
-                        avg_temp = temp_sum / temp_count
-                        
-                        # Calculate humidity using active formula
-                        humidity = calculate_humidity_from_formula(avg_temp, config.active_formula)
-                        
-                        probes_data[probe_key] = {
-                            'x': col,
-                            'y': row,
-                            'temperature': round(avg_temp, 2),
-                            'humidity': round(humidity, 2)
-                        }
-                        
-                        total_temp += avg_temp
-                        total_humidity += humidity
-                        valid_probes += 1
-                        
-            except Exception as e:
-                print(f"Error processing probe {probe_id}: {e}")
-                continue
+        # Save to database once per sampling slot
+        if not save_probe_record(config, probes_data, avg_temp, avg_humidity, timestamp):
+            return
         
-        if valid_probes > 0:
-            # Calculate overall averages for checked probes
-            avg_temp = total_temp / valid_probes
-            avg_humidity = total_humidity / valid_probes
-            
-            # Check temperature range - if out of range, don't save
-            if avg_temp < 35 or avg_temp > 70:
-                print(f"ALARM: Temperature out of range ({avg_temp:.2f}°C) - System switched to manual mode. Data not saved.")
-                return  # Don't save data when temperature is out of range
-            
-            # Add average data to probes_data JSON
-            probes_data[f'avg{min(checked_probes)}-{max(checked_probes)}'] = {
-                'temperature': round(avg_temp, 2),
-                'humidity': round(avg_humidity, 2),
-                'checked_probes': checked_probes,
-                'formula': config.active_formula
-            }
-            
-            # Save to database only if temperature is in range
-            ProbeData.objects.create(
-                humidity=round(avg_humidity, 2),
-                temperature=round(avg_temp, 2),
-                active_formula=config.active_formula,
-                probe_count=valid_probes,
-                probes_data=probes_data
-            )
-            
-            print(f"Auto-saved probe data: {valid_probes} checked probes, avg temp: {avg_temp:.2f}°C, avg humidity: {avg_humidity:.2f}%")
+        print(f"Auto-saved probe data: {len(probes_data)} checked probes, avg temp: {avg_temp:.2f}°C, avg humidity: {avg_humidity:.2f}%")
             
     except Exception as e:
         print(f"Error in auto_save_probe_data: {e}")
 
 
 def calculate_humidity_from_formula(temperature, formula):
-    """Calculate humidity from temperature using the given formula"""
+    """Calculate humidity from a temperature (or an array of temperatures) using the given formula"""
     try:
-        # Replace 'temp' with actual temperature value
-        formula_with_value = formula.replace('temp', str(temperature))
-        humidity = eval(formula_with_value)
-        return max(0, min(100, humidity))  # Clamp between 0-100%
+        # Non-finite results (e.g. division by zero) count as a failed calculation
+        humidity = np.nan_to_num(compile_formula(formula)(temperature), nan=0.0, posinf=0.0, neginf=0.0)
+        humidity = np.clip(humidity, 0, 100)  # Clamp between 0-100%
+        return float(humidity) if humidity.ndim == 0 else humidity
     except Exception as e:
         print(f"Error calculating humidity: {e}")
-        return 0.0
+        return 0.0 if np.ndim(temperature) == 0 else np.zeros(np.shape(temperature))
 
 
 def chart_view(request):
-    data = ProbeData.objects.all().order_by('timestamp')
-    chart_data = []
-    label_data = []
-    avg = 0
-    index = 0
-    time = None
-    filter_by_week = True if "week" in request.GET else False
-    filter_by_month = True if "month" in request.GET else False
-    for item in data:
-        timestamp = item.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        
-        if time is None:
-            time = item.timestamp.timestamp()
-        filter_ = (24*60*60) if filter_by_week else (7*24*60*60) if filter_by_month else 60*60
-        avg += item.humidity
-        index += 1
-        if (time + filter_) < item.timestamp.timestamp():
-            print((time + filter_) , item.timestamp.timestamp())
-            chart_data.append(float(f"{avg/index:.2f}"))
-
-            if item.timestamp.tzinfo is None:
-                dt = IRAN_TZ.localize(item.timestamp)
-            else:
-                dt = item.timestamp.astimezone(IRAN_TZ)
-            jalali_dt = jdatetime.datetime.fromgregorian(datetime=dt)
-            label_data.append(jalali_dt.strftime('%Y/%m/%d %H:%M:%S'))
-            
-            avg=0
-            index=0
-            time = item.timestamp.timestamp()
+    # One point per hour, day (?week) or week (?month), averaged in the database
+    bucket = 'day' if "week" in request.GET else 'week' if "month" in request.GET else 'hour'
+    label_data, chart_data, _ = humidity_series(bucket)
     return render(request, "thermal/chart.html",context={"chart_data":chart_data,"label_data":label_data,"max": len(chart_data)})
\ No newline at end of file
@@ -0,0 +1,233 @@
+# frame_replay.py
+#
+# Replay recorded frames in place of the sensor, so thermal_api.py and the
+# thermal worker can be run and load-tested on a machine without hardware.
+#
+# ReplaySensor implements the read calls the code uses on the real devices:
+#   MI48:      read() -> (data, header), plus the set_*/start/stop setup calls
+#   MLX90640:  setup(fps), get_frame() -> list of floats, cleanup()
+#
+# Recordings can be:
+#   - a frame archive directory (frame_archive.py); the recorded
+#     timestamps set the pace
+#   - thermal_map.txt dumps: a file with one or more frames of comma
+#     separated rows, or a directory of such files (name order)
+#   - senxor CSV/text captures: one frame per line, space or comma
+#     separated, optionally preceded by header columns
+#   - .npy arrays of frames
+#
+# Frames without timestamps are played at ``fps``; archives keep their
+# recorded pace. ``speed`` scales the pace (2 = twice as fast); 0 plays
+# them as fast as they are read.
+
+import glob
+import logging
+import os
+import re
+import time
+
+import numpy as np
+
+from frame_archive import FrameArchive
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SEPARATOR = re.compile(r"[,;\s]+")
+
+
+def _parse_text(path, shape):
+    """Frames from a thermal_map.txt dump or a senxor CSV/text capture"""
+    rows, cols = shape
+    size = rows * cols
+    frames = []
+    pending_rows = []
+    with open(path) as f:
+        for line in f:
+            tokens = [token for token in TOKEN_SEPARATOR.split(line.strip()) if token]
+            try:
+                if len(tokens) >= size:
+                    # One frame per line; leading columns are the capture header
+                    frames.append(np.array(tokens[-size:], dtype=np.float32))
+                elif len(tokens) == cols:
+                    pending_rows.append(np.array(tokens, dtype=np.float32))
+                    if len(pending_rows) == rows:
+                        frames.append(np.concatenate(pending_rows))
+                        pending_rows = []
+            except ValueError:
+                continue  # Column titles
+    return [frame.reshape(shape) for frame in frames]
+
+
+def load_frames(source, shape):
+    """(timestamps or None, frames of ``shape``) from a recording"""
+    if os.path.isdir(source):
+        archive = FrameArchive(source)
+        if archive.chunks():
+            timestamps, _, frames = archive.read()
+            return timestamps, frames.astype(np.float32)
+        frames = []
+        for path in sorted(glob.glob(os.path.join(source, "*.txt"))):
+            frames.extend(_parse_text(path, shape))
+        return None, np.array(frames, dtype=np.float32).reshape((-1,) + tuple(shape))
+
+    if source.endswith(".npy"):
+        return None, np.load(source).astype(np.float32).reshape((-1,) + tuple(shape))
+    return None, np.array(_parse_text(source, shape), dtype=np.float32).reshape((-1,) + tuple(shape))
+
+
+class ReplaySensor:
+    """Stand-in for MI48 / MLX90640 that plays back a recording.
+
+    Reads block until the next frame is due. At the end of the recording
+    it starts over (``loop``) or returns no data like a failed sensor read.
+    """
+
+    def __init__(self, source, shape, fps=None, speed=1.0, loop=True):
+        self.source = source
+        self.shape = tuple(shape)
+        self.speed = speed
+        self.loop = loop
+        self.timestamps, self.frames = load_frames(source, self.shape)
+        if not len(self.frames):
+            raise ValueError(f"No {self.shape[0]}x{self.shape[1]} frames found in {source}")
+        self.fps = self._recorded_fps() or fps or 15
+        self.played = 0
+        self.loops = 0
+        self._index = 0
+        self._offset = 0.0  # recording time played in previous loops
+        self._started = None
+        logger.info(f"Replaying {len(self.frames)} frames from {source} at {speed}x")
+
+    def _recorded_fps(self):
+        if self.timestamps is None or len(self.timestamps) < 2:
+            return None
+        duration = self.timestamps[-1] - self.timestamps[0]
+        return (len(self.timestamps) - 1) / duration if duration > 0 else None
+
+    def _recording_time(self, index):
+        """Seconds from the first frame to frame ``index`` of the recording"""
+        if self.timestamps is not None:
+            return float(self.timestamps[index] - self.timestamps[0])
+        return index / self.fps
+
+    @property
+    def ended(self):
+        return not self.loop and self._index >= len(self.frames)
+
+    def next_frame(self):
+        """Next frame of the recording (waiting until it is due), or None when it has ended"""
+        if self.ended:
+            return None
+        if self._index >= len(self.frames):
+            self._offset += self._recording_time(len(self.frames) - 1) + 1.0 / self.fps
+            self._index = 0
+            self.loops += 1
+
+        if self._started is None:
+            self._started = time.monotonic()
+        if self.speed > 0:
+            due = self._started + (self._offset + self._recording_time(self._index)) / self.speed
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        frame = self.frames[self._index]
+        self._index += 1
+        self.played += 1
+        return frame
+
+    # MI48
+
+    def read(self):
+        frame = self.next_frame()
+        if frame is None:
+            return None, None
+        return frame.astype(np.float16).ravel(), None
+
+    def set_fps(self, fps):
+        if self.timestamps is None:
+            self.fps = fps
+
+    def start(self, *args, **kwargs):
+        self._started = None
+
+    def stop(self, *args, **kwargs):
+        pass
+
+    def disable_filter(self, *args, **kwargs):
+        pass
+
+    def enable_filter(self, *args, **kwargs):
+        pass
+
+    def set_filter_1(self, *args, **kwargs):
+        pass
+
+    def set_offset_corr(self, *args, **kwargs):
+        pass
+
+    def set_sens_factor(self, *args, **kwargs):
+        pass
+
+    @property
+    def camera_info(self):
+        return {"replay": self.source, "frames": len(self.frames), "fps": self.fps, "speed": self.speed}
+
+    # MLX90640
+
+    def setup(self, fps):
+        self.set_fps(fps)
+
+    def get_frame(self):
+        frame = self.next_frame()
+        return [] if frame is None else frame.ravel().tolist()
+
+    def cleanup(self):
+        pass
+
+    def stats(self):
+        return {"played": self.played, "loops": self.loops, "frames": len(self.frames)}
+
+
+class ReplayClient:
+    """Stand-in for the worker's FrameClient that reads a ReplaySensor directly.
+
+    Frames are mirrored like thermal_api.py does before serving them, so the
+    worker sees what it would get from the API. As with the live client, at
+    most ``max_fps`` frames a second are delivered (``speed`` 0 delivers all).
+    ``wrap`` turns the frame into the value put under the ``frame`` key.
+    """
+
+    def __init__(self, sensor, wrap=None, max_fps=None):
+        self.sensor = sensor
+        self.wrap = wrap
+        self.max_fps = max_fps
+        self.fetched = 0
+        self.skipped = 0
+        self._last_delivery = 0.0
+
+    def fetch(self):
+        frame = self.sensor.next_frame()
+        if frame is None:
+            return None
+        if self.max_fps and self.sensor.speed > 0:
+            now = time.monotonic()
+            if now - self._last_delivery < 1.0 / self.max_fps:
+                self.skipped += 1
+                return None
+            self._last_delivery = now
+        frame = np.fliplr(frame)
+        self.fetched += 1
+        return {"frame": self.wrap(frame) if self.wrap else frame,
+                "frame_id": self.sensor.played, "fps": self.sensor.fps}
+
+    def wait(self):
+        # The sensor paces the reads; only avoid spinning once the recording has ended
+        if self.sensor.ended:
+            time.sleep(1)
+
+    def stats(self):
+        return {"fetched": self.fetched, "skipped": self.skipped, **self.sensor.stats()}
+
+    def close(self):
+        pass